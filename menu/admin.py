@@ -2,8 +2,8 @@ from django.contrib import admin
 from .models import Category, MenuItem, Ingredient, Recipe, Review , SpecialOffer, RecipeIngredient
 
 class MenuItemAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'description', 'image']  # Display name, category, description, and image
-    list_filter = ['category']  # Add filter by category
+    list_display = ['name', 'category', 'daypart', 'description', 'image']  # Display name, category, daypart, description, and image
+    list_filter = ['category', 'daypart']  # Add filter by category and daypart
     search_fields = ['name', 'description']  # Search by name or description
     readonly_fields = ['image']  # Make the image field readonly in the admin (optional)
 
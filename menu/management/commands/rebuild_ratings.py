@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from menu.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute menu item rating sums, counts and star histograms from reviews"
+
+    def handle(self, *args, **kwargs):
+        items = rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Ratings rebuilt: {items} menu items updated"))
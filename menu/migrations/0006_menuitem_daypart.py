@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0005_category_created_at_category_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="daypart",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("breakfast", "Breakfast"),
+                    ("lunch", "Lunch"),
+                    ("dinner", "Dinner"),
+                ],
+                db_index=True,
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# The name keywords the recommender used to match per daypart before items
+# carried a tag; later refined from order history by `tag_dayparts`.
+DAYPART_KEYWORDS = [
+    ("breakfast", ["tea", "paratha"]),
+    ("lunch", ["biryani"]),
+    ("dinner", ["karahi", "kebab"]),
+]
+
+
+def tag_from_keywords(apps, schema_editor):
+    MenuItem = apps.get_model("menu", "MenuItem")
+    items = list(MenuItem.objects.filter(daypart=""))
+    for item in items:
+        name = item.name.lower()
+        for daypart, keywords in DAYPART_KEYWORDS:
+            if any(k in name for k in keywords):
+                item.daypart = daypart
+                break
+    MenuItem.objects.bulk_update([i for i in items if i.daypart], ["daypart"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0006_menuitem_daypart"),
+    ]
+
+    operations = [
+        migrations.RunPython(tag_from_keywords, migrations.RunPython.noop),
+    ]
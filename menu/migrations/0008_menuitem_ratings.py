@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0007_tag_menuitem_daypart"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_1",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_2",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_3",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_4",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_5",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
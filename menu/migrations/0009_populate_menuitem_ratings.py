@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+def populate_ratings(apps, schema_editor):
+    MenuItem = apps.get_model("menu", "MenuItem")
+    Review = apps.get_model("menu", "Review")
+    fields = ["rating_sum", "rating_count"] + [f"rating_{stars}" for stars in RATINGS]
+
+    totals = {
+        row["menu_item_id"]: row
+        for row in Review.objects.values("menu_item_id")
+        .order_by()
+        .annotate(
+            rating_sum=Sum("rating"),
+            rating_count=Count("id"),
+            **{
+                f"rating_{stars}": Count("id", filter=Q(rating=stars))
+                for stars in RATINGS
+            },
+        )
+    }
+    items = list(MenuItem.objects.filter(pk__in=list(totals)))
+    for item in items:
+        for field in fields:
+            setattr(item, field, totals[item.pk][field] or 0)
+    MenuItem.objects.bulk_update(items, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0008_menuitem_ratings"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_ratings, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,6 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Avg, Count
 
 # ---------------------------------------------------------------------
 # Category
@@ -20,23 +19,57 @@ class Category(models.Model):
 # ---------------------------------------------------------------------
 # MenuItem
 # ---------------------------------------------------------------------
+RATING_FIELDS = ("rating_sum", "rating_count") + tuple(f"rating_{stars}" for stars in range(1, 6))
+
 class MenuItem(models.Model):
+    DAYPART_CHOICES = [
+        ("breakfast", "Breakfast"),
+        ("lunch",     "Lunch"),
+        ("dinner",    "Dinner"),
+    ]
+
     category     = models.ForeignKey(Category, on_delete=models.CASCADE)
     name         = models.CharField(max_length=200)
     description  = models.TextField(blank=True)
     image        = models.ImageField(upload_to="menu_images/", blank=True, null=True)
     price        = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_available = models.BooleanField(default=True)
+    daypart      = models.CharField(max_length=10, choices=DAYPART_CHOICES, blank=True, db_index=True)
     created_at   = models.DateTimeField(auto_now_add=True)
     updated_at   = models.DateTimeField(auto_now=True)
 
+    # Review aggregates, kept current by menu.signals (rebuild_ratings resyncs)
+    rating_sum   = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1     = models.PositiveIntegerField(default=0, editable=False)   # reviews per star rating
+    rating_2     = models.PositiveIntegerField(default=0, editable=False)
+    rating_3     = models.PositiveIntegerField(default=0, editable=False)
+    rating_4     = models.PositiveIntegerField(default=0, editable=False)
+    rating_5     = models.PositiveIntegerField(default=0, editable=False)
+
     @property
     def average_rating(self):
-        return self.reviews.aggregate(avg=Avg("rating"))["avg"] or 0
+        return self.rating_sum / self.rating_count if self.rating_count else 0
 
     @property
     def review_count(self):
-        return self.reviews.aggregate(cnt=Count("id"))["cnt"]
+        return self.rating_count
+
+    @property
+    def rating_histogram(self):
+        return {stars: getattr(self, f"rating_{stars}") for stars in range(1, 6)}
+
+    def save(self, *args, **kwargs):
+        # A full save of an existing item writes every field but the review
+        # aggregates, so an instance loaded before a review was saved can't
+        # put its stale counts back. Pass update_fields to write them.
+        if kwargs.get("update_fields") is None and not kwargs.get("force_insert") and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
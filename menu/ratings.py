@@ -0,0 +1,39 @@
+from django.db.models import Count, F, Q, Sum
+from .models import RATING_FIELDS, MenuItem, Review
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+def apply_rating(item_id, rating, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) one review's rating in a single UPDATE."""
+    histogram = f"rating_{rating}"
+    MenuItem.objects.filter(pk=item_id).update(
+        rating_sum=F("rating_sum") + sign * rating,
+        rating_count=F("rating_count") + sign,
+        **{histogram: F(histogram) + sign},
+    )
+
+
+def rebuild_ratings():
+    """
+    Recompute every item's rating aggregates from ``Review`` in one grouped
+    query and write the ones that drifted. Returns items updated.
+    """
+    totals = {
+        row["menu_item_id"]: row for row in
+        Review.objects.values("menu_item_id").order_by().annotate(
+            rating_sum=Sum("rating"),
+            rating_count=Count("id"),
+            **{f"rating_{stars}": Count("id", filter=Q(rating=stars)) for stars in RATINGS},
+        )
+    }
+    changed = []
+    for item in MenuItem.objects.only("id", *RATING_FIELDS):
+        row = totals.get(item.id, {})
+        values = {field: row.get(field) or 0 for field in RATING_FIELDS}
+        if any(getattr(item, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(item, field, value)
+            changed.append(item)
+    MenuItem.objects.bulk_update(changed, RATING_FIELDS, batch_size=1000)
+    return len(changed)
@@ -54,6 +54,7 @@ class ReviewSerializer(serializers.ModelSerializer):
 class MenuItemSerializer(serializers.ModelSerializer):
     average_rating = serializers.SerializerMethodField()
     review_count   = serializers.SerializerMethodField()
+    rating_histogram = serializers.ReadOnlyField()
     reviews        = ReviewSerializer(many=True, read_only=True)
     active_offer   = serializers.SerializerMethodField()
 
@@ -68,19 +69,18 @@ class MenuItemSerializer(serializers.ModelSerializer):
             "price",
             "average_rating",
             "review_count",
+            "rating_histogram",
             "active_offer",
             "reviews",
             "is_available",
+            "daypart",
         ]
 
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews.exists():
-            return round(sum([r.rating for r in reviews]) / reviews.count(), 2)
-        return 0
+        return round(obj.average_rating, 2)
 
     def get_review_count(self, obj):
-        return obj.reviews.count()
+        return obj.review_count
 
     def get_active_offer(self, obj):
         offer = obj.offers.filter(
@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Review
+from .ratings import apply_rating
+
+
+# ---------------------------------------------------------------------
+# Rating aggregates on MenuItem: applied in the review's own transaction
+# so they always match the committed reviews. Fixture loads (raw) are
+# left to rebuild_ratings.
+# ---------------------------------------------------------------------
+@receiver(pre_save, sender=Review)
+def remember_rating(sender, instance, raw=False, **kwargs):
+    instance._stored_rating = None
+    if instance.pk is not None and not raw:
+        instance._stored_rating = (Review.objects.filter(pk=instance.pk)
+                                   .values_list("menu_item_id", "rating").first())
+
+
+@receiver(post_save, sender=Review)
+def review_rating_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance._stored_rating
+    current = (instance.menu_item_id, int(instance.rating))
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            apply_rating(*previous, sign=-1)
+        apply_rating(*current)
+
+
+@receiver(post_delete, sender=Review)
+def review_rating_deleted(sender, instance, **kwargs):
+    apply_rating(instance.menu_item_id, int(instance.rating), sign=-1)
@@ -1,3 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.forms import modelform_factory
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Category, MenuItem, Review
+from .ratings import RATING_FIELDS, rebuild_ratings
+
+
+class RatingAggregateTests(TestCase):
+    """The incremental rating counters on ``MenuItem`` against ``rebuild_ratings``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Mains")
+        cls.karahi = MenuItem.objects.create(category=category, name="Karahi", price=650)
+        cls.biryani = MenuItem.objects.create(category=category, name="Biryani", price=450)
+        User = get_user_model()
+        cls.alice = User.objects.create_user("alice", "alice@example.com", "pw")
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "pw")
+
+    def aggregates(self):
+        return {item.pk: {field: getattr(item, field) for field in RATING_FIELDS}
+                for item in MenuItem.objects.all()}
+
+    def assertMatchesRebuild(self):
+        live = self.aggregates()
+        self.assertEqual(rebuild_ratings(), 0)
+        self.assertEqual(self.aggregates(), live)
+
+    def assertRatings(self, item, histogram):
+        item.refresh_from_db()
+        count = sum(histogram.values())
+        total = sum(stars * n for stars, n in histogram.items())
+        self.assertEqual(item.review_count, count)
+        self.assertEqual(item.rating_sum, total)
+        self.assertEqual(item.rating_histogram, {stars: histogram.get(stars, 0) for stars in range(1, 6)})
+        self.assertEqual(item.average_rating, total / count if count else 0)
+
+    def test_create(self):
+        Review.objects.create(user=self.alice, menu_item=self.karahi, rating=5)
+        Review.objects.create(user=self.bob, menu_item=self.karahi, rating=2)
+
+        self.assertRatings(self.karahi, {5: 1, 2: 1})
+        self.assertRatings(self.biryani, {})
+        self.assertMatchesRebuild()
+
+    def test_rating_change(self):
+        review = Review.objects.create(user=self.alice, menu_item=self.karahi, rating=5)
+        review.rating = 3
+        review.save()
+
+        self.assertRatings(self.karahi, {3: 1})
+        self.assertMatchesRebuild()
+
+    def test_unchanged_save(self):
+        review = Review.objects.create(user=self.alice, menu_item=self.karahi, rating=4)
+        review.comment = "Still good"
+        review.save()
+
+        self.assertRatings(self.karahi, {4: 1})
+        self.assertMatchesRebuild()
+
+    def test_move_to_another_item(self):
+        review = Review.objects.create(user=self.alice, menu_item=self.karahi, rating=4)
+        Review.objects.create(user=self.bob, menu_item=self.karahi, rating=1)
+        review.menu_item = self.biryani
+        review.rating = 2
+        review.save()
+
+        self.assertRatings(self.karahi, {1: 1})
+        self.assertRatings(self.biryani, {2: 1})
+        self.assertMatchesRebuild()
+
+    def test_delete(self):
+        review = Review.objects.create(user=self.alice, menu_item=self.karahi, rating=5)
+        Review.objects.create(user=self.bob, menu_item=self.karahi, rating=3)
+        review.delete()
+
+        self.assertRatings(self.karahi, {3: 1})
+        self.assertMatchesRebuild()
+
+    def test_item_delete_cascades(self):
+        Review.objects.create(user=self.alice, menu_item=self.karahi, rating=5)
+        Review.objects.create(user=self.alice, menu_item=self.biryani, rating=4)
+        self.karahi.delete()
+
+        self.assertRatings(self.biryani, {4: 1})
+        self.assertMatchesRebuild()
+
+    def test_rebuild_repairs_drift(self):
+        Review.objects.create(user=self.alice, menu_item=self.karahi, rating=5)
+        MenuItem.objects.filter(pk=self.karahi.pk).update(rating_sum=0, rating_count=7, rating_5=0)
+
+        self.assertEqual(rebuild_ratings(), 1)
+        self.assertRatings(self.karahi, {5: 1})
+        self.assertEqual(rebuild_ratings(), 0)
+
+    def test_stale_full_save_keeps_counts(self):
+        stale = MenuItem.objects.get(pk=self.karahi.pk)
+        Review.objects.create(user=self.alice, menu_item=self.karahi, rating=5)
+        stale.name = "Chicken karahi"
+        stale.save()
+
+        self.assertRatings(self.karahi, {5: 1})
+        self.assertEqual(self.karahi.name, "Chicken karahi")
+        self.assertMatchesRebuild()
+
+    def test_deferred_full_save(self):
+        Review.objects.create(user=self.alice, menu_item=self.karahi, rating=4)
+        item = MenuItem.objects.only("id", "price").get(pk=self.karahi.pk)
+        item.price = 700
+        item.save()
+
+        self.karahi.refresh_from_db()
+        self.assertEqual(self.karahi.price, 700)
+        self.assertEqual(self.karahi.name, "Karahi")
+        self.assertRatings(self.karahi, {4: 1})
+
+    def test_counts_not_editable(self):
+        form = modelform_factory(MenuItem, fields="__all__")
+        self.assertFalse(set(form.base_fields) & set(RATING_FIELDS))
@@ -34,7 +34,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
 
 class MenuItemViewSet(viewsets.ModelViewSet):
-    queryset = MenuItem.objects.all()
+    queryset = MenuItem.objects.prefetch_related("reviews")
     serializer_class = MenuItemSerializer
     permission_classes = [IsStaffOrReadOnly]
 
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0001_initial"),
+        ("outlet", "0004_table_created_at_table_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="table",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="orders",
+                to="outlet.table",
+            ),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from menu.models import MenuItem, SpecialOffer
@@ -13,6 +13,8 @@ class Order(models.Model):
     ]
 
     customer    = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="orders")
+    table       = models.ForeignKey("outlet.Table", on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name="orders")   # set for orders placed from a table QR scan
     status      = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
@@ -59,6 +61,8 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         if not self.unit_price:
             self.unit_price = self._discounted_unit_price()
-        super().save(*args, **kwargs)
-        self.order.total_price = self.order.calculate_total_price()
-        self.order.save(update_fields=["total_price"])
+        # The line and the order total it changes commit together.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            self.order.total_price = self.order.calculate_total_price()
+            self.order.save(update_fields=["total_price"])
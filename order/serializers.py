@@ -1,4 +1,5 @@
 # serializers.py
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem, MenuItem  # ensure MenuItem imported
 
@@ -28,34 +29,26 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = (
             "id",
-            "user",
+            "customer",
             "status",
+            "table",
             "created_at",
             "total_price",
             "items",
             "order_items",
         )
-        read_only_fields = ("id", "status", "created_at", "total_price", "user")
+        read_only_fields = ("id", "status", "created_at", "total_price", "customer")
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
-        user = self.context["request"].user  # associate order with logged-in user
-        order = Order.objects.create(user=user, **validated_data)
+        validated_data.setdefault("customer", self.context["request"].user)  # associate order with logged-in user
+        order = Order.objects.create(**validated_data)
 
-        # Create OrderItems
-        order_items = []
-        total = 0
+        # Create OrderItems one by one: each prices itself (special offers
+        # included), updates the order total, and reaches the post_save
+        # handlers that keep the recommender's basket and popularity counts.
         for item in items_data:
-            menu_item = item["menu_item"]
-            quantity = item["quantity"]
-            order_item = OrderItem(order=order, menu_item=menu_item, quantity=quantity)
-            order_items.append(order_item)
-            total += menu_item.price * quantity
-
-        OrderItem.objects.bulk_create(order_items)
-
-        # Save total price
-        order.total_price = total
-        order.save(update_fields=["total_price"])
+            OrderItem.objects.create(order=order, **item)
 
         return order
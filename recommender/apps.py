@@ -1,6 +1,33 @@
+import logging
+import threading
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class RecommenderConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recommender"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .utils import load_current_snapshot
+
+        # Map the current model snapshot (if one was built) before serving.
+        try:
+            load_current_snapshot()
+        except (OSError, ValueError) as exc:
+            logger.warning("Recommender snapshot not loaded: %s", exc)
+
+        if getattr(settings, "RECOMMENDER_WARM_UP", False):
+            threading.Thread(target=_warm_up, name="recommender-warm-up", daemon=True).start()
+
+
+def _warm_up():
+    from .utils import warm_up
+
+    try:
+        warm_up()
+    except Exception:
+        logger.warning("Recommender warm-up failed", exc_info=True)
@@ -0,0 +1,123 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = "recommender:catalog-version"
+
+
+def _user_version_key(user_id):
+    return f"recommender:user-version:{user_id}"
+
+
+def _fresh_version():
+    # Counters that are missing (first use, evicted, cache flushed) restart
+    # from the clock rather than from 1, so they never come back to a value
+    # that older cached entries were keyed with.
+    return time.time_ns() // 1000
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing key: start a fresh counter. add() loses to a concurrent
+        # add, which is fine since either way the old version is gone.
+        if not cache.add(key, _fresh_version(), timeout=None):
+            cache.incr(key)
+
+
+def _versions(keys, *others):
+    """
+    ``cache.get_many`` of ``keys`` and ``others`` in one round trip, with
+    any missing version counter among ``keys`` started afresh.
+    """
+    found = cache.get_many([*keys, *others])
+    for key in keys:
+        if key not in found:
+            fresh = _fresh_version()
+            cache.add(key, fresh, timeout=None)
+            found[key] = cache.get(key, fresh)
+    return found
+
+
+def invalidate_user(user_id):
+    if user_id is not None:
+        _bump(_user_version_key(user_id))
+
+
+def invalidate_catalog():
+    _bump(CATALOG_VERSION_KEY)
+
+
+def catalog_version():
+    return _versions([CATALOG_VERSION_KEY])[CATALOG_VERSION_KEY]
+
+
+def result_key(user_id, top_n, daypart, filter_key=""):
+    """
+    Cache key for one user's recommended item ids. It embeds the current
+    catalog and user versions, so bumping either makes older entries
+    unreachable. ``filter_key`` is ``ItemFilter.key()`` for filtered lists.
+    """
+    user_key = _user_version_key(user_id)
+    versions = _versions([CATALOG_VERSION_KEY, user_key])
+    return "recommender:ids:{}:{}:{}:{}:{}:{}".format(
+        user_id,
+        "all" if top_n is None else top_n,
+        daypart,
+        filter_key,
+        versions[CATALOG_VERSION_KEY],
+        versions[user_key],
+    )
+
+
+def fallback_key(top_n, daypart, filter_key=""):
+    """Cache key for the non-personalised fallback list."""
+    return "recommender:fallback:{}:{}:{}:{}".format(
+        "all" if top_n is None else top_n, daypart, filter_key, catalog_version(),
+    )
+
+
+def _table_key(table_id):
+    return f"recommender:table:{table_id}"
+
+
+def get_table_result(table_id):
+    """
+    ``(cached payload or None, catalog version)`` for a table in one cache
+    round trip. The payload is stored with the catalog version it was
+    built for; callers compare the two.
+    """
+    key = _table_key(table_id)
+    found = _versions([CATALOG_VERSION_KEY], key)
+    return found.get(key), found[CATALOG_VERSION_KEY]
+
+
+def set_table_result(table_id, payload):
+    cache.set(_table_key(table_id), payload, getattr(settings, "RECOMMENDER_CACHE_TIMEOUT", 300))
+
+
+def invalidate_table(table_id):
+    if table_id is not None:
+        cache.delete(_table_key(table_id))
+
+
+def _outlet_popularity_key(outlet_id):
+    return f"recommender:outlet-popularity:{outlet_id}"
+
+
+def get_outlet_popularity(outlet_id):
+    return cache.get(_outlet_popularity_key(outlet_id))
+
+
+def set_outlet_popularity(outlet_id, counts):
+    cache.set(_outlet_popularity_key(outlet_id), counts,
+              getattr(settings, "RECOMMENDER_OUTLET_POPULARITY_SECONDS", 300))
+
+
+def get_result(key):
+    return cache.get(key)
+
+
+def set_result(key, result):
+    cache.set(key, result, getattr(settings, "RECOMMENDER_CACHE_TIMEOUT", 300))
@@ -0,0 +1,144 @@
+from collections import Counter
+import numpy as np
+from menu.models import RecipeIngredient, Review
+from .models import TasteProfile
+
+# Reviews at or above this rating count as "liked" for content scoring
+LIKED_RATING = 4
+
+
+class IngredientModel:
+    """
+    Item x ingredient matrix in CSR form with TF-IDF weights.
+
+    Rows are ``ItemIndex`` positions, columns index ``ingredient_ids``. A
+    recipe either uses an ingredient or not, so the term frequency is 1 and
+    each weight is the ingredient's IDF, with rows L2-normalised.
+    """
+
+    def __init__(self, ingredient_ids, indptr, indices, weights, idf):
+        self.ingredient_ids = ingredient_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.idf = idf
+        self._rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        self._transposed = None
+
+    @property
+    def size(self):
+        return len(self.indptr) - 1
+
+    def profile_vector(self, ingredient_counts):
+        """Dense IDF-weighted profile from ``{ingredient_id: liked items}``."""
+        vec = np.zeros(len(self.ingredient_ids))
+        if not ingredient_counts or not len(self.ingredient_ids):
+            return vec
+        ids = np.fromiter((int(k) for k in ingredient_counts), dtype=np.int64, count=len(ingredient_counts))
+        counts = np.fromiter(ingredient_counts.values(), dtype=np.float64, count=len(ingredient_counts))
+        pos = np.searchsorted(self.ingredient_ids, ids)
+        pos = np.minimum(pos, len(self.ingredient_ids) - 1)
+        known = self.ingredient_ids[pos] == ids
+        vec[pos[known]] = counts[known] * self.idf[pos[known]]
+        return vec
+
+    def scores(self, profile):
+        """Cosine similarity of every item to a profile vector."""
+        if not len(self.indices):
+            return np.zeros(self.size)
+        sims = np.bincount(self._rows, weights=self.weights * profile[self.indices], minlength=self.size)
+        norm = np.linalg.norm(profile)
+        return sims / norm if norm else sims
+
+    def similarities(self, positions, size=None):
+        """
+        Cosine similarity of the items at ``positions`` to every item, one
+        row of ``size`` (default: model size) per position.
+
+        Computed from the CSR rows through the ingredient -> items
+        transpose, so only items sharing an ingredient are ever touched.
+        """
+        size = self.size if size is None else size
+        sims = np.zeros((len(positions), size))
+        if not len(self.indices):
+            return sims
+        entries, starts = self._ingredient_entries()
+        n = min(size, self.size)
+        for r, pos in enumerate(positions):
+            if pos >= self.size:
+                continue
+            lo, hi = self.indptr[pos], self.indptr[pos + 1]
+            ingredients = self.indices[lo:hi]
+            counts = starts[ingredients + 1] - starts[ingredients]
+            # Every entry of every column this row has a weight in.
+            cols = np.repeat(starts[ingredients] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            other = entries[cols]
+            products = np.repeat(self.weights[lo:hi], counts) * self.weights[other]
+            sims[r, :n] = np.bincount(self._rows[other], weights=products, minlength=self.size)[:n]
+        return sims
+
+    def _ingredient_entries(self):
+        # (entry numbers sorted by ingredient, per-ingredient start offsets),
+        # i.e. the matrix in CSC form; built once per model.
+        if self._transposed is None:
+            entries = np.argsort(self.indices, kind="stable")
+            starts = np.zeros(len(self.ingredient_ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=len(self.ingredient_ids)), out=starts[1:])
+            self._transposed = entries, starts
+        return self._transposed
+
+
+def ingredient_matrix(index):
+    """(ingredient ids, item x ingredient CSR indptr, indices) from recipes."""
+    links = sorted(set(RecipeIngredient.objects.values_list("recipe__menu_item_id", "ingredient_id")))
+    ingredient_ids = np.array(sorted({ing for _, ing in links}), dtype=np.int64)
+    item_pos = index.positions([item for item, _ in links])
+    size = len(index)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    if not links:
+        return ingredient_ids, indptr, np.zeros(0, dtype=np.int32)
+    ing_pos = np.searchsorted(ingredient_ids, [ing for _, ing in links])
+    order = np.lexsort((ing_pos, item_pos))
+    np.cumsum(np.bincount(item_pos, minlength=size), out=indptr[1:])
+    return ingredient_ids, indptr, ing_pos[order].astype(np.int32)
+
+
+def tfidf_weights(ingredient_ids, indptr, indices):
+    """(per-entry weights, per-ingredient IDF) for a binary item x ingredient CSR."""
+    items = int(np.count_nonzero(np.diff(indptr)))
+    df = np.bincount(indices, minlength=len(ingredient_ids))
+    idf = np.log((1 + items) / (1 + df)) + 1
+    weights = idf[indices].astype(np.float64)
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(indptr) - 1))
+    if len(weights):
+        weights /= norms[rows]
+    return weights, idf
+
+
+def build_ingredient_model(index):
+    ingredient_ids, indptr, indices = ingredient_matrix(index)
+    weights, idf = tfidf_weights(ingredient_ids, indptr, indices)
+    return IngredientModel(ingredient_ids, indptr, indices, weights, idf)
+
+
+def refresh_taste_profile(user_id):
+    """
+    Recompute one user's stored profile from their liked reviews: which
+    items they liked and, per ingredient, how many of those items use it.
+    Users without liked reviews get no row, which also covers a user
+    deleted together with their reviews.
+    """
+    liked = sorted(Review.objects.filter(user_id=user_id, rating__gte=LIKED_RATING)
+                   .values_list("menu_item_id", flat=True))
+    if not liked:
+        TasteProfile.objects.filter(user_id=user_id).delete()
+        return
+    counts = Counter(ing for _, ing in set(
+        RecipeIngredient.objects.filter(recipe__menu_item_id__in=liked)
+        .values_list("recipe__menu_item_id", "ingredient_id")
+    ))
+    TasteProfile.objects.update_or_create(
+        user_id=user_id,
+        defaults={"liked_items": liked, "ingredients": {str(k): v for k, v in counts.items()}},
+    )
@@ -0,0 +1,256 @@
+import itertools
+from collections import Counter, defaultdict
+from datetime import timedelta
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from order.models import OrderItem
+from .models import ItemPair
+
+# How far before a matrix's read time apply_pair_changes looks, for
+# transactions that stamped a row before the read but committed after it.
+PAIR_CHANGE_SLACK = timedelta(minutes=1)
+
+
+class CoOccurrence:
+    """
+    Symmetric item x item co-occurrence counts stored as CSR arrays.
+
+    Rows and columns are ``ItemIndex`` positions. ``marginals[p]`` is the sum
+    of row ``p``, i.e. how many (order, partner item) pairs item ``p`` took
+    part in, which is what ``basket_scores`` ranks by.
+
+    The CSR arrays are never modified; pairs recorded after the build go to a
+    small overlay (``add``) until the next rebuild folds them in.
+    """
+
+    def __init__(self, indptr, indices, data, marginals):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.marginals = marginals
+        self._delta = defaultdict(dict)
+        self._owns_marginals = False
+
+    @property
+    def size(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    @classmethod
+    def empty(cls, size=0):
+        return cls(
+            np.zeros(size + 1, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(size, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_pairs(cls, rows, cols, size, counts=None):
+        """
+        Build from parallel arrays of position pairs (one entry per
+        occurrence unless ``counts`` is given). Each unordered pair should
+        appear once; the matrix is mirrored here.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if counts is None:
+            counts = np.ones(len(rows), dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+        if not len(rows):
+            return cls.empty(size)
+
+        keys = np.concatenate([rows * size + cols, cols * size + rows])
+        keys, inverse = np.unique(keys, return_inverse=True)
+        data = np.bincount(inverse, weights=np.concatenate([counts, counts])).astype(np.int32)
+
+        row_of = keys // size
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_of, minlength=size), out=indptr[1:])
+        marginals = np.bincount(row_of, weights=data, minlength=size).astype(np.int64)
+        return cls(indptr, (keys % size).astype(np.int32), data, marginals)
+
+    def add(self, a, b, n=1):
+        """Record ``n`` more co-occurrences of positions ``a`` and ``b``."""
+        need = max(a, b) + 1
+        if not self._owns_marginals or len(self.marginals) < need:
+            grown = np.zeros(max(need, len(self.marginals)), dtype=np.int64)
+            grown[:len(self.marginals)] = self.marginals
+            self.marginals = grown
+            self._owns_marginals = True
+        self.marginals[a] += n
+        self.marginals[b] += n
+        self._delta[a][b] = self._delta[a].get(b, 0) + n
+        self._delta[b][a] = self._delta[b].get(a, 0) + n
+
+    def row(self, pos):
+        """(partner positions, counts) for the item at ``pos``."""
+        if pos >= self.size:
+            cols, data = self.indices[:0], self.data[:0]
+        else:
+            start, end = self.indptr[pos], self.indptr[pos + 1]
+            cols, data = self.indices[start:end], self.data[start:end]
+        extra = self._delta.get(pos)
+        if not extra:
+            return cols, data
+        merged = dict(zip(cols.tolist(), data.tolist()))
+        for b, n in extra.items():
+            merged[b] = merged.get(b, 0) + n
+        keys = sorted(merged)
+        return (np.asarray(keys, dtype=np.int32),
+                np.asarray([merged[k] for k in keys], dtype=np.int32))
+
+    def count(self, a, b):
+        cols, data = self.row(a)
+        hit = np.searchsorted(cols, b)
+        if hit < len(cols) and cols[hit] == b:
+            return int(data[hit])
+        return 0
+
+
+def order_pairs(ids):
+    """Sorted ``(a, b)`` id pairs of distinct items in one order."""
+    return list(itertools.combinations(sorted(set(ids)), 2))
+
+
+def count_order_pairs():
+    """
+    ``{(a, b): orders}`` over the whole order history.
+
+    Streams ``(order_id, menu_item_id)`` rows in order so only one order's
+    items are held at a time.
+    """
+    counts = defaultdict(int)
+    qs = (OrderItem.objects.order_by("order_id")
+          .values_list("order_id", "menu_item_id")
+          .iterator(chunk_size=10000))
+    for _, group in itertools.groupby(qs, key=lambda r: r[0]):
+        for pair in order_pairs(item_id for _, item_id in group):
+            counts[pair] += 1
+    return counts
+
+
+def build_from_table(index):
+    """
+    Co-occurrence matrix loaded from the maintained ``ItemPair`` rows,
+    streamed straight into one (rows x 3) integer array.
+    """
+    qs = ItemPair.objects.filter(count__gt=0)
+    rows = np.fromiter(qs.values_list("item_a_id", "item_b_id", "count").iterator(chunk_size=10000),
+                       dtype=np.dtype((np.int64, 3)))
+    if not len(rows):
+        return CoOccurrence.empty(len(index))
+    ids, inverse = np.unique(rows[:, :2], return_inverse=True)
+    pos = index.positions(ids.tolist())[inverse.reshape(-1, 2)]
+    return CoOccurrence.from_pairs(pos[:, 0], pos[:, 1], len(index), rows[:, 2])
+
+
+def apply_pair_changes(matrix, index, since):
+    """
+    Bring ``matrix``, read from ``ItemPair`` at ``since`` (a snapshot's),
+    up to date with the rows changed after that, in one query. Each changed
+    row adds the difference from the count ``matrix`` already holds, so
+    rows it has seen are not counted twice. Rows deleted from the table
+    (by ``reconcile_pairs``) stay in ``matrix`` until the next snapshot.
+    """
+    rows = (ItemPair.objects.filter(updated_at__gte=since - PAIR_CHANGE_SLACK)
+            .values_list("item_a_id", "item_b_id", "count")
+            .iterator(chunk_size=10000))
+    for a_id, b_id, count in rows:
+        a, b = index.positions([a_id, b_id]).tolist()
+        n = count - matrix.count(a, b)
+        if n:
+            matrix.add(a, b, n)
+    return matrix
+
+
+def new_pairs_for(order_item):
+    """
+    Pairs a freshly saved ``OrderItem`` adds to its order.
+
+    Nothing is added when the order already had a row for the same dish,
+    since co-occurrence counts distinct items per order.
+    """
+    others = set(OrderItem.objects.filter(order_id=order_item.order_id)
+                 .exclude(pk=order_item.pk)
+                 .values_list("menu_item_id", flat=True))
+    item_id = order_item.menu_item_id
+    if item_id in others:
+        return []
+    return [tuple(sorted((item_id, other))) for other in others]
+
+
+def increment_pairs(pairs):
+    """
+    Add one to the ``ItemPair`` count of each ``(a, b)`` in ``pairs`` (a
+    pair listed twice adds two): one SELECT for the rows that exist, one
+    UPDATE per distinct increment and one INSERT for first-seen pairs.
+    """
+    counts = Counter(pairs)
+    if not counts:
+        return
+    existing = {(a, b): pk for pk, a, b in
+                ItemPair.objects.filter(item_a_id__in={a for a, _ in counts},
+                                        item_b_id__in={b for _, b in counts})
+                .values_list("pk", "item_a_id", "item_b_id")
+                if (a, b) in counts}
+    by_step = defaultdict(list)
+    for pair, pk in existing.items():
+        by_step[counts[pair]].append(pk)
+    for n, pks in by_step.items():
+        ItemPair.objects.filter(pk__in=pks).update(count=F("count") + n, updated_at=timezone.now())
+
+    new = [ItemPair(item_a_id=a, item_b_id=b, count=n)
+           for (a, b), n in counts.items() if (a, b) not in existing]
+    if not new:
+        return
+    try:
+        with transaction.atomic():
+            ItemPair.objects.bulk_create(new, batch_size=1000)
+    except IntegrityError:
+        # A concurrent order created some of them first; add row by row.
+        for row in new:
+            _add_pair(row.item_a_id, row.item_b_id, row.count)
+
+
+def _add_pair(a, b, n):
+    pair = ItemPair.objects.filter(item_a_id=a, item_b_id=b)
+    if pair.update(count=F("count") + n, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            ItemPair.objects.create(item_a_id=a, item_b_id=b, count=n)
+    except IntegrityError:
+        pair.update(count=F("count") + n, updated_at=timezone.now())
+
+
+def reconcile_pairs():
+    """
+    Rewrite ``ItemPair`` so it matches a full scan of the order history.
+
+    Returns ``(created, updated, deleted)`` row counts. Incremental updates
+    only cover new order lines, so this also picks up deleted orders and
+    edited lines.
+    """
+    fresh = count_order_pairs()
+    existing = {(a, b): (pk, n) for pk, a, b, n in
+                ItemPair.objects.values_list("pk", "item_a_id", "item_b_id", "count")}
+
+    to_create = [ItemPair(item_a_id=a, item_b_id=b, count=n)
+                 for (a, b), n in fresh.items() if (a, b) not in existing]
+    now = timezone.now()
+    to_update = [ItemPair(pk=existing[k][0], count=n, updated_at=now)
+                 for k, n in fresh.items() if k in existing and existing[k][1] != n]
+    to_delete = [pk for k, (pk, _) in existing.items() if k not in fresh]
+
+    with transaction.atomic():
+        ItemPair.objects.bulk_create(to_create, batch_size=1000)
+        ItemPair.objects.bulk_update(to_update, ["count", "updated_at"], batch_size=1000)
+        for start in range(0, len(to_delete), 1000):
+            ItemPair.objects.filter(pk__in=to_delete[start:start + 1000]).delete()
+    return len(to_create), len(to_update), len(to_delete)
@@ -0,0 +1,209 @@
+import tempfile
+import time
+from contextlib import contextmanager
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+from menu.models import MenuItem, Review
+from order.models import Order, OrderItem
+from . import utils
+from .caching import invalidate_catalog, invalidate_user
+from .content import refresh_taste_profile
+from .cooccurrence import reconcile_pairs
+from .factorization import build_factors
+from .features import refresh_user_features
+from .index import get_item_index
+from .neighbors import rebuild_neighbors
+from .popularity import rebuild_popularity
+
+
+def split_time(test_fraction=0.2):
+    """Order time leaving the latest ``test_fraction`` of orders for testing, or ``None``."""
+    orders = Order.objects.order_by("created_at").values_list("created_at", flat=True)
+    count = orders.count()
+    if not count:
+        return None
+    return orders[min(int(count * (1 - test_fraction)), count - 1)]
+
+
+def held_out(split_at, index):
+    """
+    (user ids, item positions) of items users first ordered at or after
+    ``split_at``; items they had ordered before are left out since the
+    recommender never suggests them. Sorted by user, then position.
+    """
+    def pairs(qs):
+        rows = np.array(list(qs.values_list("order__customer_id", "menu_item_id").distinct()),
+                        dtype=np.int64).reshape(-1, 2)
+        return rows[:, 0], index.positions(rows[:, 1].tolist())
+
+    before_users, before_pos = pairs(OrderItem.objects.filter(order__created_at__lt=split_at))
+    after_users, after_pos = pairs(OrderItem.objects.filter(order__created_at__gte=split_at))
+    size = len(index)
+    after = after_users * size + after_pos
+    keys = np.unique(after[~np.isin(after, before_users * size + before_pos)])
+    return keys // size, keys % size
+
+
+@contextmanager
+def as_of(split_at, train_mf=False):
+    """
+    The recommender's view of the data as it was at ``split_at``.
+
+    Inside one transaction, orders and reviews from ``split_at`` on are
+    deleted and every table derived from them is rebuilt. On-disk
+    snapshots and factor models are ignored; with ``train_mf`` factors are
+    trained on what is left. Components run in turn with no time budget,
+    since pool threads use their own connections and would see the
+    committed data, and dropped components would tie the metrics to
+    timing. Everything is rolled back on exit. Lazily loaded structures
+    and the cached results of affected users are dropped on the way in
+    and out, so neither state leaks into the other.
+    """
+    users = set(Order.objects.filter(created_at__gte=split_at).values_list("customer_id", flat=True))
+    reviewers = set(Review.objects.filter(created_at__gte=split_at).values_list("user_id", flat=True))
+
+    def invalidate():
+        utils.reset_state()
+        invalidate_catalog()
+        for user_id in users | reviewers:
+            invalidate_user(user_id)
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            override_settings(RECOMMENDER_SNAPSHOT_DIR=f"{tmp}/snapshots", RECOMMENDER_MF_DIR=f"{tmp}/mf",
+                              RECOMMENDER_CONCURRENT_COMPONENTS=False, RECOMMENDER_BUDGET_MS=None), \
+            transaction.atomic():
+        try:
+            Order.objects.filter(created_at__gte=split_at).delete()
+            Review.objects.filter(created_at__gte=split_at).delete()
+            for user_id in users:
+                refresh_user_features(user_id)
+            for user_id in reviewers:
+                refresh_taste_profile(user_id)
+            reconcile_pairs()
+            rebuild_popularity(split_at)
+            index = get_item_index()
+            rebuild_neighbors(index)
+            if train_mf:
+                build_factors(index)
+            invalidate()
+            yield
+        finally:
+            transaction.set_rollback(True)
+            invalidate()
+
+
+def _per_user(recommend):
+    def run(users, k):
+        ids, seconds = {}, []
+        for user in users:
+            start = time.perf_counter()
+            ids[user.id] = recommend(user, k)
+            seconds.append(time.perf_counter() - start)
+        return ids, np.array(seconds)
+    return run
+
+
+def _batched(users, k):
+    ids, seconds = {}, []
+    for start in range(0, len(users), utils.BATCH_SIZE):
+        chunk = users[start:start + utils.BATCH_SIZE]
+        began = time.perf_counter()
+        for user_id, items in utils.hybrid_recommendation_many(chunk, top_n=k).items():
+            ids[user_id] = [item.id for item in items]
+        seconds.extend([(time.perf_counter() - began) / len(chunk)] * len(chunk))
+    return ids, np.array(seconds)
+
+
+# Engines replay the test users and return ({user_id: item ids}, seconds per user)
+ENGINES = {
+    "hybrid":  _per_user(lambda user, k: [item.id for item in utils.hybrid_recommendation(user, k)]),
+    "batch":   _batched,
+    "popular": _per_user(lambda user, k: utils.fallback_ids(k, user=user)),
+}
+
+
+def get_engine(name):
+    """A built-in engine, or the dotted path of a ``(user, k) -> item ids`` function."""
+    if name in ENGINES:
+        return ENGINES[name]
+    return _per_user(import_string(name))
+
+
+def ranking_metrics(recommended, truth_rows, truth_pos, size, catalog_size):
+    """
+    Mean precision@k, recall@k and hit rate over the rows of
+    ``recommended`` (users x k positions, padded with -1), against the
+    held-out ``(row, position)`` pairs, plus catalog coverage.
+    """
+    users, k = recommended.shape
+    if not users:
+        return {"precision": 0.0, "recall": 0.0, "hit_rate": 0.0, "coverage": 0.0}
+    rec_keys = np.arange(users)[:, None] * size + recommended
+    hits = np.isin(rec_keys, truth_rows * size + truth_pos) & (recommended >= 0)
+    per_user = hits.sum(axis=1)
+    relevant = np.bincount(truth_rows, minlength=users)
+    shown = np.unique(recommended[recommended >= 0])
+    return {
+        "precision": float((per_user / k).mean()),
+        "recall": float((per_user / np.maximum(relevant, 1)).mean()),
+        "hit_rate": float((per_user > 0).mean()),
+        "coverage": len(shown) / catalog_size if catalog_size else 0.0,
+    }
+
+
+def latency_percentiles(seconds, percentiles=(50, 90, 99)):
+    """``{"p50": ms, ...}`` plus the maximum, over per-user latencies."""
+    if not len(seconds):
+        return {}
+    ms = np.asarray(seconds) * 1000
+    values = np.percentile(ms, percentiles)
+    return {**{f"p{p}": float(v) for p, v in zip(percentiles, values)}, "max": float(ms.max())}
+
+
+def _matrix(user_ids, ids_by_user, index, k):
+    """Recommended ids as a (users x k) position matrix padded with -1."""
+    lists = [ids_by_user.get(uid, [])[:k] for uid in user_ids]
+    lengths = np.fromiter((len(ids) for ids in lists), dtype=np.int64, count=len(lists))
+    matrix = np.full((len(lists), k), -1, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lists)), lengths)
+    cols = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    matrix[rows, cols] = index.positions([i for ids in lists for i in ids])
+    return matrix
+
+
+def evaluate(engines, split_at, k=10, max_users=None, train_mf=False):
+    """
+    Replay orders from ``split_at`` on through each engine, with the
+    recommender as of ``split_at`` (see ``as_of``). Returns
+    ``{engine: {"users", "seconds", "latency", metrics...}}``.
+    """
+    index = get_item_index()
+    truth_users, truth_pos = held_out(split_at, index)
+    user_ids = np.unique(truth_users)
+    if max_users:
+        user_ids = user_ids[:max_users]
+        keep = np.isin(truth_users, user_ids)
+        truth_users, truth_pos = truth_users[keep], truth_pos[keep]
+    truth_rows = np.searchsorted(user_ids, truth_users)
+    found = get_user_model().objects.in_bulk(user_ids.tolist())
+    users = [found[uid] for uid in user_ids.tolist() if uid in found]
+    catalog_size = MenuItem.objects.count()
+
+    results = {}
+    with as_of(split_at, train_mf):
+        for name in engines:
+            run = get_engine(name)
+            started = time.monotonic()
+            ids_by_user, seconds = run(users, k)
+            elapsed = time.monotonic() - started
+            recommended = _matrix(user_ids.tolist(), ids_by_user, index, k)
+            results[name] = {
+                "users": len(users),
+                "seconds": elapsed,
+                **ranking_metrics(recommended, truth_rows, truth_pos, len(index), catalog_size),
+                "latency": latency_percentiles(seconds),
+            }
+    return results
@@ -0,0 +1,202 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from menu.models import Review
+from order.models import OrderItem
+from .content import LIKED_RATING
+from .snapshot import current_version, write_version
+
+FORMAT_VERSION = 1
+ARRAYS = ("user_ids", "user_factors", "item_ids", "item_factors")
+
+# Interactions per vectorised solve block; bounds the (entries x f x f)
+# temporary to a few tens of MB per thread at 32 factors.
+BLOCK_ENTRIES = 4096
+
+
+class FactorModel:
+    """
+    User and item factors from ``train_als``, loaded from disk.
+
+    ``user_ids`` is sorted so a user's row is found with a binary search;
+    ``aligned`` holds the item factors re-ordered to ``ItemIndex`` positions
+    (zero rows for items the model has not seen) so scoring a user is one
+    matrix-vector product with no queries.
+    """
+
+    def __init__(self, meta, user_ids, user_factors, item_ids, item_factors):
+        self.meta = meta
+        self.user_ids = user_ids
+        self.user_factors = user_factors
+        self.item_ids = item_ids
+        self.item_factors = item_factors
+        self.aligned = None
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    def align(self, index):
+        positions = index.positions(self.item_ids.tolist())
+        aligned = np.zeros((len(index), self.item_factors.shape[1]), dtype=np.float32)
+        aligned[positions] = self.item_factors
+        self.aligned = aligned
+        return self
+
+    def user_vector(self, user_id):
+        row = np.searchsorted(self.user_ids, user_id)
+        if row < len(self.user_ids) and self.user_ids[row] == user_id:
+            return self.user_factors[row]
+        return None
+
+    def scores(self, user_id):
+        """Predicted preference of ``user_id`` for every aligned item, or ``None``."""
+        vec = self.user_vector(user_id)
+        if vec is None:
+            return None
+        return self.aligned @ vec
+
+
+def factors_root():
+    return Path(getattr(settings, "RECOMMENDER_MF_DIR",
+                        Path(settings.BASE_DIR) / "recommender_mf"))
+
+
+def load_factors(version=None, root=None):
+    root = Path(root or factors_root())
+    version = version or current_version(root)
+    if version is None:
+        return None
+    path = root / version
+    meta = json.loads((path / "meta.json").read_text())
+    if meta.get("format") != FORMAT_VERSION:
+        return None
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+    return FactorModel(meta, **arrays)
+
+
+def interactions(index):
+    """
+    (user ids, CSR indptr, item positions, strength) of implicit feedback.
+
+    Each order line counts 1 and each liked review ``rating - 3``, summed
+    per (user, item). Rows follow the sorted ``user ids``.
+    """
+    users, items, weights = [], [], []
+    for user_id, item_id in (OrderItem.objects.values_list("order__customer_id", "menu_item_id")
+                             .iterator(chunk_size=10000)):
+        users.append(user_id)
+        items.append(item_id)
+        weights.append(1)
+    for user_id, item_id, rating in (Review.objects.filter(rating__gte=LIKED_RATING)
+                                     .values_list("user_id", "menu_item_id", "rating")
+                                     .iterator(chunk_size=10000)):
+        users.append(user_id)
+        items.append(item_id)
+        weights.append(rating - 3)
+
+    item_pos = index.positions(items)
+    size = len(index)
+    user_ids, user_row = np.unique(np.asarray(users, dtype=np.int64), return_inverse=True)
+    keys, inverse = np.unique(user_row * size + item_pos, return_inverse=True)
+    strength = np.bincount(inverse, weights=np.asarray(weights, dtype=np.float64))
+    indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // size, minlength=len(user_ids)), out=indptr[1:])
+    return user_ids, indptr, (keys % size).astype(np.int64), strength
+
+
+def _transpose(indptr, indices, values, columns):
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.lexsort((rows, indices))
+    t_indptr = np.zeros(columns + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=columns), out=t_indptr[1:])
+    return t_indptr, rows[order], values[order]
+
+
+def _blocks(indptr):
+    """Row ranges of roughly ``BLOCK_ENTRIES`` interactions each."""
+    nnz = indptr[-1]
+    cuts = np.searchsorted(indptr, np.arange(BLOCK_ENTRIES, nnz, BLOCK_ENTRIES), side="right") - 1
+    cuts = np.unique(np.concatenate([[0], cuts, [len(indptr) - 1]]))
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _solve_block(target, other, gram, indptr, indices, confidence, lo, hi):
+    """
+    Least-squares update of rows ``lo:hi`` of ``target`` with ``other``
+    fixed (Hu, Koren & Volinsky): ``(G + Yᵀ(C-I)Y) x = YᵀC·1``.
+    """
+    counts = np.diff(indptr[lo:hi + 1])
+    target[lo:hi][counts == 0] = 0
+    rows = np.flatnonzero(counts)
+    if not len(rows):
+        return
+    start, end = indptr[lo], indptr[hi]
+    y = other[indices[start:end]]
+    c = confidence[start:end]
+    segments = indptr[lo + rows] - start
+    b = np.add.reduceat((1 + c)[:, None] * y, segments, axis=0)
+    if end - start <= 2 * BLOCK_ENTRIES:
+        # Outer products laid out (f, f, entries) so the segment sums run
+        # along the contiguous axis.
+        yt = np.ascontiguousarray(y.T)
+        outer = yt[:, None, :] * (c * yt)[None, :, :]
+        a = np.moveaxis(np.add.reduceat(outer, segments, axis=2), 2, 0)
+    else:
+        # A single very popular row: one dense product rather than a huge temporary.
+        a = np.stack([y[s:e].T @ (c[s:e, None] * y[s:e]) for s, e in
+                      zip(segments, indptr[lo + rows + 1] - start)])
+    target[lo + rows] = np.linalg.solve(gram + a, b[..., None])[..., 0]
+
+
+def _solve(target, other, indptr, indices, confidence, regularization, pool):
+    gram = other.T @ other + regularization * np.eye(other.shape[1])
+    jobs = [pool.submit(_solve_block, target, other, gram, indptr, indices, confidence, lo, hi)
+            for lo, hi in _blocks(indptr)]
+    for job in jobs:
+        job.result()
+
+
+def train_als(indptr, indices, strength, items, factors=32, regularization=0.1, alpha=40.0,
+              iterations=10, workers=None, seed=0):
+    """
+    Implicit-feedback ALS over a user x item CSR of interaction strengths.
+
+    Confidence is ``1 + alpha * strength``. Rows of each side are solved in
+    blocks on a thread pool; NumPy's solve and BLAS calls release the GIL,
+    so blocks run in parallel. Returns ``(user_factors, item_factors)``.
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.normal(scale=0.01, size=(len(indptr) - 1, factors))
+    y = rng.normal(scale=0.01, size=(items, factors))
+    confidence = alpha * np.asarray(strength, dtype=np.float64)
+    t_indptr, t_indices, t_confidence = _transpose(indptr, indices, confidence, items)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for _ in range(iterations):
+            _solve(x, y, indptr, indices, confidence, regularization, pool)
+            _solve(y, x, t_indptr, t_indices, t_confidence, regularization, pool)
+    return x, y
+
+
+def build_factors(index, root=None, keep=3, **params):
+    """Train on the current order and review history and write a new version."""
+    user_ids, indptr, indices, strength = interactions(index)
+    user_factors, item_factors = train_als(indptr, indices, strength, len(index), **params)
+    arrays = {
+        "user_ids": user_ids,
+        "user_factors": user_factors.astype(np.float32),
+        "item_ids": index.ids,
+        "item_factors": item_factors.astype(np.float32),
+    }
+    meta = {
+        "format": FORMAT_VERSION,
+        "users": len(user_ids),
+        "items": len(index),
+        "interactions": int(indptr[-1]),
+        "params": params,
+    }
+    return write_version(root or factors_root(), arrays, meta, keep)
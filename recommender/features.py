@@ -0,0 +1,37 @@
+from collections import Counter
+from django.db import transaction
+from order.models import Order, OrderItem
+from .models import UserItemStats, UserStats
+
+
+def refresh_user_features(user_id):
+    """
+    Recompute one user's feature rows from their orders: the ``UserStats``
+    totals and a ``UserItemStats`` row per item ordered. Called on commit
+    of every order and order line write (see ``recommender.signals``) so
+    scoring reads rows, not aggregates.
+
+    Users without orders get no rows, which also covers a user deleted
+    together with their orders.
+    """
+    totals = list(Order.objects.filter(customer_id=user_id).values_list("total_price", flat=True))
+    items = Counter(OrderItem.objects.filter(order__customer_id=user_id).values_list("menu_item_id", flat=True))
+
+    with transaction.atomic():
+        if not totals:
+            UserStats.objects.filter(user_id=user_id).delete()
+            UserItemStats.objects.filter(user_id=user_id).delete()
+            return
+
+        UserStats.objects.update_or_create(
+            user_id=user_id,
+            defaults={"order_count": len(totals), "total_spent": sum(totals)},
+        )
+        UserItemStats.objects.filter(user_id=user_id).exclude(menu_item_id__in=list(items)).delete()
+        UserItemStats.objects.bulk_create(
+            [UserItemStats(user_id=user_id, menu_item_id=item_id, order_count=n)
+             for item_id, n in items.items()],
+            update_conflicts=True,
+            unique_fields=["user", "menu_item"],
+            update_fields=["order_count"],
+        )
@@ -0,0 +1,92 @@
+from collections import defaultdict
+import numpy as np
+from menu.models import MenuItem, RecipeIngredient
+
+
+class ItemAttributes:
+    """
+    Read-only catalog attributes by item position, used to filter results.
+
+    Besides per-position price and availability it keeps category and
+    ingredient lookups (id -> positions), so every filter is built from
+    arrays already in memory rather than a query.
+    """
+
+    def __init__(self, known, available, price, by_category, by_ingredient):
+        self.known = known
+        self.available = available
+        self.price = price
+        self.by_category = by_category
+        self.by_ingredient = by_ingredient
+        for arr in (known, available, price, *by_category.values(), *by_ingredient.values()):
+            arr.setflags(write=False)
+
+    @property
+    def size(self):
+        return len(self.known)
+
+
+def build_item_attributes(index):
+    rows = list(MenuItem.objects.values_list("id", "category_id", "price", "is_available"))
+    links = set(RecipeIngredient.objects.values_list("recipe__menu_item_id", "ingredient_id"))
+    positions = index.positions([item_id for item_id, *_ in rows])
+    link_pos = index.positions([item_id for item_id, _ in links])
+
+    size = len(index)
+    known = np.zeros(size, dtype=bool)
+    available = np.zeros(size, dtype=bool)
+    price = np.full(size, np.nan)
+    categories = defaultdict(list)
+    for pos, (_, category_id, item_price, is_available) in zip(positions.tolist(), rows):
+        known[pos] = True
+        available[pos] = is_available
+        price[pos] = float(item_price)
+        categories[category_id].append(pos)
+    ingredients = defaultdict(list)
+    for pos, (_, ingredient_id) in zip(link_pos.tolist(), links):
+        ingredients[ingredient_id].append(pos)
+
+    return ItemAttributes(
+        known, available, price,
+        {c: np.asarray(p, dtype=np.int64) for c, p in categories.items()},
+        {i: np.asarray(p, dtype=np.int64) for i, p in ingredients.items()},
+    )
+
+
+class ItemFilter:
+    """
+    Restrictions a client puts on recommended items: categories to keep, a
+    maximum price, ingredients to avoid and whether only available items
+    count. ``mask`` turns them into a boolean array over item positions.
+    """
+
+    def __init__(self, categories=(), max_price=None, exclude_ingredients=(), available_only=True):
+        self.categories = tuple(sorted(set(categories)))
+        self.max_price = None if max_price is None else float(max_price)
+        self.exclude_ingredients = tuple(sorted(set(exclude_ingredients)))
+        self.available_only = available_only
+
+    def key(self):
+        """Canonical form for cache keys."""
+        return "c{}:p{}:x{}:a{}".format(
+            ",".join(map(str, self.categories)),
+            "" if self.max_price is None else self.max_price,
+            ",".join(map(str, self.exclude_ingredients)),
+            int(self.available_only),
+        )
+
+    def mask(self, attrs, size):
+        """Items passing the filter; positions past ``attrs`` (unknown items) never pass."""
+        mask = np.zeros(size, dtype=bool)
+        n = min(size, attrs.size)
+        mask[:n] = (attrs.available if self.available_only else attrs.known)[:n]
+        if self.categories:
+            keep = np.zeros(size, dtype=bool)
+            for category_id in self.categories:
+                keep[attrs.by_category.get(category_id, [])] = True
+            mask &= keep
+        if self.max_price is not None:
+            mask[:n] &= attrs.price[:n] <= self.max_price
+        for ingredient_id in self.exclude_ingredients:
+            mask[attrs.by_ingredient.get(ingredient_id, [])] = False
+        return mask
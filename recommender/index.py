@@ -0,0 +1,93 @@
+import threading
+import numpy as np
+from menu.models import MenuItem
+
+
+class ItemIndex:
+    """
+    Append-only mapping between menu item ids and dense array positions.
+
+    Positions never move once assigned, so a vector built against an older,
+    shorter index stays valid: it is simply zero-padded to the current size.
+    """
+
+    def __init__(self, ids=()):
+        self._lock = threading.Lock()
+        self.ids = np.asarray(list(ids), dtype=np.int64)
+        self.pos = {int(i): p for p, i in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self.pos
+
+    def extend(self, ids):
+        new = [int(i) for i in ids if i not in self.pos]
+        if not new:
+            return
+        with self._lock:
+            new = list(dict.fromkeys(i for i in new if i not in self.pos))
+            start = len(self.ids)
+            # ids first: readers without the lock that find an id in pos
+            # must also find its position in ids.
+            self.ids = np.concatenate([self.ids, np.asarray(new, dtype=np.int64)])
+            self.pos.update({i: start + p for p, i in enumerate(new)})
+
+    def positions(self, ids):
+        self.extend(ids)
+        return np.fromiter((self.pos[int(i)] for i in ids), dtype=np.int64, count=len(ids))
+
+    def vector(self, part, dtype=np.float64):
+        """Dense vector for a component result (``{item_id: score}`` or array)."""
+        size = len(self.ids)
+        if isinstance(part, np.ndarray):
+            if len(part) >= size:
+                return part.astype(dtype, copy=False)
+            out = np.zeros(size, dtype=dtype)
+            out[:len(part)] = part
+            return out
+        if part:
+            pos = self.positions(list(part.keys()))
+            size = len(self.ids)
+        out = np.zeros(size, dtype=dtype)
+        if part:
+            out[pos] = np.fromiter(part.values(), dtype=dtype, count=len(part))
+        return out
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_item_index(build=True):
+    global _INDEX
+    if _INDEX is None and build:
+        # Concurrent first callers wait for a single build.
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = ItemIndex(MenuItem.objects.order_by("id").values_list("id", flat=True))
+    return _INDEX
+
+
+def set_item_index(index):
+    global _INDEX
+    _INDEX = index
+
+
+def top_positions(scores, k=None):
+    """
+    Positions of the ``k`` highest finite scores, best first.
+
+    Uses a partial sort so only the selected slice is fully ordered; ties are
+    broken by position (i.e. by catalog order) to keep results deterministic.
+    """
+    candidates = np.flatnonzero(np.isfinite(scores))
+    if k is not None and k < len(candidates):
+        if k <= 0:
+            return candidates[:0]
+        values = scores[candidates]
+        kth = -np.partition(-values, k - 1)[k - 1]
+        candidates = candidates[values >= kth]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
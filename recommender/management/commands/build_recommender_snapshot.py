@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from recommender.snapshot import build_snapshot, snapshot_root
+from recommender.spend import SPEND_TIERS, learn_spend_tiers
+
+
+class Command(BaseCommand):
+    help = "Build a new recommender model snapshot and make it current"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Snapshot directory (default: RECOMMENDER_SNAPSHOT_DIR)")
+        parser.add_argument("--keep", type=int, default=3, help="Number of versions to keep on disk")
+        parser.add_argument("--learn-spend-tiers", action="store_true",
+                            help="Cluster customers' average spend with k-means instead of "
+                                 "using the fixed SPEND_TIERS")
+
+    def handle(self, *args, **options):
+        root = options["dir"] or snapshot_root()
+        tiers = learn_spend_tiers() if options["learn_spend_tiers"] else SPEND_TIERS
+        version = build_snapshot(root=root, keep=options["keep"], spend_tiers=tiers)
+        self.stdout.write(f"Spend tiers: {', '.join(f'{t:.2f}' for t in tiers)}")
+        self.stdout.write(self.style.SUCCESS(f"Recommender snapshot {version} written to {root}"))
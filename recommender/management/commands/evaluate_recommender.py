@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from recommender.evaluation import ENGINES, evaluate, split_time
+
+
+class Command(BaseCommand):
+    help = ("Replay orders placed after a time split through one or more recommender engines and "
+            "report precision@k, recall@k, coverage and latency. Changes are made in a transaction "
+            "that is rolled back; run against a copy of production data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--engine", action="append",
+                            help=f"{', '.join(ENGINES)} or the dotted path of a (user, k) -> item ids "
+                                 "function; repeat to compare (default: hybrid)")
+        parser.add_argument("--k", type=int, default=10, help="Recommendations per user")
+        parser.add_argument("--split", help="Split time, ISO 8601 (default: from --test-fraction)")
+        parser.add_argument("--test-fraction", type=float, default=0.2,
+                            help="Share of the latest orders held out when --split is not given")
+        parser.add_argument("--max-users", type=int, help="Evaluate at most this many test users")
+        parser.add_argument("--mf", action="store_true", help="Train ALS factors on the training split")
+
+    def handle(self, *args, **options):
+        if options["split"]:
+            split_at = parse_datetime(options["split"])
+            if split_at is None:
+                raise CommandError("--split must be an ISO 8601 date and time.")
+            if timezone.is_naive(split_at):
+                split_at = timezone.make_aware(split_at)
+        else:
+            split_at = split_time(options["test_fraction"])
+            if split_at is None:
+                raise CommandError("No orders to evaluate.")
+
+        k = options["k"]
+        results = evaluate(options["engine"] or ["hybrid"], split_at, k=k,
+                           max_users=options["max_users"], train_mf=options["mf"])
+        self.stdout.write(f"Split at {split_at.isoformat()}")
+        for name, r in results.items():
+            latency = " ".join(f"{key} {ms:.1f}ms" for key, ms in r["latency"].items())
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: precision@{k} {r['precision']:.4f}  recall@{k} {r['recall']:.4f}  "
+                f"hit rate {r['hit_rate']:.4f}  coverage {r['coverage']:.4f}  "
+                f"latency {latency}  ({r['users']} users, {r['seconds']:.1f}s)"
+            ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from recommender.index import get_item_index
+from recommender.neighbors import neighbors_k, rebuild_neighbors
+
+
+class Command(BaseCommand):
+    help = "Recompute the similar-items table from basket pairs and recipe ingredients"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, help="Neighbours kept per item (default: RECOMMENDER_NEIGHBORS)")
+
+    def handle(self, *args, **options):
+        k = options["k"] or neighbors_k()
+        rows = rebuild_neighbors(get_item_index(), k=k)
+        self.stdout.write(self.style.SUCCESS(f"Item neighbours rebuilt: {rows} rows (k={k})"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from recommender.popularity import rebuild_popularity
+
+
+class Command(BaseCommand):
+    help = "Recompute decayed item popularity and rolling-window buckets from order history"
+
+    def handle(self, *args, **kwargs):
+        items = rebuild_popularity()
+        self.stdout.write(self.style.SUCCESS(f"Popularity rebuilt for {items} menu items"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recommender.cooccurrence import reconcile_pairs
+
+
+class Command(BaseCommand):
+    help = "Recount basket item pairs from the full order history"
+
+    def handle(self, *args, **kwargs):
+        created, updated, deleted = reconcile_pairs()
+        self.stdout.write(self.style.SUCCESS(
+            f"Item pairs reconciled: {created} created, {updated} updated, {deleted} deleted"
+        ))
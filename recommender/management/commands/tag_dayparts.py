@@ -0,0 +1,44 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import ExtractHour
+from menu.models import MenuItem
+from order.models import OrderItem
+from recommender.caching import invalidate_catalog
+from recommender.utils import daypart_of_hour
+
+
+class Command(BaseCommand):
+    help = "Tag menu items with the daypart they are mostly ordered in"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-orders", type=int, default=5,
+                            help="Ignore items ordered fewer times than this")
+        parser.add_argument("--min-share", type=float, default=0.5,
+                            help="Share of orders the top daypart needs to win")
+
+    def handle(self, *args, **options):
+        hours = (OrderItem.objects
+                 .annotate(hour=ExtractHour("order__created_at"))
+                 .values_list("menu_item_id", "hour")
+                 .annotate(c=Count("id")))
+        counts = defaultdict(lambda: defaultdict(int))
+        for item_id, hour, c in hours:
+            counts[item_id][daypart_of_hour(hour)] += c
+
+        changed = []
+        for item in MenuItem.objects.filter(id__in=list(counts)).only("id", "daypart"):
+            parts = counts[item.id]
+            total = sum(parts.values())
+            best, best_count = max(parts.items(), key=lambda kv: kv[1])
+            if total < options["min_orders"] or best_count / total < options["min_share"]:
+                continue
+            if item.daypart != best:
+                item.daypart = best
+                changed.append(item)
+
+        MenuItem.objects.bulk_update(changed, ["daypart"], batch_size=500)
+        if changed:
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f"Daypart updated for {len(changed)} menu items"))
+
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from recommender.factorization import build_factors, factors_root
+from recommender.index import get_item_index
+
+
+class Command(BaseCommand):
+    help = "Train implicit-feedback ALS factors on orders and reviews and make them current"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Output directory (default: RECOMMENDER_MF_DIR)")
+        parser.add_argument("--keep", type=int, default=3, help="Number of versions to keep on disk")
+        parser.add_argument("--factors", type=int, default=32)
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--regularization", type=float, default=0.1)
+        parser.add_argument("--alpha", type=float, default=40.0, help="Confidence per unit of interaction")
+        parser.add_argument("--workers", type=int, help="Solver threads (default: CPU count)")
+
+    def handle(self, *args, **options):
+        root = options["dir"] or factors_root()
+        started = time.monotonic()
+        version = build_factors(
+            get_item_index(), root=root, keep=options["keep"],
+            factors=options["factors"], iterations=options["iterations"],
+            regularization=options["regularization"], alpha=options["alpha"],
+            workers=options["workers"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Factor model {version} written to {root} in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+
+METRICS_PREFIX = "recommender:metrics:"
+COUNTERS = ("recommend.responses", "recommend.degraded", "recommend.fallback")
+
+# Counts not yet added to the shared counters, per process
+_PENDING = Counter()
+_PENDING_LOCK = threading.Lock()
+_FLUSHED_AT = time.monotonic()
+
+
+def incr(name, n=1):
+    key = METRICS_PREFIX + name
+    try:
+        cache.incr(key, n)
+    except ValueError:
+        if not cache.add(key, n, timeout=None):
+            cache.incr(key, n)
+
+
+def record_recommendation(status):
+    """
+    Count one /recommend/ response and whether it was degraded or a
+    fallback. Counts build up in the process and reach the shared counters
+    at most every ``RECOMMENDER_METRICS_FLUSH_SECONDS``, one ``incr`` per
+    counter, so responses (cache hits included) don't each write to the
+    cache.
+    """
+    global _FLUSHED_AT
+    interval = getattr(settings, "RECOMMENDER_METRICS_FLUSH_SECONDS", 10)
+    with _PENDING_LOCK:
+        _PENDING["recommend.responses"] += 1
+        if status.get("degraded"):
+            _PENDING["recommend.degraded"] += 1
+        if status.get("fallback"):
+            _PENDING["recommend.fallback"] += 1
+        due = time.monotonic() - _FLUSHED_AT >= interval
+        if due:
+            _FLUSHED_AT = time.monotonic()
+    if due:
+        flush()
+
+
+def flush():
+    """Add this process's pending counts to the shared counters."""
+    with _PENDING_LOCK:
+        pending = dict(_PENDING)
+        _PENDING.clear()
+    for name, n in pending.items():
+        incr(name, n)
+
+
+def counters():
+    """
+    Shared counter values. Other processes' latest counts arrive with their
+    next flush, up to ``RECOMMENDER_METRICS_FLUSH_SECONDS`` later.
+    """
+    flush()
+    values = cache.get_many([METRICS_PREFIX + name for name in COUNTERS])
+    return {name: values.get(METRICS_PREFIX + name, 0) for name in COUNTERS}
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("menu", "0005_category_created_at_category_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ItemPair",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "item_a",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="menu.menuitem",
+                    ),
+                ),
+                (
+                    "item_b",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="menu.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("item_a", "item_b")},
+            },
+        ),
+    ]
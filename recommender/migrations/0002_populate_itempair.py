@@ -0,0 +1,36 @@
+import itertools
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def populate_item_pairs(apps, schema_editor):
+    OrderItem = apps.get_model("order", "OrderItem")
+    ItemPair = apps.get_model("recommender", "ItemPair")
+
+    counts = defaultdict(int)
+    rows = (
+        OrderItem.objects.order_by("order_id")
+        .values_list("order_id", "menu_item_id")
+        .iterator(chunk_size=10000)
+    )
+    for _, group in itertools.groupby(rows, key=lambda r: r[0]):
+        ids = sorted({item_id for _, item_id in group})
+        for a, b in itertools.combinations(ids, 2):
+            counts[(a, b)] += 1
+
+    ItemPair.objects.bulk_create(
+        [ItemPair(item_a_id=a, item_b_id=b, count=n) for (a, b), n in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0001_initial"),
+        ("recommender", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_item_pairs, migrations.RunPython.noop),
+    ]
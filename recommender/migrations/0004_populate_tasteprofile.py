@@ -0,0 +1,44 @@
+from collections import Counter, defaultdict
+
+from django.db import migrations
+
+
+def populate_taste_profiles(apps, schema_editor):
+    Review = apps.get_model("menu", "Review")
+    RecipeIngredient = apps.get_model("menu", "RecipeIngredient")
+    TasteProfile = apps.get_model("recommender", "TasteProfile")
+
+    liked = defaultdict(set)
+    for user_id, item_id in Review.objects.filter(rating__gte=4).values_list(
+        "user_id", "menu_item_id"
+    ):
+        liked[user_id].add(item_id)
+
+    item_ingredients = defaultdict(set)
+    for item_id, ingredient_id in RecipeIngredient.objects.values_list(
+        "recipe__menu_item_id", "ingredient_id"
+    ):
+        item_ingredients[item_id].add(ingredient_id)
+
+    profiles = []
+    for user_id, items in liked.items():
+        counts = Counter(ing for item in items for ing in item_ingredients[item])
+        profiles.append(
+            TasteProfile(
+                user_id=user_id,
+                liked_items=sorted(items),
+                ingredients={str(k): v for k, v in counts.items()},
+            )
+        )
+    TasteProfile.objects.bulk_create(profiles, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0005_category_created_at_category_updated_at_and_more"),
+        ("recommender", "0003_tasteprofile"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_taste_profiles, migrations.RunPython.noop),
+    ]
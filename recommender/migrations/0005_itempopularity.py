@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0007_tag_menuitem_daypart"),
+        ("recommender", "0004_populate_tasteprofile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ItemPopularity",
+            fields=[
+                (
+                    "menu_item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity",
+                        serialize=False,
+                        to="menu.menuitem",
+                    ),
+                ),
+                ("score", models.FloatField(default=0)),
+                ("score_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("total", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ItemDemandBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField(db_index=True)),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "menu_item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="menu.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("menu_item", "hour")},
+            },
+        ),
+    ]
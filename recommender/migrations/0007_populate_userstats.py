@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def populate_user_stats(apps, schema_editor):
+    Order = apps.get_model("order", "Order")
+    UserStats = apps.get_model("recommender", "UserStats")
+
+    totals = (
+        Order.objects.values("customer_id")
+        .annotate(n=Count("id"), s=Sum("total_price"))
+        .values_list("customer_id", "n", "s")
+    )
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id, order_count=n, total_spent=s or 0)
+            for user_id, n, s in totals
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0001_initial"),
+        ("recommender", "0006_userstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
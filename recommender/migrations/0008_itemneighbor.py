@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0007_tag_menuitem_daypart"),
+        ("recommender", "0007_populate_userstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ItemNeighbor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbors",
+                        to="menu.menuitem",
+                    ),
+                ),
+                (
+                    "neighbor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="menu.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["item", "rank"],
+                "unique_together": {("item", "rank")},
+            },
+        ),
+    ]
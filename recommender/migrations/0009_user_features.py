@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("menu", "0007_tag_menuitem_daypart"),
+        ("recommender", "0008_itemneighbor"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userstats",
+            name="categories",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name="userstats",
+            name="dayparts",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.CreateModel(
+            name="UserItemStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("order_count", models.PositiveIntegerField(default=0)),
+                ("last_ordered_at", models.DateTimeField()),
+                (
+                    "menu_item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="menu.menuitem",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "user item stats",
+                "unique_together": {("user", "menu_item")},
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+from collections import Counter, defaultdict
+
+from django.db import migrations
+from django.db.models import Count, Max
+from django.utils import timezone
+
+
+def _daypart(hour):
+    # Frozen copy of recommender.utils.daypart_of_hour.
+    if hour < 12:
+        return "breakfast"
+    if hour < 17:
+        return "lunch"
+    return "dinner"
+
+
+def populate_user_features(apps, schema_editor):
+    Order = apps.get_model("order", "Order")
+    OrderItem = apps.get_model("order", "OrderItem")
+    UserStats = apps.get_model("recommender", "UserStats")
+    UserItemStats = apps.get_model("recommender", "UserItemStats")
+
+    dayparts = defaultdict(Counter)
+    for user_id, created_at in Order.objects.values_list(
+        "customer_id", "created_at"
+    ).iterator(chunk_size=10000):
+        dayparts[user_id][_daypart(timezone.localtime(created_at).hour)] += 1
+
+    categories = defaultdict(dict)
+    for user_id, category_id, n in (
+        OrderItem.objects.values("order__customer_id", "menu_item__category_id")
+        .annotate(n=Count("id"))
+        .values_list("order__customer_id", "menu_item__category_id", "n")
+    ):
+        categories[user_id][str(category_id)] = n
+
+    stats = list(UserStats.objects.all())
+    for row in stats:
+        row.dayparts = dict(dayparts.get(row.user_id, {}))
+        row.categories = categories.get(row.user_id, {})
+    UserStats.objects.bulk_update(
+        stats, ["dayparts", "categories"], batch_size=1000
+    )
+
+    counts = (
+        OrderItem.objects.values("order__customer_id", "menu_item_id")
+        .annotate(n=Count("id"), last=Max("created_at"))
+        .values_list("order__customer_id", "menu_item_id", "n", "last")
+    )
+    UserItemStats.objects.bulk_create(
+        [
+            UserItemStats(
+                user_id=user_id,
+                menu_item_id=item_id,
+                order_count=n,
+                last_ordered_at=last,
+            )
+            for user_id, item_id, n, last in counts
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0001_initial"),
+        ("recommender", "0009_user_features"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_user_features, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recommender", "0010_populate_user_features"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="itempair",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
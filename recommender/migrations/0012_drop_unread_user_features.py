@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recommender", "0011_itempair_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="useritemstats",
+            name="last_ordered_at",
+        ),
+        migrations.RemoveField(
+            model_name="userstats",
+            name="categories",
+        ),
+        migrations.RemoveField(
+            model_name="userstats",
+            name="dayparts",
+        ),
+    ]
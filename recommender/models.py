@@ -1,3 +1,117 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from menu.models import MenuItem
 
-# Create your models here.
+
+# ---------------------------------------------------------------------
+# ItemPair  (how many orders contain both items; item_a < item_b)
+# ---------------------------------------------------------------------
+class ItemPair(models.Model):
+    item_a     = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    item_b     = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    count      = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)   # read by apply_pair_changes
+
+    class Meta:
+        unique_together = ("item_a", "item_b")
+
+    def __str__(self):
+        return f"{self.item_a_id} + {self.item_b_id} ({self.count})"
+
+
+# ---------------------------------------------------------------------
+# TasteProfile  (liked items and ingredient counts used by content_scores)
+# ---------------------------------------------------------------------
+class TasteProfile(models.Model):
+    user        = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                       related_name="taste_profile")
+    liked_items = models.JSONField(default=list)   # menu item ids rated >= 4
+    ingredients = models.JSONField(default=dict)   # {ingredient_id: liked items using it}
+    updated_at  = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Taste profile of {self.user}"
+
+
+# ---------------------------------------------------------------------
+# ItemPopularity  (time-decayed order-line counter per item)
+# ---------------------------------------------------------------------
+class ItemPopularity(models.Model):
+    menu_item = models.OneToOneField(MenuItem, on_delete=models.CASCADE, primary_key=True,
+                                     related_name="popularity")
+    score     = models.FloatField(default=0)            # decayed order lines as of score_at
+    score_at  = models.DateTimeField(default=timezone.now)
+    total     = models.PositiveIntegerField(default=0)  # all-time order lines
+
+    def __str__(self):
+        return f"{self.menu_item_id}: {self.score:.2f} ({self.total} total)"
+
+
+# ---------------------------------------------------------------------
+# ItemDemandBucket  (order lines per item per hour, for rolling windows)
+# ---------------------------------------------------------------------
+class ItemDemandBucket(models.Model):
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    hour      = models.DateTimeField(db_index=True)     # start of the hour
+    count     = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("menu_item", "hour")
+
+    def __str__(self):
+        return f"{self.menu_item_id} @ {self.hour:%Y-%m-%d %H}:00 ({self.count})"
+
+
+# ---------------------------------------------------------------------
+# UserStats  (per-user order features, kept current by recommender.features)
+# ---------------------------------------------------------------------
+class UserStats(models.Model):
+    user        = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                       primary_key=True, related_name="recommender_stats")
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at  = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "user stats"
+
+    @property
+    def average_spend(self):
+        return self.total_spent / self.order_count if self.order_count else 0
+
+    def __str__(self):
+        return f"{self.user_id}: {self.order_count} orders, {self.total_spent} spent"
+
+
+# ---------------------------------------------------------------------
+# ItemNeighbor  (precomputed top-k similar items per item, best rank 0)
+# ---------------------------------------------------------------------
+class ItemNeighbor(models.Model):
+    item     = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="neighbors")
+    neighbor = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    rank     = models.PositiveSmallIntegerField()
+    score    = models.FloatField()   # blended basket + ingredient similarity
+
+    class Meta:
+        unique_together = ("item", "rank")
+        ordering = ["item", "rank"]
+
+    def __str__(self):
+        return f"{self.item_id} -> {self.neighbor_id} (#{self.rank}, {self.score:.3f})"
+
+
+# ---------------------------------------------------------------------
+# UserItemStats  (order lines per user per item, kept current by recommender.features)
+# ---------------------------------------------------------------------
+class UserItemStats(models.Model):
+    user        = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    menu_item   = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "menu_item")
+        verbose_name_plural = "user item stats"
+
+    def __str__(self):
+        return f"{self.user_id} x {self.menu_item_id}: {self.order_count}"
@@ -0,0 +1,91 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from . import utils
+from .content import build_ingredient_model
+from .cooccurrence import build_from_table
+from .index import top_positions
+from .models import ItemNeighbor
+
+# Blend of the two item-item similarities stored in ItemNeighbor
+NEIGHBOR_WEIGHTS = {"basket": 0.6, "ingredients": 0.4}
+
+# Items whose similarity rows are computed together in rebuild_neighbors
+BLOCK_ROWS = 256
+
+
+def neighbors_k():
+    return getattr(settings, "RECOMMENDER_NEIGHBORS", 10)
+
+
+def similarity_rows(positions, cooc, content_model, size):
+    """
+    Blended similarity of the items at ``positions`` to every one of
+    ``size`` items.
+
+    The basket part is the co-occurrence count normalised by both items'
+    marginals, the ingredient part the cosine of their TF-IDF rows. An item
+    is never its own neighbour.
+    """
+    marginals = np.zeros(size)
+    marginals[:len(cooc.marginals)] = cooc.marginals[:size]
+    sims = NEIGHBOR_WEIGHTS["ingredients"] * content_model.similarities(positions, size)
+    for r, pos in enumerate(positions):
+        cols, data = cooc.row(pos)
+        if len(cols) and marginals[pos]:
+            sims[r, cols] += NEIGHBOR_WEIGHTS["basket"] * data / np.sqrt(marginals[pos] * marginals[cols])
+    sims[np.arange(len(positions)), positions] = 0
+    return np.round(sims, 9)
+
+
+def _live_items(index):
+    """Mask of index positions whose menu item still exists (snapshots may be older)."""
+    known = utils.item_attributes().known
+    live = np.zeros(len(index), dtype=bool)
+    n = min(len(known), len(index))
+    live[:n] = known[:n]
+    return live
+
+
+def _neighbor_rows(index, positions, cooc, content_model, live, k):
+    for pos, row in zip(positions, similarity_rows(positions, cooc, content_model, len(live))):
+        best = top_positions(np.where((row > 0) & live, row, -np.inf), k)
+        for rank, other in enumerate(best):
+            yield ItemNeighbor(item_id=int(index.ids[pos]), neighbor_id=int(index.ids[other]),
+                               rank=rank, score=float(row[other]))
+
+
+def rebuild_neighbors(index, k=None):
+    """Recompute every item's neighbours from ``ItemPair`` and recipes; returns rows written."""
+    k = k or neighbors_k()
+    cooc = build_from_table(index)
+    content_model = build_ingredient_model(index)
+    live = _live_items(index)
+    rows = []
+    for start in range(0, len(index), BLOCK_ROWS):
+        positions = np.flatnonzero(live[start:start + BLOCK_ROWS]) + start
+        rows.extend(_neighbor_rows(index, positions, cooc, content_model, live, k))
+    with transaction.atomic():
+        ItemNeighbor.objects.all().delete()
+        ItemNeighbor.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def refresh_neighbors(item_ids, index, cooc, content_model, k=None):
+    """
+    Replace the neighbour rows of ``item_ids`` using the given (already
+    current) co-occurrence matrix and ingredient model.
+
+    Only these items' own lists change; other items that list them catch
+    up on the next ``rebuild_neighbors``.
+    """
+    if not item_ids:
+        return
+    k = k or neighbors_k()
+    positions = index.positions(list(item_ids))
+    live = _live_items(index)
+    positions = positions[live[positions]]
+    rows = list(_neighbor_rows(index, positions, cooc, content_model, live, k))
+    with transaction.atomic():
+        ItemNeighbor.objects.filter(item_id__in=item_ids).delete()
+        ItemNeighbor.objects.bulk_create(rows)
@@ -0,0 +1,137 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from order.models import OrderItem
+from .models import ItemDemandBucket, ItemPopularity
+
+# Rolling windows readable from the counters, longest last
+WINDOWS = {
+    "hour": timedelta(hours=1),
+    "day":  timedelta(days=1),
+    "week": timedelta(days=7),
+}
+
+
+def decay_rate():
+    """Per-second exponential decay rate from the configured half-life."""
+    half_life = getattr(settings, "RECOMMENDER_POPULARITY_HALF_LIFE_HOURS", 72) * 3600
+    return math.log(2) / half_life
+
+
+def _hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def record_order_lines(item_ids, when=None):
+    """
+    Add one order line per entry of ``item_ids`` at ``when`` to the decayed
+    counters and the hourly buckets.
+    """
+    when = when or timezone.now()
+    lines = defaultdict(int)
+    for item_id in item_ids:
+        lines[item_id] += 1
+    rate = decay_rate()
+
+    with transaction.atomic():
+        rows = {p.menu_item_id: p for p in
+                ItemPopularity.objects.select_for_update().filter(menu_item_id__in=list(lines))}
+        for item_id, n in lines.items():
+            row = rows.get(item_id)
+            if row is None:
+                try:
+                    with transaction.atomic():
+                        ItemPopularity.objects.create(menu_item_id=item_id, score=n, score_at=when, total=n)
+                    continue
+                except IntegrityError:
+                    # A concurrent first order of the item created the row.
+                    row = ItemPopularity.objects.select_for_update().get(menu_item_id=item_id)
+            age = (when - row.score_at).total_seconds()
+            row.score = row.score * math.exp(-rate * max(age, 0)) + n
+            row.score_at = max(when, row.score_at)
+            row.total += n
+            row.save(update_fields=["score", "score_at", "total"])
+
+    hour = _hour(when)
+    for item_id, n in lines.items():
+        bucket = ItemDemandBucket.objects.filter(menu_item_id=item_id, hour=hour)
+        if bucket.update(count=F("count") + n):
+            continue
+        try:
+            with transaction.atomic():
+                ItemDemandBucket.objects.create(menu_item_id=item_id, hour=hour, count=n)
+        except IntegrityError:
+            bucket.update(count=F("count") + n)
+
+
+def record_lines(lines):
+    """``record_order_lines`` for ``(item_id, created_at)`` pairs, one call per hour they fall in."""
+    by_hour = defaultdict(list)
+    for item_id, when in lines:
+        by_hour[_hour(when)].append((item_id, when))
+    for group in by_hour.values():
+        record_order_lines([item_id for item_id, _ in group], max(when for _, when in group))
+
+
+def decayed_scores(index, now=None):
+    """Decayed order-line counts as of ``now``, aligned with ``index``."""
+    now = now or timezone.now()
+    rows = list(ItemPopularity.objects.values_list("menu_item_id", "score", "score_at"))
+    if not rows:
+        return None
+    ids, scores, at = zip(*rows)
+    age = np.array([(now - t).total_seconds() for t in at])
+    values = np.asarray(scores) * np.exp(-decay_rate() * np.maximum(age, 0))
+    return index.vector(dict(zip(ids, values)))
+
+
+def window_counts(index, now=None):
+    """``{window: order lines per item}`` over each rolling window in ``WINDOWS``."""
+    now = now or timezone.now()
+    sums = {f"last_{name}": Sum("count", filter=Q(hour__gte=_hour(now - span)))
+            for name, span in WINDOWS.items()}
+    rows = list(ItemDemandBucket.objects.filter(hour__gte=_hour(now - max(WINDOWS.values())))
+                .values("menu_item_id").annotate(**sums))
+    return {name: index.vector({r["menu_item_id"]: r[f"last_{name}"] or 0 for r in rows})
+            for name in WINDOWS}
+
+
+def rebuild_popularity(now=None):
+    """
+    Recompute the counters and recent buckets from the order history and
+    drop buckets older than the longest window. Returns items counted.
+    """
+    now = now or timezone.now()
+    rate = decay_rate()
+    scores, totals = defaultdict(float), defaultdict(int)
+    for item_id, created_at in (OrderItem.objects.values_list("menu_item_id", "created_at")
+                                .iterator(chunk_size=10000)):
+        age = max((now - created_at).total_seconds(), 0)
+        scores[item_id] += math.exp(-rate * age)
+        totals[item_id] += 1
+
+    since = _hour(now - max(WINDOWS.values()))
+    buckets = (OrderItem.objects.filter(created_at__gte=since)
+               .annotate(hour=TruncHour("created_at"))
+               .values_list("menu_item_id", "hour")
+               .annotate(c=Count("id")))
+
+    with transaction.atomic():
+        ItemPopularity.objects.all().delete()
+        ItemPopularity.objects.bulk_create(
+            [ItemPopularity(menu_item_id=i, score=scores[i], score_at=now, total=totals[i])
+             for i in totals],
+            batch_size=1000,
+        )
+        ItemDemandBucket.objects.all().delete()
+        ItemDemandBucket.objects.bulk_create(
+            [ItemDemandBucket(menu_item_id=i, hour=hour, count=c) for i, hour, c in buckets],
+            batch_size=1000,
+        )
+    return len(totals)
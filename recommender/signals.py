@@ -0,0 +1,203 @@
+import logging
+import weakref
+from contextlib import contextmanager
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from menu.models import MenuItem, Recipe, RecipeIngredient, Review, SpecialOffer
+from order.models import Order, OrderItem
+from outlet.models import Table
+from . import utils
+from .caching import invalidate_catalog, invalidate_table, invalidate_user
+from .content import LIKED_RATING, build_ingredient_model, refresh_taste_profile
+from .cooccurrence import increment_pairs, new_pairs_for
+from .features import refresh_user_features
+from .neighbors import refresh_neighbors
+from .popularity import record_lines
+
+logger = logging.getLogger(__name__)
+
+
+def _run_logged(func, *args):
+    # Upkeep runs after the write has committed, so a failure is logged
+    # rather than raised into the caller, and the callbacks queued after it
+    # (cache invalidation among them) still run.
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Recommender upkeep %s%r failed after commit",
+                         getattr(func, "__qualname__", func), args)
+
+
+def _on_commit(func, *args):
+    transaction.on_commit(partial(_run_logged, func, *args))
+
+
+class _Pending:
+    """
+    Upkeep owed once the current transaction commits, collected across all
+    of its writes so each piece runs once however many rows changed: basket
+    pairs and order lines to count, customers whose feature rows and cached
+    results are stale, and tables whose cached scan payloads are.
+    """
+
+    def __init__(self, registry=None, key=None):
+        self.pairs = []
+        self.lines = []
+        self.customers = set()
+        self.tables = set()
+        self.owners = {}
+        self._registry = registry
+        self._key = key
+
+    def owner(self, order_item):
+        """(customer id, table id) of a line's order, looked up once per order."""
+        if order_item.order_id not in self.owners:
+            if OrderItem.order.is_cached(order_item):
+                order = order_item.order
+                owner = (order.customer_id, order.table_id)
+            else:
+                owner = (Order.objects.filter(pk=order_item.order_id)
+                         .values_list("customer_id", "table_id").first() or (None, None))
+            self.owners[order_item.order_id] = owner
+        return self.owners[order_item.order_id]
+
+    def __call__(self):
+        # Writes made from here on start a new batch.
+        if self._registry is not None and self._registry.get(self._key) is self:
+            del self._registry[self._key]
+        if self.pairs:
+            _run_logged(_commit_pairs, self.pairs)
+        if self.lines:
+            _run_logged(_commit_lines, self.lines)
+        # Features first, so a result cached after the bump is built from them.
+        for customer_id in self.customers - {None}:
+            _run_logged(refresh_user_features, customer_id)
+            _run_logged(invalidate_user, customer_id)
+        for table_id in self.tables - {None}:
+            _run_logged(invalidate_table, table_id)
+
+
+@contextmanager
+def _pending():
+    """
+    The current savepoint's ``_Pending``, registered with ``on_commit`` on
+    first use; outside a transaction the batch runs straight away.
+
+    Batches are kept on the connection by innermost savepoint id, and only
+    weakly: the pending ``on_commit`` callback is their one strong
+    reference, so a savepoint or transaction rolled back drops its batch
+    along with its callbacks.
+    """
+    connection = transaction.get_connection()
+    registry = _batches(connection)
+    # Blocks without a savepoint (None) commit or roll back with their parent.
+    key = next((sid for sid in reversed(connection.savepoint_ids) if sid), None)
+    batch = registry.get(key) if connection.in_atomic_block else None
+    if batch is not None:
+        yield batch
+        return
+    batch = _Pending(registry, key)
+    if connection.in_atomic_block:
+        registry[key] = batch
+    yield batch
+    transaction.on_commit(batch)
+
+
+def _batches(connection):
+    try:
+        return connection.recommender_batches
+    except AttributeError:
+        connection.recommender_batches = weakref.WeakValueDictionary()
+        return connection.recommender_batches
+
+
+def _commit_pairs(pairs):
+    # Neighbour lists of every item that gained a pair, refreshed once.
+    increment_pairs(pairs)
+    utils.record_basket_pairs(pairs)
+    refresh_neighbors({item for pair in pairs for item in pair}, utils.get_item_index(),
+                      utils.get_basket_freq(), utils.get_content_model())
+
+
+def _commit_lines(lines):
+    record_lines(lines)
+    utils.record_popularity([item_id for item_id, _ in lines])
+
+
+# ---------------------------------------------------------------------
+# Orders: new lines feed the pair and popularity counters; any order or
+# line write refreshes the customer's feature rows (see
+# recommender.features) and drops their and the table's cached results,
+# once per transaction.
+# ---------------------------------------------------------------------
+@receiver([post_save, post_delete], sender=Order)
+def order_changed(sender, instance, **kwargs):
+    with _pending() as pending:
+        pending.owners[instance.pk] = (instance.customer_id, instance.table_id)
+        pending.customers.add(instance.customer_id)
+        pending.tables.add(instance.table_id)
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def order_item_changed(sender, instance, created=False, **kwargs):
+    with _pending() as pending:
+        customer_id, table_id = pending.owner(instance)
+        pending.customers.add(customer_id)
+        pending.tables.add(table_id)
+        if created:
+            # Pairs are worked out now, inside the writing transaction, so
+            # several lines saved together each only see the lines before them.
+            pending.pairs.extend(new_pairs_for(instance))
+            pending.lines.append((instance.menu_item_id, instance.created_at))
+
+
+# ---------------------------------------------------------------------
+# Taste profiles: rebuilt for the reviewer, or for everyone who liked a
+# dish whose recipe changed.
+# ---------------------------------------------------------------------
+@receiver([post_save, post_delete], sender=Review)
+def review_profile_changed(sender, instance, **kwargs):
+    _on_commit(refresh_taste_profile, instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    user_ids = list(Review.objects.filter(menu_item__recipe__id=instance.recipe_id,
+                                          rating__gte=LIKED_RATING)
+                    .values_list("user_id", flat=True).distinct())
+
+    item_id = (Recipe.objects.filter(pk=instance.recipe_id)
+               .values_list("menu_item_id", flat=True).first())
+
+    def refresh():
+        for user_id in user_ids:
+            refresh_taste_profile(user_id)
+        # The cached ingredient model predates this edit, so build a fresh one.
+        index = utils.get_item_index()
+        if item_id is not None:
+            refresh_neighbors([item_id], index, utils.get_basket_freq(), build_ingredient_model(index))
+    _on_commit(refresh)
+
+
+# ---------------------------------------------------------------------
+# Cached results: drop a reviewer's entries, a deleted table's, and
+# everyone's when the catalog changes (order writes are handled above).
+# ---------------------------------------------------------------------
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, instance, **kwargs):
+    _on_commit(invalidate_user, instance.user_id)
+
+
+@receiver(post_delete, sender=Table)
+def table_deleted(sender, instance, **kwargs):
+    _on_commit(invalidate_table, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=SpecialOffer)
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def catalog_changed(sender, instance, **kwargs):
+    _on_commit(invalidate_catalog)
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from menu.models import MenuItem
+from order.models import OrderItem
+from .content import IngredientModel, ingredient_matrix, tfidf_weights
+from .cooccurrence import CoOccurrence, build_from_table
+from .index import ItemIndex
+from .spend import SPEND_TIERS
+
+# Item price bands used by cluster_scores: [0, 400), [400, 800), [800, ...)
+PRICE_BANDS = (400, 800)
+
+FORMAT_VERSION = 4
+CURRENT_FILE = "CURRENT"
+ARRAYS = (
+    "item_ids",
+    "cooc_indptr", "cooc_indices", "cooc_data", "cooc_marginals",
+    "popularity",
+    "spend_tiers",
+    "ingredient_ids", "ingredient_idf", "ing_indptr", "ing_indices", "ing_weights",
+)
+
+
+class Snapshot:
+    """
+    A read-only recommender model loaded from disk.
+
+    Every array is opened with ``mmap_mode="r"``, so all worker processes
+    reading the same version share one copy of the pages in the OS cache.
+    Positions follow ``item_ids``.
+    """
+
+    def __init__(self, path, meta, arrays):
+        self.path = path
+        self.meta = meta
+        for name, arr in arrays.items():
+            setattr(self, name, arr)
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    @property
+    def created_at(self):
+        return parse_datetime(self.meta["created_at"])
+
+    @property
+    def pairs_at(self):
+        """When the co-occurrence arrays were read from ``ItemPair``."""
+        return parse_datetime(self.meta["pairs_at"])
+
+    def cooccurrence(self):
+        return CoOccurrence(self.cooc_indptr, self.cooc_indices, self.cooc_data, self.cooc_marginals)
+
+    def content_model(self):
+        return IngredientModel(self.ingredient_ids, self.ing_indptr, self.ing_indices,
+                               self.ing_weights, self.ingredient_idf)
+
+
+def price_bands(index):
+    """(prices, PRICE_BANDS band) per item position; -1 band for unknown items."""
+    rows = list(MenuItem.objects.values_list("id", "price"))
+    if rows:
+        index.extend(item_id for item_id, _ in rows)
+    prices = np.full(len(index), np.nan)
+    if rows:
+        ids, values = zip(*rows)
+        prices[index.positions(ids)] = [float(v) for v in values]
+    band = np.where(np.isnan(prices), -1,
+                    np.searchsorted(PRICE_BANDS, np.nan_to_num(prices), side="right")).astype(np.int8)
+    return prices, band
+
+
+def snapshot_root():
+    return Path(getattr(settings, "RECOMMENDER_SNAPSHOT_DIR",
+                        Path(settings.BASE_DIR) / "recommender_snapshots"))
+
+
+def current_version(root=None):
+    try:
+        return (Path(root or snapshot_root()) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(version=None, root=None):
+    root = Path(root or snapshot_root())
+    version = version or current_version(root)
+    if version is None:
+        return None
+    path = root / version
+    meta = json.loads((path / "meta.json").read_text())
+    if meta.get("format") != FORMAT_VERSION:
+        return None
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+    return Snapshot(path, meta, arrays)
+
+
+def _item_ids(previous):
+    """
+    Previous version's id order with new items appended, so a position means
+    the same item in every version and workers can swap without remapping.
+    """
+    index = ItemIndex(previous.item_ids if previous is not None else ())
+    index.extend(MenuItem.objects.order_by("id").values_list("id", flat=True))
+    return index
+
+
+def _compute_arrays(index, spend_tiers=SPEND_TIERS):
+    cooc = build_from_table(index)
+    popularity = {}
+    for item_id, count in OrderItem.objects.values_list("menu_item_id").annotate(c=Count("id")):
+        popularity[item_id] = count
+    ingredient_ids, ing_indptr, ing_indices = ingredient_matrix(index)
+    ing_weights, ingredient_idf = tfidf_weights(ingredient_ids, ing_indptr, ing_indices)
+
+    # Every lookup above may have appended items; pad to the final size.
+    size = len(index)
+    return {
+        "item_ids": index.ids,
+        "cooc_indptr": _pad(cooc.indptr, size + 1, cooc.indptr[-1]),
+        "cooc_indices": cooc.indices,
+        "cooc_data": cooc.data,
+        "cooc_marginals": _pad(cooc.marginals, size, 0),
+        "popularity": _pad(index.vector(popularity), size, 0),
+        "spend_tiers": np.asarray(spend_tiers, dtype=np.float64),
+        "ingredient_ids": ingredient_ids,
+        "ingredient_idf": ingredient_idf,
+        "ing_indptr": _pad(ing_indptr, size + 1, ing_indptr[-1]),
+        "ing_indices": ing_indices,
+        "ing_weights": ing_weights,
+    }
+
+
+def _pad(arr, size, fill):
+    if len(arr) >= size:
+        return arr
+    return np.concatenate([arr, np.full(size - len(arr), fill, dtype=arr.dtype)])
+
+
+def build_snapshot(root=None, keep=3, spend_tiers=SPEND_TIERS):
+    """
+    Write a new snapshot version and make it current. ``spend_tiers`` (e.g.
+    from ``learn_spend_tiers``) are stored for cluster_scores. Returns the
+    new version name.
+    """
+    root = Path(root or snapshot_root())
+    root.mkdir(parents=True, exist_ok=True)
+    previous = load_snapshot(root=root)
+    # Taken before the read, so the changes applied on top start no later.
+    pairs_at = timezone.now()
+    arrays = _compute_arrays(_item_ids(previous), spend_tiers)
+    meta = {
+        "format": FORMAT_VERSION,
+        "pairs_at": pairs_at.isoformat(),
+        "items": len(arrays["item_ids"]),
+        "pairs": len(arrays["cooc_indices"]) // 2,
+        "spend_tiers": [float(t) for t in spend_tiers],
+    }
+    return write_version(root, arrays, meta, keep)
+
+
+def write_version(root, arrays, meta, keep=3):
+    """
+    Save ``arrays`` as a new version directory under ``root`` and point
+    ``CURRENT`` at it.
+
+    The directory is fully written under a temporary name and renamed into
+    place before ``CURRENT`` is atomically replaced, so readers never see a
+    partial version. Returns the version name.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    version = timezone.now().strftime("%Y%m%dT%H%M%S%f")
+    tmp = root / f".tmp-{version}"
+    tmp.mkdir()
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr))
+    meta = {**meta, "version": version, "created_at": timezone.now().isoformat()}
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+    os.rename(tmp, root / version)
+
+    pointer = root / f".{CURRENT_FILE}.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, root / CURRENT_FILE)
+
+    _prune(root, keep)
+    return version
+
+
+def _prune(root, keep):
+    # Workers still mapping a removed version keep their open pages; only
+    # new loads are affected.
+    current = current_version(root)
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for path in versions[:-keep] if keep else versions:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
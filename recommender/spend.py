@@ -0,0 +1,50 @@
+import numpy as np
+from .models import UserStats
+
+# Average order value tiers mapped onto PRICE_BANDS: < 500, < 1000, rest
+SPEND_TIERS = (500, 1000)
+
+
+def average_spend(user_ids):
+    """``{user_id: average order value}`` for users with stats rows."""
+    return {uid: float(total) / n if n else 0.0 for uid, n, total in
+            UserStats.objects.filter(user_id__in=user_ids)
+            .values_list("user_id", "order_count", "total_spent")}
+
+
+def spend_tier(avg, tiers=SPEND_TIERS):
+    return int(np.searchsorted(tiers, float(avg or 0), side="right"))
+
+
+def kmeans_tiers(values, k, iterations=100):
+    """
+    Thresholds splitting ``values`` into ``k`` 1-D k-means clusters: the
+    midpoints between neighbouring centroids, ascending. ``None`` when there
+    are fewer than ``k`` distinct values to cluster.
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    if len(np.unique(values)) < k:
+        return None
+    # Quantile seeds keep the result deterministic.
+    centroids = np.quantile(values, (np.arange(k) + 0.5) / k)
+    for _ in range(iterations):
+        bounds = (centroids[1:] + centroids[:-1]) / 2
+        labels = np.searchsorted(bounds, values, side="right")
+        sums = np.bincount(labels, weights=values, minlength=k)
+        sizes = np.bincount(labels, minlength=k)
+        updated = np.where(sizes > 0, sums / np.maximum(sizes, 1), centroids)
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    centroids = np.sort(centroids)
+    return tuple(float(t) for t in (centroids[1:] + centroids[:-1]) / 2)
+
+
+def learn_spend_tiers():
+    """
+    k-means tiers over every customer's average order value, with one tier
+    per price band; falls back to ``SPEND_TIERS`` without enough customers.
+    """
+    averages = [float(total) / n for n, total in
+                UserStats.objects.filter(order_count__gt=0).values_list("order_count", "total_spent")]
+    return kmeans_tiers(averages, len(SPEND_TIERS) + 1) or SPEND_TIERS
@@ -0,0 +1,110 @@
+from collections import Counter
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Prefetch
+from order.models import Order, OrderItem
+from outlet.models import Table
+from . import utils
+from .caching import get_outlet_popularity, get_table_result, set_outlet_popularity, set_table_result
+from .index import get_item_index, top_positions
+from .serializers import MenuItemMiniSerializer
+
+# Blend for table scans: what the table ordered lately, what goes with it,
+# and what sells at the outlet
+TABLE_WEIGHTS = {
+    "recent":  0.4,
+    "basket":  0.4,
+    "popular": 0.2,
+}
+
+
+def recent_orders(table_id, limit):
+    """The table's latest orders with their lines and items, in two queries."""
+    lines = OrderItem.objects.select_related("menu_item")
+    return list(Order.objects.filter(table_id=table_id).order_by("-created_at")
+                .prefetch_related(Prefetch("items", queryset=lines))[:limit])
+
+
+def outlet_popularity(outlet_id, index):
+    """
+    Order lines per item across the outlet's tables; the global signal if
+    it has none yet. The counts are aggregated at most once per
+    ``RECOMMENDER_OUTLET_POPULARITY_SECONDS`` and shared by all of the
+    outlet's tables through the cache.
+    """
+    counts = get_outlet_popularity(outlet_id)
+    if counts is None:
+        counts = dict(OrderItem.objects.filter(order__table__outlet_id=outlet_id)
+                      .values_list("menu_item_id").annotate(c=Count("id")).order_by())
+        set_outlet_popularity(outlet_id, counts)
+    return index.vector(counts or utils.popular_scores())
+
+
+def table_scores(orders, outlet_id, index):
+    """
+    ``TABLE_WEIGHTS`` blend per item position, each signal scaled to a
+    maximum of 1; unavailable items and items no signal touched are
+    ``-inf``.
+    """
+    lines = Counter(line.menu_item_id for order in orders for line in order.items.all())
+    cooc = utils.get_basket_freq()
+    parts = {"recent": index.vector(dict(lines)), "popular": outlet_popularity(outlet_id, index)}
+    basket = np.zeros(len(index))
+    for pos, n in zip(index.positions(list(lines)).tolist(), lines.values()):
+        cols, data = cooc.row(pos)
+        basket[cols] += n * data
+    parts["basket"] = basket
+
+    size = len(index)
+    total = np.zeros(size)
+    for name, vec in parts.items():
+        top = vec.max() if len(vec) else 0
+        if top > 0:
+            total[:len(vec)] += TABLE_WEIGHTS[name] * vec / top
+    allowed = np.zeros(size, dtype=bool)
+    available = utils.available_items()
+    allowed[:len(available)] = available[:size]
+    return np.where(allowed & (total > 0), np.round(total, 9), -np.inf)
+
+
+def _payload(table):
+    orders = recent_orders(table.pk, getattr(settings, "RECOMMENDER_TABLE_ORDERS", 5))
+    index = get_item_index()
+    total = table_scores(orders, table.outlet_id, index)
+    ids = index.ids[top_positions(total, getattr(settings, "RECOMMENDER_TABLE_ITEMS", 10))].tolist()
+    return {
+        "table_id": table.pk,
+        "outlet_id": table.outlet_id,
+        "last_orders": [
+            {
+                "order_id": order.id,
+                "items": [line.menu_item.name for line in order.items.all()],
+                "total_price": order.total_price,
+                "timestamp": order.created_at,
+            }
+            for order in orders
+        ],
+        "recommendations": [dict(row) for row in
+                            MenuItemMiniSerializer(utils.fetch_items(ids), many=True).data],
+    }
+
+
+def table_recommendation(table_id):
+    """
+    Scan payload for a table: its recent orders and the
+    ``RECOMMENDER_TABLE_ITEMS`` best items, or ``None`` for an unknown
+    table.
+
+    Served from one cache read while the table has no new orders (see
+    ``recommender.signals``) and the catalog is unchanged; otherwise built
+    and cached.
+    """
+    cached, version = get_table_result(table_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    table = Table.objects.filter(pk=table_id).only("id", "outlet_id").first()
+    if table is None:
+        return None
+    payload = _payload(table)
+    set_table_result(table_id, (version, payload))
+    return payload
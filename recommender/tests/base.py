@@ -0,0 +1,86 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from menu.models import Category, Ingredient, MenuItem, Recipe, RecipeIngredient, Review
+from order.models import Order, OrderItem
+from outlet.models import Outlet, Table
+from .. import utils
+from ..index import set_item_index
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RecommenderTestCase(TestCase):
+    """
+    A small catalog with a few customers. Writes made through ``commit``
+    run their ``on_commit`` upkeep as they would outside a test; the
+    module-level structures in ``recommender.utils`` are dropped before
+    every test since database ids are reused between tests. Media,
+    snapshots and factor models go to a temporary directory per class.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp(prefix="recommender-tests-")
+        cls.addClassCleanup(shutil.rmtree, cls.tmp, True)
+        dirs = override_settings(
+            MEDIA_ROOT=cls.tmp,
+            RECOMMENDER_SNAPSHOT_DIR=f"{cls.tmp}/snapshots",
+            RECOMMENDER_MF_DIR=f"{cls.tmp}/mf",
+        )
+        dirs.enable()
+        cls.addClassCleanup(dirs.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        mains = Category.objects.create(name="Mains")
+        drinks = Category.objects.create(name="Drinks")
+        cls.items = [
+            MenuItem.objects.create(category=mains if n < 6 else drinks, name=f"Dish {n}",
+                                    price=price, daypart=part)
+            for n, (price, part) in enumerate([
+                (650, "dinner"), (450, "lunch"), (900, "dinner"), (350, "breakfast"),
+                (1200, "dinner"), (450, "lunch"), (150, "breakfast"), (150, ""),
+                (350, "lunch"), (650, ""),
+            ])
+        ]
+        cls.ingredients = [Ingredient.objects.create(name=name)
+                           for name in ("chicken", "rice", "lentils", "yogurt", "mint", "tea")]
+        for n, item in enumerate(cls.items):
+            recipe = Recipe.objects.create(menu_item=item, steps="Cook.")
+            for ingredient in (cls.ingredients[n % 6], cls.ingredients[(n + 2) % 6]):
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity="1")
+
+        cls.outlet = Outlet.objects.create(name="Central", city="Lahore", country="Pakistan")
+        cls.table = Table.objects.create(outlet=cls.outlet, number=1)
+        cls.other_table = Table.objects.create(outlet=cls.outlet, number=2)
+
+        User = get_user_model()
+        cls.users = [User.objects.create_user(f"diner{n}", f"diner{n}@example.com", "pw")
+                     for n in range(5)]
+        cls.staff = User.objects.create_user("manager", "manager@example.com", "pw", is_staff=True)
+        with cls.captureOnCommitCallbacks(execute=True):
+            for n, user in enumerate(cls.users):
+                cls.place_order(user, [cls.items[n], cls.items[n + 1], cls.items[(n * 3) % 10]],
+                                table=cls.table if n % 2 else None)
+                cls.place_order(user, [cls.items[n + 4], cls.items[n + 1]])
+                Review.objects.create(user=user, menu_item=cls.items[n + 2], rating=5 - n % 3)
+
+    @staticmethod
+    def place_order(user, items, table=None):
+        order = Order.objects.create(customer=user, table=table)
+        for item in items:
+            OrderItem.objects.create(order=order, menu_item=item)
+        return order
+
+    def setUp(self):
+        cache.clear()
+        set_item_index(None)
+        utils.reset_state()
+
+    def commit(self):
+        return self.captureOnCommitCallbacks(execute=True)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .. import utils
+from ..filters import ItemFilter
+from .base import RecommenderTestCase
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0)
+class BatchRecommendationTests(RecommenderTestCase):
+    """``hybrid_recommendation_many`` ranks exactly as ``hybrid_recommendation`` does per user."""
+
+    def assertBatchMatches(self, top_n):
+        batch = utils.hybrid_recommendation_many(self.users, top_n=top_n)
+        self.assertEqual(set(batch), {user.pk for user in self.users})
+        for user in self.users:
+            single = utils.hybrid_recommendation(user, top_n=top_n)
+            self.assertEqual([item.pk for item in batch[user.pk]], [item.pk for item in single])
+
+    def test_top_n(self):
+        for top_n in (1, 3, None):
+            with self.subTest(top_n=top_n):
+                self.assertBatchMatches(top_n)
+
+    def test_candidate_limits(self):
+        for limit in (None, 4):
+            with self.subTest(candidates=limit), self.settings(RECOMMENDER_CANDIDATES=limit):
+                cache.clear()
+                self.assertBatchMatches(None)
+
+    def test_across_batches(self):
+        with self.commit():
+            self.place_order(self.users[0], [self.items[8], self.items[9]])
+        with mock.patch.object(utils, "BATCH_SIZE", 2):
+            self.assertBatchMatches(3)
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0)
+class BatchEndpointTests(RecommenderTestCase):
+    url = "/api/recommend/batch/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_results_per_user(self):
+        ids = [self.users[2].pk, self.users[0].pk, 999999, self.users[2].pk]
+        response = self.client.post(self.url, {"user_ids": ids, "n": 2}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["missing"], [999999])
+        self.assertEqual([row["user"] for row in response.data["results"]], [self.users[2].pk, self.users[0].pk])
+        for row in response.data["results"]:
+            user = next(u for u in self.users if u.pk == row["user"])
+            expected = [item.pk for item in utils.hybrid_recommendation(user, 2)]
+            self.assertEqual([item["id"] for item in row["recommendations"]], expected)
+            self.assertEqual(row["count"], len(expected))
+
+    def test_filters(self):
+        user = self.users[3]
+        expected = [item.pk for item in utils.hybrid_recommendation(
+            user, 5, item_filter=ItemFilter(max_price=500, exclude_ingredients=[self.ingredients[0].pk],
+                                            available_only=False))]
+        for body in ({"max_price": 500, "exclude_ingredients": [self.ingredients[0].pk], "available": False},
+                     {"max_price": "500", "exclude_ingredients": str(self.ingredients[0].pk), "available": "false"}):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, {"user_ids": [user.pk], **body}, format="json")
+
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual([item["id"] for item in response.data["results"][0]["recommendations"]], expected)
+        self.assertTrue(expected)
+        self.assertNotEqual(expected, [item.pk for item in utils.hybrid_recommendation(user, 5)])
+
+    def test_invalid_filters(self):
+        for body in ({"category": ["x"]}, {"max_price": "cheap"}, {"available": "maybe"}):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, {"user_ids": [self.users[0].pk], **body}, format="json")
+                self.assertEqual(response.status_code, 400)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(self.url, {"user_ids": [self.users[0].pk]}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_user_ids(self):
+        for user_ids in ([], "1,2", [1, "x"]):
+            with self.subTest(user_ids=user_ids):
+                response = self.client.post(self.url, {"user_ids": user_ids}, format="json")
+                self.assertEqual(response.status_code, 400)
+
+    def test_user_limit(self):
+        with self.settings(RECOMMENDER_BATCH_MAX_USERS=2):
+            response = self.client.post(self.url, {"user_ids": [1, 2, 3]}, format="json")
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,130 @@
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import override_settings
+
+from .. import metrics, utils
+from ..caching import get_result, result_key
+from ..filters import ItemFilter
+from .base import RecommenderTestCase
+
+
+def ordered_ids(user):
+    return set(user.orders.values_list("items__menu_item_id", flat=True))
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0)
+class BudgetTests(RecommenderTestCase):
+
+    def test_no_budget(self):
+        status = {}
+        ids = utils.recommended_ids(self.users[0], 3, status=status)
+
+        self.assertEqual(status, {"degraded": False, "dropped": [], "fallback": False, "cold_start": False})
+        self.assertEqual(get_result(result_key(self.users[0].pk, 3, utils.daypart())), ids)
+
+    @override_settings(RECOMMENDER_BUDGET_MS=1e-9)
+    def test_spent_budget_serves_fallback_without_ordered_items(self):
+        for user in self.users:
+            with self.subTest(user=user.username):
+                status = {}
+                ids = utils.recommended_ids(user, 3, status=status)
+
+                self.assertTrue(status["fallback"])
+                self.assertTrue(status["degraded"])
+                self.assertEqual(status["dropped"], list(utils.COMPONENTS))
+                self.assertEqual(len(ids), 3)
+                self.assertFalse(set(ids) & ordered_ids(user))
+                # Degraded results are not cached.
+                self.assertIsNone(get_result(result_key(user.pk, 3, utils.daypart())))
+
+    def test_late_components_are_dropped_and_reweighted(self):
+        user = self.users[1]
+        full = utils.component_scores(user)
+        late = [None if name in ("content", "mf") else part for name, part in zip(utils.COMPONENTS, full)]
+        status = {}
+
+        with mock.patch.object(utils, "component_scores", return_value=late):
+            ids = utils.recommended_ids(user, None, status=status)
+
+        self.assertEqual(status["dropped"], ["content", "mf"])
+        self.assertTrue(status["degraded"])
+        self.assertFalse(status["fallback"])
+        self.assertIsNone(get_result(result_key(user.pk, None, utils.daypart())))
+
+        index = utils.get_item_index()
+        parts = [{} if part is None else part for part in late]
+        candidates = utils.candidate_positions(parts[0], parts[1], parts[2],
+                                               utils.history_neighbors(parts[0]), index)
+        total = utils._merge(parts, index, candidates, utils._weights(["content", "mf"]))
+        self.assertEqual(ids, index.ids[utils.top_positions(total)].tolist())
+
+    def test_weights_of_dropped_components_are_spread(self):
+        weights = utils._weights(["basket"])
+        self.assertEqual(weights[utils.COMPONENTS.index("basket")], 0)
+        self.assertAlmostEqual(weights.sum(), sum(utils.WEIGHTS.values()))
+        kept = [utils.WEIGHTS[name] for name in utils.COMPONENTS if name != "basket"]
+        np.testing.assert_allclose(np.delete(weights, utils.COMPONENTS.index("basket")) / kept,
+                                   weights[0] / utils.WEIGHTS["history"])
+
+    def test_missing_history_raises(self):
+        parts = [None] + [{}] * (len(utils.COMPONENTS) - 1)
+        with mock.patch.object(utils, "component_scores", return_value=parts), \
+                self.assertRaises(utils.BudgetExceeded):
+            utils.score_items(self.users[0])
+
+
+class FallbackTests(RecommenderTestCase):
+
+    def test_daypart_items_first_then_demand(self):
+        ids = utils.fallback_ids(None)
+        index = utils.get_item_index()
+        in_daypart = index.vector(utils.time_scores()) > 0
+        flags = [bool(in_daypart[index.pos[i]]) for i in ids]
+
+        demand = utils._demand(utils.popular_scores(), index)
+        self.assertEqual(flags, sorted(flags, reverse=True))
+        self.assertEqual(set(ids), {item.pk for item in self.items
+                                    if in_daypart[index.pos[item.pk]] or demand[index.pos[item.pk]] > 0})
+        for flag in (True, False):
+            part = [demand[index.pos[i]] for i, f in zip(ids, flags) if f is flag]
+            self.assertEqual(part, sorted(part, reverse=True))
+
+    def test_ordered_items_left_out(self):
+        user = self.users[2]
+        everything = utils.fallback_ids(None)
+        ids = utils.fallback_ids(3, user=user)
+
+        self.assertEqual(ids, [i for i in everything if i not in ordered_ids(user)][:3])
+
+    def test_filter_and_availability(self):
+        unavailable = self.items[3]
+        unavailable.is_available = False
+        unavailable.save()
+        cache.clear()
+
+        self.assertNotIn(unavailable.pk, utils.fallback_ids(None))
+        cheap = utils.fallback_ids(None, item_filter=ItemFilter(max_price=400))
+        self.assertTrue(cheap)
+        self.assertTrue(all(item.price <= 400 for item in utils.fetch_items(cheap)))
+
+
+@override_settings(RECOMMENDER_METRICS_FLUSH_SECONDS=3600)
+class MetricsTests(RecommenderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.flush()
+        cache.clear()
+
+    def test_counts_are_batched(self):
+        with mock.patch.object(metrics, "incr", wraps=metrics.incr) as incr:
+            for status in ({"degraded": False}, {"degraded": True}, {"degraded": True, "fallback": True}):
+                metrics.record_recommendation(status)
+            self.assertEqual(incr.call_count, 0)
+
+            self.assertEqual(metrics.counters(), {
+                "recommend.responses": 3, "recommend.degraded": 2, "recommend.fallback": 1,
+            })
+            self.assertEqual(incr.call_count, 3)
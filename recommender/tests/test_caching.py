@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from menu.models import MenuItem, RecipeIngredient, Review, SpecialOffer
+from .. import utils
+from ..caching import (
+    _user_version_key, catalog_version, get_result, get_table_result, invalidate_user, result_key,
+    set_result, set_table_result,
+)
+from .base import RecommenderTestCase
+
+
+class VersionCounterTests(RecommenderTestCase):
+    """Result keys embed version counters that only ever move forward."""
+
+    def test_evicted_counter_never_revisits_old_keys(self):
+        user = self.users[0]
+        seen = []
+        for _ in range(3):
+            key = result_key(user.pk, 5, "lunch")
+            self.assertNotIn(key, seen)
+            set_result(key, [1, 2, 3])
+            seen.append(key)
+            invalidate_user(user.pk)
+            seen.append(result_key(user.pk, 5, "lunch"))
+            cache.delete(_user_version_key(user.pk))   # evicted
+
+        self.assertEqual(len(set(seen)), len(seen))
+        self.assertIsNone(get_result(result_key(user.pk, 5, "lunch")))
+
+    def test_evicted_catalog_counter_drops_table_results(self):
+        set_table_result(self.table.pk, {"version": catalog_version()})
+        payload, version = get_table_result(self.table.pk)
+        self.assertEqual(payload["version"], version)
+
+        cache.delete("recommender:catalog-version")
+
+        payload, version = get_table_result(self.table.pk)
+        self.assertNotEqual(payload["version"], version)
+
+
+class CacheInvalidationTests(RecommenderTestCase):
+    """Order, review and catalog writes make cached results unreachable."""
+
+    def user_key(self, user):
+        return result_key(user.pk, 5, "lunch")
+
+    def test_order_drops_customer_and_table_results(self):
+        diner, other = self.users[0], self.users[1]
+        keys = self.user_key(diner), self.user_key(other)
+        set_table_result(self.table.pk, {"items": []})
+        set_table_result(self.other_table.pk, {"items": []})
+
+        with self.commit():
+            self.place_order(diner, [self.items[0], self.items[1]], table=self.table)
+
+        self.assertNotEqual(self.user_key(diner), keys[0])
+        self.assertEqual(self.user_key(other), keys[1])
+        self.assertIsNone(get_table_result(self.table.pk)[0])
+        self.assertIsNotNone(get_table_result(self.other_table.pk)[0])
+
+    def test_order_status_change(self):
+        diner = self.users[2]
+        order = diner.orders.first()
+        key = self.user_key(diner)
+
+        with self.commit():
+            order.status = "completed"
+            order.save()
+
+        self.assertNotEqual(self.user_key(diner), key)
+
+    def test_rolled_back_order_keeps_results(self):
+        diner = self.users[0]
+        key = self.user_key(diner)
+
+        with self.commit():
+            try:
+                with transaction.atomic():
+                    self.place_order(diner, [self.items[0]])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(self.user_key(diner), key)
+
+    def test_review_drops_reviewer_results(self):
+        reviewer, other = self.users[3], self.users[4]
+        keys = self.user_key(reviewer), self.user_key(other)
+
+        with self.commit():
+            Review.objects.create(user=reviewer, menu_item=self.items[9], rating=4)
+
+        self.assertNotEqual(self.user_key(reviewer), keys[0])
+        self.assertEqual(self.user_key(other), keys[1])
+
+        key = self.user_key(reviewer)
+        with self.commit():
+            Review.objects.get(user=reviewer, menu_item=self.items[9]).delete()
+        self.assertNotEqual(self.user_key(reviewer), key)
+
+    def test_catalog_writes_drop_every_result(self):
+        item = self.items[0]
+        writes = {
+            "item": lambda: MenuItem.objects.get(pk=item.pk).save(),
+            "offer": lambda: SpecialOffer.objects.create(
+                menu_item=item, description="Half price", discount_percentage=50,
+                valid_from=timezone.now(), valid_until=timezone.now() + timedelta(days=1)),
+            "recipe": lambda: RecipeIngredient.objects.filter(recipe__menu_item=item).first().delete(),
+        }
+        for name, write in writes.items():
+            with self.subTest(name):
+                version, keys = catalog_version(), [self.user_key(u) for u in self.users]
+                with self.commit():
+                    write()
+                self.assertNotEqual(catalog_version(), version)
+                for user, key in zip(self.users, keys):
+                    self.assertNotEqual(self.user_key(user), key)
+
+    def test_table_delete(self):
+        set_table_result(self.other_table.pk, {"items": []})
+        table_id = self.other_table.pk
+
+        with self.commit():
+            self.other_table.delete()
+
+        self.assertIsNone(get_table_result(table_id)[0])
+
+    def test_cached_result_is_rebuilt_after_order(self):
+        diner = self.users[1]
+        before = [item.pk for item in utils.hybrid_recommendation(diner, top_n=None)]
+        ordered = before[0]
+
+        with self.commit():
+            self.place_order(diner, [MenuItem.objects.get(pk=ordered)])
+
+        # Items in the order history are never recommended, so a stale entry would show it.
+        self.assertNotIn(ordered, [item.pk for item in utils.hybrid_recommendation(diner, top_n=None)])
@@ -0,0 +1,69 @@
+from rest_framework.test import APIClient
+
+from menu.models import MenuItem
+from ..cooccurrence import count_order_pairs
+from .base import RecommenderTestCase
+
+
+class CartEndpointTests(RecommenderTestCase):
+    """Add-ons ranked by how often they were ordered with the cart's items."""
+
+    url = "/api/recommend/cart/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def expected(self, cart, n=5):
+        pairs = count_order_pairs()
+        scores = {}
+        for (a, b), count in pairs.items():
+            for item_id, partner in ((a, b), (b, a)):
+                if item_id in cart and partner not in cart:
+                    scores[partner] = scores.get(partner, 0) + count
+        available = set(MenuItem.objects.filter(is_available=True).values_list("pk", flat=True))
+        ranked = sorted((i for i in scores if i in available), key=lambda i: (-scores[i], i))
+        return ranked[:n]
+
+    def get(self, cart, **params):
+        return self.client.get(self.url, {"items": ",".join(str(i) for i in cart), **params})
+
+    def test_ranked_by_pair_counts(self):
+        cart = [self.items[1].pk, self.items[4].pk]
+        response = self.get(cart, n=3)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["cart"], cart)
+        ids = [row["id"] for row in response.data["recommendations"]]
+        self.assertTrue(ids)
+        self.assertEqual(ids, self.expected(cart, 3))
+
+    def test_new_orders_count_at_once(self):
+        cart = [self.items[7].pk]
+        with self.commit():
+            for _ in range(2):
+                self.place_order(self.users[1], [self.items[7], self.items[3]])
+
+        ids = [row["id"] for row in self.get(cart).data["recommendations"]]
+
+        self.assertEqual(ids[0], self.items[3].pk)
+        self.assertEqual(ids, self.expected(cart))
+
+    def test_unavailable_and_unknown_items(self):
+        cart = [self.items[1].pk, 999999]
+        top = self.expected(cart)[0]
+        self.assertEqual(self.get(cart).data["recommendations"][0]["id"], top)
+        item = MenuItem.objects.get(pk=top)
+        item.is_available = False
+        with self.commit():
+            item.save()
+
+        response = self.get(cart)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(top, [row["id"] for row in response.data["recommendations"]])
+
+    def test_invalid_items(self):
+        self.assertEqual(self.get(["x"]).status_code, 400)
+        self.assertEqual(self.get([]).data["count"], 0)
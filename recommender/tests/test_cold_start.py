@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from menu.models import MenuItem, Review
+from .. import utils
+from ..filters import ItemFilter
+from ..index import get_item_index, top_positions
+from ..spend import spend_tier
+from .base import RecommenderTestCase
+
+
+def scored_ids(user, top_n, item_filter=None):
+    index = get_item_index()
+    return index.ids[top_positions(utils.score_items(user, index, item_filter=item_filter), top_n)].tolist()
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=10)
+class ColdStartTests(RecommenderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.newcomer = get_user_model().objects.create_user("newcomer", "newcomer@example.com", "pw")
+
+    def test_cohort_keys(self):
+        lists = utils.cohort_lists()
+
+        self.assertEqual(set(lists), {(part, tier) for part, _ in MenuItem.DAYPART_CHOICES
+                                      for tier in range(len(utils.spend_tiers()) + 1)})
+        self.assertTrue(all(len(ids) <= 10 for ids in lists.values()))
+
+    def test_new_user_served_from_cohort(self):
+        status = {}
+        utils.cohort_lists()
+        with self.assertNumQueries(2):
+            # The cold check and the item fetch; the lists are already built.
+            ids = utils.recommended_ids(self.newcomer, 5, status=status)
+            utils.fetch_items(ids)
+
+        self.assertTrue(status["cold_start"])
+        self.assertEqual(ids, scored_ids(self.newcomer, 5))
+
+    def test_filter(self):
+        item_filter = ItemFilter(max_price=400)
+        ids = utils.cold_start_ids(self.newcomer, 2, item_filter)
+
+        self.assertEqual(ids, scored_ids(self.newcomer, 2, item_filter))
+
+    def test_warm_users_are_scored(self):
+        self.assertIsNone(utils.cold_start_ids(self.users[0], 5))
+        with self.commit():
+            Review.objects.create(user=self.newcomer, menu_item=self.items[0], rating=5)
+        self.assertIsNone(utils.cold_start_ids(self.newcomer, 5))
+
+    @override_settings(RECOMMENDER_COLD_START_ORDERS=3)
+    def test_few_orders_leave_out_ordered_items(self):
+        with self.commit():
+            self.place_order(self.newcomer, [self.items[4], self.items[2]])
+        tier = spend_tier(1200 + 900, utils.spend_tiers())
+        cohort = utils.cohort_lists()[utils.daypart(), tier].tolist()
+
+        ids = utils.cold_start_ids(self.newcomer, 3)
+
+        self.assertEqual(ids, [i for i in cohort if i not in (self.items[4].pk, self.items[2].pk)][:3])
+
+    def test_lists_too_short(self):
+        self.assertIsNone(utils.cold_start_ids(self.newcomer, 11))
+        self.assertIsNone(utils.cold_start_ids(self.newcomer, None))
+        with override_settings(RECOMMENDER_COHORT_SIZE=4):
+            # Cut lists may hold cheaper items beyond their last entry.
+            self.assertIsNone(utils.cold_start_ids(self.newcomer, 3, ItemFilter(max_price=200)))
+
+    def test_catalog_change_rebuilds(self):
+        before = utils.cohort_lists()
+        with self.commit():
+            MenuItem.objects.create(category=self.items[0].category, name="New", price=100, daypart=utils.daypart())
+
+        self.assertIsNot(utils.cohort_lists(), before)
@@ -0,0 +1,89 @@
+import numpy as np
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+
+from order.models import Order
+from .. import utils
+from ..evaluation import ENGINES, as_of, evaluate, held_out, latency_percentiles, ranking_metrics
+from ..index import get_item_index
+from ..models import ItemPair
+from .base import RecommenderTestCase
+
+
+class RankingMetricsTests(RecommenderTestCase):
+
+    def test_hand_computed(self):
+        # Two users, k=2; user 0 should get positions 1 and 4, user 1 position 2.
+        recommended = np.array([[1, 3], [2, -1]])
+        metrics = ranking_metrics(recommended, np.array([0, 0, 1]), np.array([1, 4, 2]), 5, 10)
+
+        self.assertEqual(metrics, {
+            "precision": (1 / 2 + 1 / 2) / 2,
+            "recall": (1 / 2 + 1) / 2,
+            "hit_rate": 1.0,
+            "coverage": 3 / 10,
+        })
+
+    def test_no_users(self):
+        metrics = ranking_metrics(np.zeros((0, 3), dtype=np.int64), np.array([], dtype=np.int64),
+                                  np.array([], dtype=np.int64), 5, 10)
+        self.assertEqual(metrics["precision"], 0.0)
+
+    def test_latency_percentiles(self):
+        latency = latency_percentiles([0.001, 0.002, 0.003])
+        self.assertAlmostEqual(latency["p50"], 2.0)
+        self.assertAlmostEqual(latency["max"], 3.0)
+        self.assertEqual(latency_percentiles([]), {})
+
+
+class ReplayTests(RecommenderTestCase):
+    """Orders placed after a split time, replayed against the recommender as it was before it."""
+
+    def setUp(self):
+        super().setUp()
+        self.split_at = timezone.now()
+        with self.commit():
+            # diner0 already ordered items 0, 1 and 4; only 7 and 9 are new.
+            self.place_order(self.users[0], [self.items[0], self.items[7], self.items[9]])
+            self.place_order(self.users[3], [self.items[8]])
+
+    def test_held_out(self):
+        index = get_item_index()
+        users, positions = held_out(self.split_at, index)
+        pairs = sorted(zip(users.tolist(), index.ids[positions].tolist()))
+
+        self.assertEqual(pairs, sorted([
+            (self.users[0].pk, self.items[7].pk),
+            (self.users[0].pk, self.items[9].pk),
+            (self.users[3].pk, self.items[8].pk),
+        ]))
+
+    @override_settings(RECOMMENDER_CONCURRENT_COMPONENTS=True, RECOMMENDER_BUDGET_MS=50)
+    def test_as_of(self):
+        pairs = ItemPair.objects.count()
+        with as_of(self.split_at):
+            self.assertFalse(Order.objects.filter(created_at__gte=self.split_at).exists())
+            self.assertFalse(settings.RECOMMENDER_CONCURRENT_COMPONENTS)
+            self.assertIsNone(settings.RECOMMENDER_BUDGET_MS)
+            self.assertNotEqual(settings.RECOMMENDER_SNAPSHOT_DIR, settings.RECOMMENDER_MF_DIR)
+            history = utils.history_scores(self.users[0])
+            self.assertNotIn(self.items[7].pk, history)
+
+        self.assertEqual(Order.objects.filter(created_at__gte=self.split_at).count(), 2)
+        self.assertEqual(ItemPair.objects.count(), pairs)
+        self.assertIn(self.items[7].pk, utils.history_scores(self.users[0]))
+
+    def test_evaluate(self):
+        results = evaluate(list(ENGINES), self.split_at, k=3, train_mf=True)
+
+        self.assertEqual(set(results), set(ENGINES))
+        for name, result in results.items():
+            with self.subTest(engine=name):
+                self.assertEqual(result["users"], len(np.unique(held_out(self.split_at, get_item_index())[0])))
+                for metric in ("precision", "recall", "hit_rate", "coverage"):
+                    self.assertTrue(0 <= result[metric] <= 1)
+                self.assertEqual(set(result["latency"]), {"p50", "p90", "p99", "max"})
+        # Per-user and batched scoring rank the same way.
+        self.assertEqual({key: results["hybrid"][key] for key in ("precision", "recall", "hit_rate")},
+                         {key: results["batch"][key] for key in ("precision", "recall", "hit_rate")})
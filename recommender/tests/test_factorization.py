@@ -0,0 +1,110 @@
+from collections import Counter
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from menu.models import Review
+from order.models import OrderItem
+from .. import factorization, utils
+from ..content import LIKED_RATING
+from ..factorization import build_factors, interactions, load_factors, train_als
+from ..index import ItemIndex, get_item_index
+from .base import RecommenderTestCase
+
+
+def dense_solve(target, other, matrix, regularization):
+    """One ALS half-step, row by row, straight from the normal equations."""
+    out = np.zeros_like(target)
+    gram = other.T @ other + regularization * np.eye(other.shape[1])
+    for row, confidence in enumerate(matrix):
+        if confidence.any():
+            a = gram + other.T @ (confidence[:, None] * other)
+            out[row] = np.linalg.solve(a, other.T @ np.where(confidence > 0, 1 + confidence, 0))
+    return out
+
+
+class AlsTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.strength = rng.integers(0, 3, size=(12, 9)).astype(np.float64)
+        self.strength[4] = 0
+        self.indptr = np.concatenate([[0], np.cumsum((self.strength > 0).sum(axis=1))])
+        self.indices = np.nonzero(self.strength)[1]
+        self.values = self.strength[self.strength > 0]
+
+    def half_step(self):
+        rng = np.random.default_rng(1)
+        users, items = rng.normal(size=(12, 4)), rng.normal(size=(9, 4))
+        confidence = 40 * self.values
+        expected = dense_solve(users, items, 40 * self.strength, 0.1)
+        # Blocks run in turn on the calling thread.
+        pool = mock.Mock()
+        pool.submit.side_effect = lambda fn, *args: mock.Mock(result=lambda: fn(*args))
+        factorization._solve(users, items, self.indptr, self.indices, confidence, 0.1, pool)
+        return users, expected
+
+    def test_block_solve_matches_normal_equations(self):
+        users, expected = self.half_step()
+        np.testing.assert_allclose(users, expected, atol=1e-9)
+
+    def test_small_blocks(self):
+        # Forces several blocks and the dense path for rows longer than a block.
+        with mock.patch.object(factorization, "BLOCK_ENTRIES", 2):
+            users, expected = self.half_step()
+        np.testing.assert_allclose(users, expected, atol=1e-9)
+
+    def test_fits_observed_interactions(self):
+        users, items = train_als(self.indptr, self.indices, self.values, 9, factors=8, iterations=15, workers=2)
+        predicted = users @ items.T
+        observed = self.strength > 0
+
+        self.assertGreater(predicted[observed].mean(), 0.5)
+        self.assertLess(np.abs(predicted[~observed]).mean(), predicted[observed].mean())
+        np.testing.assert_array_equal(users[4], 0)
+
+
+class FactorModelTests(RecommenderTestCase):
+
+    def test_interactions(self):
+        index = get_item_index()
+        user_ids, indptr, positions, strength = interactions(index)
+
+        expected = Counter()
+        for user_id, item_id in OrderItem.objects.values_list("order__customer_id", "menu_item_id"):
+            expected[user_id, item_id] += 1
+        for review in Review.objects.filter(rating__gte=LIKED_RATING):
+            expected[review.user_id, review.menu_item_id] += review.rating - 3
+        rows = np.repeat(user_ids, np.diff(indptr))
+        self.assertEqual(dict(zip(zip(rows.tolist(), index.ids[positions].tolist()), strength.tolist())),
+                         dict(expected))
+
+    def test_scores_follow_the_index(self):
+        build_factors(get_item_index(), iterations=3, factors=4)
+        model = load_factors()
+        user = self.users[1]
+        expected = dict(zip(model.item_ids.tolist(), (model.item_factors @ model.user_vector(user.pk)).tolist()))
+        # A process whose index lists the items in another order.
+        index = ItemIndex(sorted(expected, reverse=True))
+
+        scores = model.align(index).scores(user.pk)
+
+        for item_id, value in expected.items():
+            self.assertAlmostEqual(float(scores[index.pos[item_id]]), value, places=5)
+
+    def test_component(self):
+        self.assertEqual(utils.mf_scores(self.users[0]), {})
+
+        call_command("train_recommender_mf", iterations=3, factors=4, workers=1, stdout=StringIO())
+        utils.reset_state()
+        scores = utils.mf_scores(self.users[0])
+
+        self.assertEqual(len(scores), len(get_item_index()))
+        self.assertTrue(((scores >= 0) & (scores <= 1)).all())
+        self.assertTrue(scores.any())
+        stranger = get_user_model().objects.create_user("stranger", "stranger@example.com", "pw")
+        self.assertEqual(utils.mf_scores(stranger), {})
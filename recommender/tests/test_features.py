@@ -0,0 +1,58 @@
+from collections import Counter
+
+from order.models import Order, OrderItem
+from .. import utils
+from ..features import refresh_user_features
+from ..models import UserItemStats, UserStats
+from .base import RecommenderTestCase
+
+
+class UserFeatureTests(RecommenderTestCase):
+    """``UserStats`` and ``UserItemStats`` kept current by order writes, against the orders themselves."""
+
+    def assertFeaturesMatchOrders(self, user):
+        orders = Order.objects.filter(customer=user)
+        lines = Counter(OrderItem.objects.filter(order__customer=user).values_list("menu_item_id", flat=True))
+        stats = UserStats.objects.filter(user=user).first()
+        if not orders:
+            self.assertIsNone(stats)
+        else:
+            self.assertEqual(stats.order_count, orders.count())
+            self.assertEqual(stats.total_spent, sum(order.total_price for order in orders))
+        self.assertEqual(dict(UserItemStats.objects.filter(user=user).values_list("menu_item_id", "order_count")),
+                         dict(lines))
+        self.assertEqual(utils.history_scores(user), dict(lines))
+
+    def test_fixture_orders(self):
+        for user in self.users:
+            self.assertFeaturesMatchOrders(user)
+
+    def test_new_order_and_lines(self):
+        with self.commit():
+            order = self.place_order(self.users[1], [self.items[1], self.items[8]])
+        with self.commit():
+            OrderItem.objects.create(order=order, menu_item=self.items[1])
+
+        self.assertFeaturesMatchOrders(self.users[1])
+
+    def test_deleted_orders(self):
+        user = self.users[2]
+        first, *rest = Order.objects.filter(customer=user).order_by("pk")
+        with self.commit():
+            first.delete()
+        self.assertFeaturesMatchOrders(user)
+
+        with self.commit():
+            for order in rest:
+                order.delete()
+        self.assertFeaturesMatchOrders(user)
+        self.assertFalse(UserItemStats.objects.filter(user=user).exists())
+
+    def test_refresh_repairs_rows(self):
+        user = self.users[3]
+        UserStats.objects.filter(user=user).update(order_count=0, total_spent=0)
+        UserItemStats.objects.filter(user=user).delete()
+
+        refresh_user_features(user.pk)
+
+        self.assertFeaturesMatchOrders(user)
@@ -0,0 +1,67 @@
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from menu.models import MenuItem
+from .. import utils
+from ..filters import ItemFilter
+from .base import RecommenderTestCase
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0)
+class FilterEndpointTests(RecommenderTestCase):
+    """``/api/recommend/me/`` filters, checked against the catalog."""
+
+    url = "/api/recommend/me/"
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.users[1]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recommended(self, **params):
+        response = self.client.get(self.url, {"n": 10, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return MenuItem.objects.in_bulk([item["id"] for item in response.data["recommendations"]]).values()
+
+    def test_category(self):
+        drinks = self.items[9].category
+        items = self.recommended(category=str(drinks.pk))
+
+        self.assertTrue(items)
+        self.assertTrue(all(item.category_id == drinks.pk for item in items))
+
+    def test_max_price(self):
+        items = self.recommended(max_price="400")
+
+        self.assertTrue(items)
+        self.assertTrue(all(item.price <= 400 for item in items))
+
+    def test_exclude_ingredients(self):
+        avoided = self.ingredients[:2]
+        items = self.recommended(exclude_ingredients=",".join(str(i.pk) for i in avoided))
+
+        self.assertTrue(items)
+        for item in items:
+            self.assertFalse(item.recipe_set.filter(ingredients__in=avoided).exists(), item)
+
+    def test_availability(self):
+        hidden = self.items[8]
+        hidden.is_available = False
+        hidden.save()
+
+        self.assertNotIn(hidden, self.recommended())
+        self.assertIn(hidden, self.recommended(available="false"))
+
+    def test_matches_ranking(self):
+        response = self.client.get(self.url, {"n": 3, "category": self.items[0].category_id, "max_price": 700})
+        expected = utils.hybrid_recommendation(
+            self.user, 3, item_filter=ItemFilter(categories=[self.items[0].category_id], max_price=700))
+
+        self.assertEqual([item["id"] for item in response.data["recommendations"]],
+                         [item.pk for item in expected])
+
+    def test_invalid(self):
+        for params in ({"category": "x"}, {"max_price": "cheap"}, {"available": "maybe"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
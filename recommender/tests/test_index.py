@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ..index import ItemIndex, top_positions
+
+
+class ItemIndexTests(SimpleTestCase):
+
+    def test_extend_keeps_positions(self):
+        index = ItemIndex([30, 10])
+        index.extend([10, 20, 40, 20])
+
+        np.testing.assert_array_equal(index.ids, [30, 10, 20, 40])
+        np.testing.assert_array_equal(index.positions([40, 30, 50]), [3, 0, 4])
+        np.testing.assert_array_equal(index.vector({20: 1.5}), [0, 0, 1.5, 0, 0])
+
+    def test_ids_published_before_positions(self):
+        index = ItemIndex([1, 2])
+        seen = []
+
+        class Positions(dict):
+            def update(self, new):
+                # What a reader without the lock sees once an id is in pos.
+                seen.extend(index.ids[p] == i for i, p in new.items())
+                super().update(new)
+
+        index.pos = Positions(index.pos)
+        index.extend([3, 4])
+
+        self.assertEqual(seen, [True, True])
+
+    def test_concurrent_readers(self):
+        index = ItemIndex()
+        done = threading.Event()
+        misses = []
+
+        def read():
+            while not done.is_set():
+                for item_id, pos in list(index.pos.items()):
+                    if pos >= len(index.ids) or index.ids[pos] != item_id:
+                        misses.append(item_id)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for start in range(0, 20000, 50):
+                index.extend(range(start, start + 50))
+        finally:
+            done.set()
+            reader.join()
+
+        self.assertEqual(misses, [])
+
+
+class TopPositionsTests(SimpleTestCase):
+
+    def test_ties_by_position(self):
+        scores = np.array([1.0, 3.0, -np.inf, 3.0, 2.0])
+
+        np.testing.assert_array_equal(top_positions(scores), [1, 3, 4, 0])
+        np.testing.assert_array_equal(top_positions(scores, 2), [1, 3])
+        self.assertEqual(len(top_positions(scores, 0)), 0)
@@ -0,0 +1,103 @@
+import numpy as np
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from menu.models import MenuItem
+from ..content import build_ingredient_model
+from ..cooccurrence import build_from_table
+from ..index import get_item_index
+from ..models import ItemNeighbor
+from ..neighbors import NEIGHBOR_WEIGHTS, rebuild_neighbors, similarity_rows
+from .base import RecommenderTestCase
+
+
+def neighbor_lists():
+    lists = {}
+    for item_id, neighbor_id in ItemNeighbor.objects.order_by("item_id", "rank").values_list("item_id", "neighbor_id"):
+        lists.setdefault(item_id, []).append(neighbor_id)
+    return lists
+
+
+class NeighborTests(RecommenderTestCase):
+
+    def test_similarity_matches_dense(self):
+        index = get_item_index()
+        cooc = build_from_table(index)
+        model = build_ingredient_model(index)
+        size = len(index)
+
+        counts = np.zeros((size, size))
+        weights = np.zeros((size, len(model.ingredient_ids)))
+        for pos in range(size):
+            cols, data = cooc.row(pos)
+            counts[pos, cols] = data
+            lo, hi = model.indptr[pos], model.indptr[pos + 1]
+            weights[pos, model.indices[lo:hi]] = model.weights[lo:hi]
+        marginals = counts.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            basket = np.nan_to_num(counts / np.sqrt(np.outer(marginals, marginals)))
+        expected = NEIGHBOR_WEIGHTS["basket"] * basket + NEIGHBOR_WEIGHTS["ingredients"] * weights @ weights.T
+        np.fill_diagonal(expected, 0)
+
+        np.testing.assert_allclose(similarity_rows(np.arange(size), cooc, model, size), expected, atol=1e-8)
+
+    def test_rebuild(self):
+        written = rebuild_neighbors(get_item_index(), k=3)
+
+        lists = neighbor_lists()
+        self.assertEqual(written, sum(len(ids) for ids in lists.values()))
+        self.assertTrue(all(len(ids) <= 3 for ids in lists.values()))
+        for item_id, ids in lists.items():
+            self.assertNotIn(item_id, ids)
+            scores = list(ItemNeighbor.objects.filter(item_id=item_id).order_by("rank")
+                          .values_list("score", flat=True))
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+    @override_settings(RECOMMENDER_NEIGHBORS=3)
+    def test_order_refreshes_its_items(self):
+        rebuild_neighbors(get_item_index())
+        with self.commit():
+            for _ in range(3):
+                self.place_order(self.users[0], [self.items[6], self.items[9]])
+        live = neighbor_lists()
+
+        rebuild_neighbors(get_item_index())
+        rebuilt = neighbor_lists()
+
+        for item in (self.items[6], self.items[9]):
+            self.assertEqual(live[item.pk], rebuilt[item.pk])
+        self.assertIn(self.items[9].pk, live[self.items[6].pk])
+
+
+class SimilarItemsEndpointTests(RecommenderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rebuild_neighbors(get_item_index())
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def get(self, item, **params):
+        return self.client.get(f"/api/menu-items/{item.pk}/similar/", params)
+
+    def test_ranked_neighbors(self):
+        item = self.items[1]
+        response = self.get(item, n=3)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["item"], item.pk)
+        self.assertEqual([row["id"] for row in response.data["similar"]], neighbor_lists()[item.pk][:3])
+        self.assertEqual(response.data["count"], 3)
+
+    def test_all_available(self):
+        item = self.items[1]
+        hidden_id = neighbor_lists()[item.pk][0]
+        MenuItem.objects.filter(pk=hidden_id).update(is_available=False)
+
+        ids = [row["id"] for row in self.get(item, n="all").data["similar"]]
+
+        self.assertEqual(ids, [i for i in neighbor_lists()[item.pk] if i != hidden_id])
+
+    def test_unknown_item(self):
+        response = self.client.get("/api/menu-items/999999/similar/")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,130 @@
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from order.models import Order, OrderItem
+from ..cooccurrence import build_from_table, count_order_pairs, increment_pairs, reconcile_pairs
+from ..index import ItemIndex
+from ..models import ItemPair
+from .base import RecommenderTestCase
+
+
+class ItemPairTests(RecommenderTestCase):
+    """``ItemPair`` rows maintained on order writes against a full rescan of the history."""
+
+    def assertPairsReconciled(self):
+        stored = {(a, b): n for a, b, n in
+                  ItemPair.objects.filter(count__gt=0).values_list("item_a_id", "item_b_id", "count")}
+        self.assertEqual(stored, dict(count_order_pairs()))
+        self.assertEqual(reconcile_pairs(), (0, 0, 0))
+
+    def test_fixture_orders(self):
+        self.assertPairsReconciled()
+
+    def test_lines_saved_together(self):
+        with self.commit(), transaction.atomic():
+            self.place_order(self.users[0], [self.items[0], self.items[7], self.items[8], self.items[9]])
+
+        self.assertPairsReconciled()
+
+    def test_lines_added_in_later_transactions(self):
+        with self.commit():
+            order = self.place_order(self.users[1], [self.items[2]])
+        with self.commit():
+            OrderItem.objects.create(order=order, menu_item=self.items[3])
+        with self.commit():
+            OrderItem.objects.create(order=order, menu_item=self.items[6])
+
+        self.assertPairsReconciled()
+
+    def test_repeated_dish(self):
+        with self.commit():
+            self.place_order(self.users[2], [self.items[1], self.items[5], self.items[1]])
+
+        self.assertPairsReconciled()
+
+    def test_rolled_back_savepoint(self):
+        with self.commit():
+            self.place_order(self.users[3], [self.items[0], self.items[9]])
+            try:
+                with transaction.atomic():
+                    self.place_order(self.users[3], [self.items[6], self.items[7]])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertPairsReconciled()
+
+    def test_order_placed_through_the_api(self):
+        client = APIClient()
+        client.force_authenticate(self.users[4])
+        lines = [{"menu_item": item.pk, "quantity": 1} for item in self.items[6:10]]
+
+        with self.commit():
+            response = client.post("/api/order/orders/", {"items": lines}, format="json")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertEqual(order.customer, self.users[4])
+        self.assertEqual(order.items.count(), 4)
+        self.assertEqual(ItemPair.objects.get(item_a=self.items[6], item_b=self.items[9]).count, 1)
+        self.assertPairsReconciled()
+
+
+class IncrementPairsTests(RecommenderTestCase):
+
+    def pair_counts(self):
+        return {(a, b): n for a, b, n in ItemPair.objects.values_list("item_a_id", "item_b_id", "count")}
+
+    def test_batched_queries(self):
+        ids = sorted(item.pk for item in self.items)
+        pairs = [(a, b) for i, a in enumerate(ids) for b in ids[i + 1:]]
+        before = self.pair_counts()
+        self.assertTrue(0 < len(before) < len(pairs))
+
+        # SELECT, UPDATE, then SAVEPOINT, INSERT, RELEASE for the new pairs.
+        with self.assertNumQueries(5):
+            increment_pairs(pairs)
+
+        after = self.pair_counts()
+        self.assertEqual(after, {pair: before.get(pair, 0) + 1 for pair in pairs})
+
+    def test_repeated_pairs(self):
+        a, b, c = sorted(item.pk for item in self.items[7:10])
+        before = self.pair_counts()
+
+        increment_pairs([(a, b), (a, c), (a, b), (a, b)])
+
+        after = self.pair_counts()
+        self.assertEqual(after[a, b], before.get((a, b), 0) + 3)
+        self.assertEqual(after[a, c], before.get((a, c), 0) + 1)
+
+    def test_nothing_to_add(self):
+        with self.assertNumQueries(0):
+            increment_pairs([])
+
+
+class BuildFromTableTests(RecommenderTestCase):
+
+    def test_matches_rows(self):
+        # Items missing from the index are appended to it.
+        index = ItemIndex([self.items[5].pk, self.items[2].pk])
+        ItemPair.objects.filter(pk=ItemPair.objects.first().pk).update(count=0)
+
+        matrix = build_from_table(index)
+
+        rows = list(ItemPair.objects.values_list("item_a_id", "item_b_id", "count"))
+        self.assertEqual(matrix.size, len(index))
+        self.assertEqual(int(matrix.marginals.sum()), 2 * sum(n for _, _, n in rows))
+        for a, b, n in rows:
+            pa, pb = index.positions([a, b]).tolist()
+            self.assertEqual(matrix.count(pa, pb), n)
+            self.assertEqual(matrix.count(pb, pa), n)
+
+    def test_empty_table(self):
+        ItemPair.objects.all().delete()
+        index = ItemIndex(item.pk for item in self.items)
+
+        matrix = build_from_table(index)
+
+        self.assertEqual(matrix.size, len(self.items))
+        self.assertEqual(matrix.nnz, 0)
@@ -0,0 +1,91 @@
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from menu.models import MenuItem
+from order.models import OrderItem
+from ..index import get_item_index
+from ..models import ItemPopularity
+from ..popularity import decayed_scores, rebuild_popularity, record_order_lines, window_counts
+from .base import RecommenderTestCase
+
+
+class PopularityTests(RecommenderTestCase):
+    """Popularity counters maintained on order writes against the order lines."""
+
+    def assertPopularityCounted(self):
+        lines = Counter(OrderItem.objects.values_list("menu_item_id", flat=True))
+        self.assertEqual(dict(ItemPopularity.objects.values_list("menu_item_id", "total")), dict(lines))
+
+    def test_fixture_orders(self):
+        self.assertPopularityCounted()
+
+    def test_lines_added_in_later_transactions(self):
+        with self.commit():
+            order = self.place_order(self.users[1], [self.items[2]])
+        with self.commit():
+            OrderItem.objects.create(order=order, menu_item=self.items[3])
+
+        self.assertPopularityCounted()
+
+    def test_rolled_back_savepoint(self):
+        with self.commit():
+            self.place_order(self.users[3], [self.items[0], self.items[9]])
+            try:
+                with transaction.atomic():
+                    self.place_order(self.users[3], [self.items[6], self.items[7]])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertPopularityCounted()
+
+
+@override_settings(RECOMMENDER_POPULARITY_HALF_LIFE_HOURS=24)
+class DecayAndWindowTests(RecommenderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.item = MenuItem.objects.create(category=self.items[0].category, name="Special", price=500)
+
+    def score(self, now=None):
+        index = get_item_index()
+        return decayed_scores(index, now or self.now)[index.pos[self.item.pk]]
+
+    def test_half_life(self):
+        record_order_lines([self.item.pk, self.item.pk], when=self.now - timedelta(hours=24))
+        self.assertAlmostEqual(self.score(), 1.0)
+        self.assertAlmostEqual(self.score(self.now + timedelta(hours=24)), 0.5)
+
+    def test_later_lines_decay_earlier_ones(self):
+        record_order_lines([self.item.pk], when=self.now - timedelta(hours=48))
+        record_order_lines([self.item.pk], when=self.now - timedelta(hours=24))
+        self.assertAlmostEqual(self.score(), 0.75)
+        self.assertEqual(ItemPopularity.objects.get(menu_item=self.item).total, 2)
+
+    def test_windows(self):
+        record_order_lines([self.item.pk], when=self.now - timedelta(minutes=5))
+        record_order_lines([self.item.pk] * 2, when=self.now - timedelta(hours=5))
+        record_order_lines([self.item.pk] * 4, when=self.now - timedelta(days=3))
+        record_order_lines([self.item.pk] * 8, when=self.now - timedelta(days=30))
+
+        index = get_item_index()
+        counts = {name: vec[index.pos[self.item.pk]] for name, vec in window_counts(index, self.now).items()}
+        self.assertEqual(counts, {"hour": 1, "day": 3, "week": 7})
+
+    def test_rebuild_matches_incremental_counters(self):
+        with self.commit():
+            self.place_order(self.users[0], [self.items[7], self.items[8]])
+        index = get_item_index()
+        incremental = decayed_scores(index, self.now)
+        totals = dict(ItemPopularity.objects.values_list("menu_item_id", "total"))
+
+        rebuild_popularity(self.now)
+
+        self.assertEqual(dict(ItemPopularity.objects.values_list("menu_item_id", "total")), totals)
+        np.testing.assert_allclose(decayed_scores(index, self.now), incremental, rtol=1e-4)
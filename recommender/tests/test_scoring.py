@@ -0,0 +1,118 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from menu.models import MenuItem
+from .. import utils
+from ..index import get_item_index
+from ..neighbors import rebuild_neighbors
+from .base import RecommenderTestCase
+
+
+def reference_ranking(user):
+    """The weighted hybrid score item by item, as a plain loop over the components."""
+    parts = utils.component_scores(user)
+    index = get_item_index()
+    for part in parts:
+        if isinstance(part, dict):
+            index.extend(part)
+
+    def value(part, item_id, pos):
+        if isinstance(part, dict):
+            return part.get(item_id, 0)
+        return float(part[pos]) if pos < len(part) else 0
+
+    totals = {}
+    for pos, item_id in enumerate(index.ids.tolist()):
+        values = [value(part, item_id, pos) for part in parts]
+        if item_id in parts[0] or not any(values):
+            continue
+        total = sum(utils.WEIGHTS[name] * v for name, v in zip(utils.COMPONENTS, values))
+        totals[item_id] = round(total, 9)
+    return sorted(totals, key=lambda item_id: (-totals[item_id], index.pos[item_id]))
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0, RECOMMENDER_CANDIDATES=None)
+class ScoringTests(RecommenderTestCase):
+    """The vectorized ranking against ``reference_ranking``."""
+
+    def test_matches_reference(self):
+        for user in self.users:
+            with self.subTest(user=user.username):
+                self.assertEqual(utils.recommended_ids(user, None), reference_ranking(user))
+
+    def test_top_n_is_a_prefix(self):
+        user = self.users[2]
+        ranking = utils.recommended_ids(user, None)
+        for top_n in (1, 3, len(ranking) + 5):
+            with self.subTest(top_n=top_n):
+                self.assertEqual(utils.recommended_ids(user, top_n), ranking[:top_n])
+
+    def test_ordered_items_excluded(self):
+        for user in self.users:
+            ordered = set(utils.history_scores(user))
+            with self.subTest(user=user.username):
+                self.assertTrue(ordered)
+                self.assertFalse(ordered & set(utils.recommended_ids(user, None)))
+
+    def test_new_item_joins_the_index(self):
+        with self.commit():
+            item = MenuItem.objects.create(category=self.items[0].category, name="Special", price=300,
+                                           daypart=utils.daypart())
+            self.place_order(self.users[4], [item, self.items[0]])
+
+        self.assertIn(item.pk, utils.recommended_ids(self.users[0], None))
+        self.assertEqual(utils.recommended_ids(self.users[0], None), reference_ranking(self.users[0]))
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0)
+class CandidateTests(RecommenderTestCase):
+    """Stage one of ranking: a bounded candidate set, then the full re-rank within it."""
+
+    def candidates(self, user, limit):
+        parts = utils.component_scores(user)
+        history = parts[0]
+        index = get_item_index()
+        return utils.candidate_positions(history, parts[1], parts[2], utils.history_neighbors(history),
+                                         index, limit=limit)
+
+    def test_large_limit_ranks_like_no_limit(self):
+        rebuild_neighbors(get_item_index())
+        for user in self.users:
+            with self.subTest(user=user.username):
+                with self.settings(RECOMMENDER_CANDIDATES=None):
+                    full = utils.recommended_ids(user, None)
+                cache.clear()
+                with self.settings(RECOMMENDER_CANDIDATES=len(self.items)):
+                    self.assertEqual(utils.recommended_ids(user, None), full)
+
+    def test_small_limit_reranks_the_candidates(self):
+        rebuild_neighbors(get_item_index())
+        user = self.users[1]
+        index = get_item_index()
+        candidates = self.candidates(user, 3)
+        with self.settings(RECOMMENDER_CANDIDATES=None):
+            full = utils.recommended_ids(user, None)
+        cache.clear()
+
+        with self.settings(RECOMMENDER_CANDIDATES=3):
+            ids = utils.recommended_ids(user, None)
+
+        self.assertEqual(len(candidates), 3)
+        self.assertEqual(set(ids), set(index.ids[candidates].tolist()) & set(full))
+        self.assertEqual(ids, [i for i in full if i in ids])
+
+    def test_neighbours_first(self):
+        rebuild_neighbors(get_item_index())
+        user = self.users[2]
+        index = get_item_index()
+        history = utils.history_scores(user)
+        neighbors = utils.history_neighbors(history)
+        # Best ranks first, across the user's items; favourite items break ties.
+        ranked = sorted((rank, -history[item_id], neighbor_id) for item_id in history
+                        for rank, neighbor_id in enumerate(neighbors[item_id]))
+        expected = list(dict.fromkeys(n for _, _, n in ranked if n not in history))[:5]
+
+        candidates = self.candidates(user, 5)
+
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(index.ids[candidates].tolist(), expected)
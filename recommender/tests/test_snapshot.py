@@ -0,0 +1,114 @@
+import numpy as np
+from django.test import override_settings
+
+from .. import utils
+from ..index import ItemIndex, get_item_index, set_item_index, top_positions
+from ..models import ItemPair
+from ..snapshot import ARRAYS, build_snapshot, load_snapshot
+from .base import RecommenderTestCase
+
+
+def ranking(user):
+    index = get_item_index()
+    return index.ids[top_positions(utils.score_items(user, index))].tolist()
+
+
+class SnapshotTests(RecommenderTestCase):
+    """Serving from a snapshot, and what reaches it after it was built."""
+
+    def assertMatrixMatchesTable(self, matrix):
+        index = get_item_index()
+        for a, b, n in ItemPair.objects.values_list("item_a_id", "item_b_id", "count"):
+            pa, pb = index.positions([a, b]).tolist()
+            self.assertEqual(matrix.count(pa, pb), n, (a, b))
+            self.assertEqual(matrix.count(pb, pa), n, (a, b))
+
+    def test_load(self):
+        build_snapshot()
+        snapshot = utils.load_current_snapshot()
+
+        self.assertIsNotNone(snapshot)
+        np.testing.assert_array_equal(get_item_index().ids, sorted(item.pk for item in self.items))
+        self.assertIs(utils.get_snapshot(), snapshot)
+        self.assertMatrixMatchesTable(utils.get_basket_freq())
+
+    def test_pairs_written_after_the_build_are_applied(self):
+        build_snapshot()
+        with self.commit():
+            self.place_order(self.users[0], [self.items[0], self.items[7], self.items[9]])
+        # A worker starting now: the snapshot predates the order.
+        utils.reset_state()
+        snapshot = utils.load_current_snapshot()
+        a, b = get_item_index().positions([self.items[7].pk, self.items[9].pk]).tolist()
+        self.assertEqual(snapshot.cooccurrence().count(a, b), 0)
+
+        matrix = utils.get_basket_freq()
+
+        self.assertEqual(matrix.count(a, b), 1)
+        self.assertMatrixMatchesTable(matrix)
+        # The memory-mapped arrays stay the base of the matrix.
+        self.assertIs(matrix.data, snapshot.cooc_data)
+
+    def test_rows_in_the_snapshot_are_not_counted_twice(self):
+        build_snapshot()
+        # Touch every row after the build without changing its count.
+        for pair in ItemPair.objects.all():
+            pair.save()
+        utils.reset_state()
+        utils.load_current_snapshot()
+
+        self.assertMatrixMatchesTable(utils.get_basket_freq())
+
+    def test_content_model_follows_the_snapshot_until_refresh(self):
+        build_snapshot()
+        utils.load_current_snapshot()
+        loaded = utils.CONTENT_MODEL
+
+        self.assertIs(utils.get_content_model(), loaded)
+        with override_settings(RECOMMENDER_CONTENT_REFRESH_SECONDS=0):
+            rebuilt = utils.get_content_model()
+        self.assertIsNot(rebuilt, loaded)
+        np.testing.assert_allclose(rebuilt.scores(rebuilt.profile_vector({self.ingredients[0].pk: 1})),
+                                   loaded.scores(loaded.profile_vector({self.ingredients[0].pk: 1})))
+
+    def test_running_index_extended_in_place(self):
+        build_snapshot()
+        ids = sorted(item.pk for item in self.items)
+        index = ItemIndex(ids[:4])
+        set_item_index(index)
+
+        utils.load_current_snapshot()
+
+        self.assertIs(get_item_index(), index)
+        np.testing.assert_array_equal(index.ids, ids)
+
+    def test_realign_to_the_snapshot_order(self):
+        expected = {user.pk: ranking(user) for user in self.users}
+        build_snapshot()
+        utils.reset_state()
+        set_item_index(ItemIndex(sorted((item.pk for item in self.items), reverse=True)))
+        utils.popularity_vector()
+
+        snapshot = utils.load_current_snapshot()
+
+        np.testing.assert_array_equal(get_item_index().ids, snapshot.item_ids)
+        # Structures built against the old positions were dropped.
+        self.assertIsNone(utils.POPULARITY)
+        for user in self.users:
+            with self.subTest(user=user.username):
+                self.assertEqual(ranking(user), expected[user.pk])
+
+    def test_older_format_ignored(self):
+        version = build_snapshot()
+        path = load_snapshot().path / "meta.json"
+        path.write_text(path.read_text().replace('"format": ', '"format": -'))
+
+        self.assertIsNone(load_snapshot(version))
+
+    def test_only_read_arrays_are_written(self):
+        build_snapshot(spend_tiers=(300, 700))
+        snapshot = utils.load_current_snapshot()
+
+        self.assertEqual({path.name for path in snapshot.path.iterdir()},
+                         {f"{name}.npy" for name in ARRAYS} | {"meta.json"})
+        self.assertEqual(utils.spend_tiers(), (300, 700))
@@ -0,0 +1,68 @@
+import json
+
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .. import utils
+from .base import RecommenderTestCase
+
+
+class FetchTests(RecommenderTestCase):
+
+    def test_fetch_keeps_order(self):
+        ids = [self.items[4].pk, self.items[0].pk, 999999, self.items[7].pk]
+
+        with self.assertNumQueries(1):
+            items = utils.fetch_items(ids)
+
+        self.assertEqual([item.pk for item in items], [ids[0], ids[1], ids[3]])
+
+    def test_iter_in_chunks(self):
+        ids = [item.pk for item in reversed(self.items)]
+
+        with self.assertNumQueries(4):
+            chunks = list(utils.iter_items(ids, chunk_size=3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 3, 1])
+        self.assertEqual([item.pk for chunk in chunks for item in chunk], ids)
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0)
+class StreamingEndpointTests(RecommenderTestCase):
+    url = "/api/recommend/me/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[3])
+
+    def streamed(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertTrue(response["Server-Timing"])
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_all(self):
+        body = self.streamed(n="all")
+
+        ids = utils.recommended_ids(self.users[3], None)
+        self.assertEqual([row["id"] for row in body["recommendations"]], ids)
+        self.assertEqual(body["count"], len(ids))
+        self.assertEqual(body["user"], self.users[3].pk)
+        self.assertFalse(body["degraded"])
+
+    @override_settings(RECOMMENDER_STREAM_CHUNK=2)
+    def test_same_body_as_a_plain_response(self):
+        body = self.streamed(n=5)
+        # Staff debug output is never streamed.
+        self.client.force_authenticate(self.staff)
+        plain = self.client.get(f"/api/recommend/{self.users[3].pk}/", {"n": 5, "debug": "timing"})
+
+        self.assertEqual(body["recommendations"], json.loads(plain.content)["recommendations"])
+        self.assertEqual(body["count"], 5)
+
+    def test_small_lists_are_not_streamed(self):
+        response = self.client.get(self.url, {"n": 3})
+        self.assertNotIsInstance(response, StreamingHttpResponse)
@@ -0,0 +1,92 @@
+from collections import Counter
+
+from django.test import Client
+
+from menu.models import MenuItem
+from order.models import OrderItem
+from ..cooccurrence import count_order_pairs
+from ..index import get_item_index
+from ..tables import TABLE_WEIGHTS, table_recommendation
+from .base import RecommenderTestCase
+
+
+class TableRecommendationTests(RecommenderTestCase):
+    """The QR-scan payload and its per-table cache."""
+
+    def scan(self, table, **params):
+        return Client().get(f"/qr/scan/{table.pk}/", params)
+
+    def outlet_counts(self, table):
+        return Counter(OrderItem.objects.filter(order__table__outlet=table.outlet)
+                       .values_list("menu_item_id", flat=True))
+
+    def expected_ids(self, table, outlet=None):
+        lines = Counter(OrderItem.objects.filter(order__table=table).values_list("menu_item_id", flat=True))
+        basket = Counter()
+        for (a, b), count in count_order_pairs().items():
+            basket[b] += lines[a] * count
+            basket[a] += lines[b] * count
+        outlet = outlet or self.outlet_counts(table)
+        total = Counter()
+        for name, signal in (("recent", lines), ("basket", basket), ("popular", outlet)):
+            top = max(signal.values())
+            for item_id, value in signal.items():
+                total[item_id] += TABLE_WEIGHTS[name] * value / top
+        available = set(MenuItem.objects.filter(is_available=True).values_list("pk", flat=True))
+        return sorted((i for i in total if i in available and total[i] > 0),
+                      key=lambda i: (-round(total[i], 9), get_item_index().pos[i]))
+
+    def test_payload(self):
+        response = self.scan(self.table, n=4)
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["table_id"], self.table.pk)
+        self.assertEqual(body["outlet_id"], self.outlet.pk)
+        self.assertEqual({order["order_id"] for order in body["last_orders"]},
+                         set(self.table.orders.values_list("pk", flat=True)))
+        self.assertEqual([row["id"] for row in body["recommendations"]], self.expected_ids(self.table)[:4])
+
+    def test_cached_until_the_table_orders(self):
+        first = table_recommendation(self.table.pk)
+        outlet = self.outlet_counts(self.table)
+        with self.assertNumQueries(0):
+            self.assertEqual(table_recommendation(self.table.pk), first)
+
+        with self.commit():
+            order = self.place_order(self.users[0], [self.items[7], self.items[8]], table=self.table)
+        with self.commit():
+            self.place_order(self.users[0], [self.items[6]], table=self.other_table)
+
+        payload = table_recommendation(self.table.pk)
+        self.assertEqual(payload["last_orders"][0]["order_id"], order.pk)
+        # Outlet counts are shared for a while, so the new lines only move
+        # the table's own signals.
+        self.assertEqual([row["id"] for row in payload["recommendations"]],
+                         self.expected_ids(self.table, outlet)[:10])
+
+    def test_catalog_change(self):
+        top = table_recommendation(self.table.pk)["recommendations"][0]["id"]
+        item = MenuItem.objects.get(pk=top)
+        item.is_available = False
+        with self.commit():
+            item.save()
+
+        ids = [row["id"] for row in table_recommendation(self.table.pk)["recommendations"]]
+
+        self.assertNotIn(top, ids)
+
+    def test_outlet_popularity_shared(self):
+        with self.commit():
+            self.place_order(self.users[2], [self.items[0]], table=self.other_table)
+        table_recommendation(self.table.pk)
+
+        with self.assertNumQueries(4):
+            # The table, its orders with their lines and the item fetch; the
+            # outlet's counts come from the cache.
+            table_recommendation(self.other_table.pk)
+
+    def test_errors(self):
+        self.assertEqual(Client().get("/qr/scan/999999/").status_code, 404)
+        self.assertEqual(self.scan(self.table, n="x").status_code, 400)
+        self.assertEqual(self.scan(self.table, n=0).json()["recommendations"], [])
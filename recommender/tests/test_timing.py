@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .. import utils
+from ..timing import server_timing, timed
+from .base import RecommenderTestCase
+
+
+def header_names(response):
+    return [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+
+
+@override_settings(RECOMMENDER_COHORT_SIZE=0)
+class TimingTests(RecommenderTestCase):
+    url = "/api/recommend/me/"
+
+    def test_timed(self):
+        timings = {}
+        with timed(timings, "users"):
+            list(get_user_model().objects.all())
+            list(get_user_model().objects.all())
+
+        self.assertEqual(timings["users"]["queries"], 2)
+        self.assertGreaterEqual(timings["users"]["ms"], 0)
+        with timed(None, "users"):
+            pass
+
+    def test_server_timing(self):
+        header = server_timing({"cache": {"ms": 0.5, "queries": 0}, "history": {"ms": 1.25, "queries": 1}})
+        self.assertEqual(header, 'cache;dur=0.5;desc="0 queries", history;dur=1.25;desc="1 queries"')
+
+    def test_header_per_stage(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+
+        response = client.get(self.url, {"n": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(header_names(response),
+                         ["cache", "cold_start", *utils.COMPONENTS, "candidates", "merge", "fetch", "total"])
+        self.assertNotIn("timing", response.data)
+
+        # Served from cache: no component runs.
+        cached = client.get(self.url, {"n": 3, "debug": "timing"})
+        self.assertEqual(header_names(cached), ["cache", "fetch", "total"])
+        # The debug payload is for staff only.
+        self.assertNotIn("timing", cached.data)
+
+    def test_debug_payload_for_staff(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        response = client.get(f"/api/recommend/{self.users[1].pk}/", {"n": 3, "debug": "timing"})
+
+        timing = response.data["timing"]
+        self.assertEqual(list(timing), header_names(response))
+        self.assertEqual(timing["total"]["queries"],
+                         sum(t["queries"] for name, t in timing.items() if name != "total"))
+        self.assertEqual(response.data["dropped"], [])
+        self.assertFalse(response.data["fallback"])
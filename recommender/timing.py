@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+from django.db import connection
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook counting executed queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def timed(timings, name):
+    """
+    Record wall time (ms) and query count of the block as ``timings[name]``.
+    A ``None`` timings dict turns this into a no-op.
+    """
+    if timings is None:
+        yield
+        return
+    counter = QueryCounter()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(counter):
+            yield
+    finally:
+        timings[name] = {
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+            "queries": counter.count,
+        }
+
+
+def server_timing(timings):
+    """Format timings as a ``Server-Timing`` header value."""
+    return ", ".join(
+        f'{name};dur={t["ms"]};desc="{t["queries"]} queries"'
+        for name, t in timings.items()
+    )
@@ -1,8 +1,15 @@
 from django.urls import path
-from .views import RecommendationAPIView, MenuItemListAPIView
+from .views import (
+    RecommendationAPIView, RecommendationBatchAPIView, CartRecommendationAPIView,
+    RecommenderMetricsAPIView, MenuItemListAPIView, SimilarItemsAPIView,
+)
 
 urlpatterns = [
     path("recommend/me/", RecommendationAPIView.as_view()),
     path("recommend/<int:user_id>/", RecommendationAPIView.as_view()),
+    path("recommend/batch/", RecommendationBatchAPIView.as_view()),
+    path("recommend/cart/", CartRecommendationAPIView.as_view()),
+    path("recommend/metrics/", RecommenderMetricsAPIView.as_view()),
     path("menu-items/", MenuItemListAPIView.as_view()),
+    path("menu-items/<int:pk>/similar/", SimilarItemsAPIView.as_view()),
 ]
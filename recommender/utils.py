@@ -1,9 +1,27 @@
-import itertools
-from collections import Counter, defaultdict
+import threading
+import time
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connections
 from django.utils import timezone
-from django.db.models import Count, Avg, Q
-from menu.models import MenuItem, Ingredient, Review
-from order.models import Order, OrderItem
+from django.db.models import Count
+from menu.models import MenuItem
+from order.models import OrderItem
+from .caching import catalog_version, fallback_key, get_result, result_key, set_result
+from .content import build_ingredient_model
+from .cooccurrence import apply_pair_changes, build_from_table
+from .factorization import factors_root, load_factors
+from .filters import build_item_attributes
+from .index import ItemIndex, get_item_index, set_item_index, top_positions
+from .models import ItemNeighbor, TasteProfile, UserItemStats
+from .popularity import decayed_scores, window_counts
+from .snapshot import PRICE_BANDS, current_version, load_snapshot, price_bands
+from .spend import SPEND_TIERS, average_spend, spend_tier
+from .singleflight import SingleFlight
+from .timing import timed
 
 WEIGHTS = {
     "history": 0.30,
@@ -12,82 +30,953 @@ WEIGHTS = {
     "content": 0.20,
     "cluster": 0.10,
     "basket":  0.10,
+    "mf":      0.20,
 }
 
+_BUILDS = SingleFlight()
+
+def _coalesce(name, stale, build, current):
+    """
+    Rebuild a lazily loaded structure at most once at a time per process.
+
+    ``stale()`` is re-checked by the caller that wins the build, so callers
+    queued behind a finished build don't repeat it. Cold callers
+    (``current`` is ``None``) wait for the build; the rest keep serving
+    ``current`` meanwhile.
+    """
+    def run():
+        if stale():
+            build()
+    _BUILDS.do(name, run, wait=current is None)
+
+SNAPSHOT = None
+_SNAPSHOT_CHECKED_AT = 0.0
+_SNAPSHOT_LOCK = threading.Lock()
+
+def use_snapshot(snapshot):
+    """
+    Serve from ``snapshot``: adopt its item positions, its co-occurrence
+    matrix and its content model. Versions extend each other's item order,
+    so in the normal case the running index is a prefix of the snapshot's
+    (or vice versa) and the memory-mapped arrays are used as they are.
+    Otherwise the snapshot's order wins and structures holding old
+    positions are realigned or dropped.
+
+    The matrix is due for ``apply_pair_changes`` straight away, and the
+    content model counts as built when the snapshot was, so both refresh
+    on their usual schedule from there.
+    """
+    global SNAPSHOT, BASKET_FREQ, CONTENT_MODEL, MF_MODEL, _BASKET_LOADED_AT, _CONTENT_LOADED_AT
+    if snapshot is None:
+        return
+    ids = np.asarray(snapshot.item_ids)
+    current = get_item_index(build=False)
+    if current is None or not _shares_prefix(current.ids, ids):
+        index = ItemIndex(ids)
+        if current is not None:
+            index.extend(current.ids.tolist())
+        set_item_index(index)
+        if MF_MODEL is not None:
+            MF_MODEL = MF_MODEL.align(index)
+        _drop_aligned()
+    else:
+        current.extend(ids.tolist())
+    SNAPSHOT = snapshot
+    BASKET_FREQ = snapshot.cooccurrence()
+    CONTENT_MODEL = snapshot.content_model()
+    _BASKET_LOADED_AT = 0.0
+    _CONTENT_LOADED_AT = time.monotonic() - (timezone.now() - snapshot.created_at).total_seconds()
+
+def _drop_aligned():
+    # Structures indexed by item position, rebuilt on next use when the
+    # positions they were built against are replaced.
+    global POPULARITY, _POPULARITY_LOADED_AT, DAYPART_ITEMS, PRICE_BAND_ITEMS, ITEM_ATTRIBUTES, COHORTS
+    POPULARITY, _POPULARITY_LOADED_AT = None, 0.0
+    DAYPART_ITEMS = PRICE_BAND_ITEMS = ITEM_ATTRIBUTES = COHORTS = None
+
+def _shares_prefix(a, b):
+    n = min(len(a), len(b))
+    return np.array_equal(a[:n], b[:n])
+
+def load_current_snapshot():
+    global _SNAPSHOT_CHECKED_AT
+    with _SNAPSHOT_LOCK:
+        version = current_version()
+        if version is not None and (SNAPSHOT is None or SNAPSHOT.version != version):
+            use_snapshot(load_snapshot(version))
+        _SNAPSHOT_CHECKED_AT = time.monotonic()
+    return SNAPSHOT
+
+def get_snapshot():
+    """Current snapshot, re-checking the on-disk pointer at most every few seconds."""
+    interval = getattr(settings, "RECOMMENDER_SNAPSHOT_CHECK_SECONDS", 30)
+    if time.monotonic() - _SNAPSHOT_CHECKED_AT < interval:
+        return SNAPSHOT
+    return load_current_snapshot()
+
 def history_scores(user):
-    ids = OrderItem.objects.filter(order__customer=user).values_list("menu_item_id", flat=True)
-    return Counter(ids)
+    """``{item_id: order lines}`` for ``user``, read from the feature store."""
+    return order_counts([user.id]).get(user.id, {})
+
+def order_counts(user_ids):
+    """``{user_id: {item_id: order lines}}`` from ``UserItemStats``, one query."""
+    counts = defaultdict(dict)
+    for user_id, item_id, n in (UserItemStats.objects.filter(user_id__in=user_ids)
+                                .values_list("user_id", "menu_item_id", "order_count")):
+        counts[user_id][item_id] = n
+    return counts
+
+POPULARITY = None
+_POPULARITY_LOADED_AT = 0.0
+
+def popularity_vector():
+    """
+    Current demand per item from the maintained counters: the decayed score
+    or one of the rolling windows, per ``RECOMMENDER_POPULARITY_SIGNAL``.
+    ``None`` until ``rebuild_popularity`` (or a first order) fills them.
+    """
+    if _popularity_stale():
+        _coalesce("popularity", _popularity_stale, _load_popularity, POPULARITY)
+    return POPULARITY
+
+def _popularity_stale():
+    refresh = getattr(settings, "RECOMMENDER_POPULARITY_REFRESH_SECONDS", 60)
+    return _POPULARITY_LOADED_AT == 0.0 or time.monotonic() - _POPULARITY_LOADED_AT > refresh
+
+def _load_popularity():
+    global POPULARITY, _POPULARITY_LOADED_AT
+    index = get_item_index()
+    signal = getattr(settings, "RECOMMENDER_POPULARITY_SIGNAL", "decayed")
+    if signal == "decayed":
+        POPULARITY = decayed_scores(index)
+    else:
+        POPULARITY = window_counts(index)[signal]
+    _POPULARITY_LOADED_AT = time.monotonic()
+
+def record_popularity(item_ids):
+    """Count newly committed order lines in this process's vector until the next reload."""
+    global POPULARITY
+    if POPULARITY is None:
+        return
+    pos = get_item_index().positions(item_ids)
+    POPULARITY = get_item_index().vector(POPULARITY)
+    np.add.at(POPULARITY, pos, 1)
 
 def popular_scores(top_k=20):
-    qs = OrderItem.objects.values("menu_item_id").annotate(c=Count("id")).order_by("-c")[:top_k]
-    return {row["menu_item_id"]: top_k - i for i, row in enumerate(qs)}
+    pop = popularity_vector()
+    if pop is None:
+        snap = get_snapshot()
+        if snap is None:
+            qs = OrderItem.objects.values("menu_item_id").annotate(c=Count("id")).order_by("-c")[:top_k]
+            return {row["menu_item_id"]: top_k - i for i, row in enumerate(qs)}
+        pop = np.asarray(snap.popularity)
+    top = top_positions(np.where(pop > 0, pop, -np.inf), top_k)
+    scores = np.zeros(len(pop))
+    scores[top] = top_k - np.arange(len(top))
+    return scores
+
+def daypart(now=None):
+    return daypart_of_hour((now or timezone.localtime()).hour)
 
-def time_scores():
-    now = timezone.localtime()
-    hour = now.hour
-    q = Q()
+def daypart_of_hour(hour):
     if hour < 12:
-        q |= Q(name__icontains="tea") | Q(name__icontains="paratha")
-    elif hour < 17:
-        q |= Q(name__icontains="biryani")
-    else:
-        q |= Q(name__icontains="karahi") | Q(name__icontains="kebab")
-    return {m.id: 1 for m in MenuItem.objects.filter(q)}
+        return "breakfast"
+    if hour < 17:
+        return "lunch"
+    return "dinner"
+
+def _catalog_stale(value, built_version, built_at, version):
+    # Catalog lookups follow the catalog version, and are also rebuilt every
+    # RECOMMENDER_CATALOG_REFRESH_SECONDS in case a bump made by another
+    # process never reaches this one (e.g. a per-process cache backend).
+    refresh = getattr(settings, "RECOMMENDER_CATALOG_REFRESH_SECONDS", 60)
+    return value is None or version != built_version or time.monotonic() - built_at > refresh
+
+DAYPART_ITEMS = None
+_DAYPART_VERSION = None
+_DAYPART_LOADED_AT = 0.0
+
+def daypart_items():
+    """
+    ``{daypart: item positions}`` from ``MenuItem.daypart``, rebuilt when
+    the catalog version changes (see ``_catalog_stale``).
+    """
+    version = catalog_version()
+
+    def stale():
+        return _catalog_stale(DAYPART_ITEMS, _DAYPART_VERSION, _DAYPART_LOADED_AT, version)
+
+    if stale():
+        _coalesce("dayparts", stale, lambda: _load_daypart_items(version), DAYPART_ITEMS)
+    return DAYPART_ITEMS
+
+def _load_daypart_items(version):
+    global DAYPART_ITEMS, _DAYPART_VERSION, _DAYPART_LOADED_AT
+    index = get_item_index()
+    tagged = defaultdict(list)
+    for item_id, part in MenuItem.objects.exclude(daypart="").values_list("id", "daypart"):
+        tagged[part].append(item_id)
+    DAYPART_ITEMS = {part: index.positions(ids) for part, ids in tagged.items()}
+    _DAYPART_VERSION = version
+    _DAYPART_LOADED_AT = time.monotonic()
+
+def time_scores(part=None):
+    """1 for items of daypart ``part`` (default: the current one)."""
+    items = daypart_items().get(part or daypart())
+    scores = np.zeros(len(get_item_index()))
+    if items is not None:
+        scores[items] = 1
+    return scores
+
+CONTENT_MODEL = None
+_CONTENT_LOADED_AT = 0.0
+
+def get_content_model():
+    """
+    Item x ingredient TF-IDF model: the snapshot's until it is
+    ``RECOMMENDER_CONTENT_REFRESH_SECONDS`` old, then one built from recipes.
+    """
+    get_snapshot()
+    if _content_stale():
+        _coalesce("content", _content_stale, _load_content_model, CONTENT_MODEL)
+    return CONTENT_MODEL
+
+def _content_stale():
+    refresh = getattr(settings, "RECOMMENDER_CONTENT_REFRESH_SECONDS", 300)
+    return CONTENT_MODEL is None or time.monotonic() - _CONTENT_LOADED_AT > refresh
+
+def _load_content_model():
+    global CONTENT_MODEL, _CONTENT_LOADED_AT
+    CONTENT_MODEL = build_ingredient_model(get_item_index())
+    _CONTENT_LOADED_AT = time.monotonic()
 
 def content_scores(user):
-    liked = Review.objects.filter(user=user, rating__gte=4).values_list("menu_item_id", flat=True)
-    ing = Ingredient.objects.filter(recipeingredient__recipe__menu_item_id__in=liked)
-    matches = MenuItem.objects.filter(recipe__ingredients__in=ing).exclude(id__in=liked)
-    return {m.id: 1 for m in matches}
+    """Similarity of each item to the user's stored ingredient profile."""
+    profile = TasteProfile.objects.filter(user=user).values_list("liked_items", "ingredients").first()
+    if profile is None:
+        return {}
+    return _content_vector(*profile, get_content_model())
+
+def _content_vector(liked_items, ingredients, model):
+    # Liked items are excluded, then the best remaining match is scaled to 1
+    # so the component keeps the same range as the other 0/1 signals.
+    scores = model.scores(model.profile_vector(ingredients))
+    liked_pos = get_item_index().positions(liked_items)
+    scores[liked_pos[liked_pos < len(scores)]] = 0
+    top = scores.max() if len(scores) else 0
+    return scores / top if top > 0 else scores
+
+PRICE_BAND_ITEMS = None
+_PRICE_BAND_VERSION = None
+_PRICE_BAND_LOADED_AT = 0.0
+
+def price_band_items():
+    """
+    Read-only item positions per ``PRICE_BANDS`` band, rebuilt when the
+    catalog version changes (see ``_catalog_stale``).
+    """
+    version = catalog_version()
+
+    def stale():
+        return _catalog_stale(PRICE_BAND_ITEMS, _PRICE_BAND_VERSION, _PRICE_BAND_LOADED_AT, version)
+
+    if stale():
+        _coalesce("price_bands", stale, lambda: _load_price_band_items(version), PRICE_BAND_ITEMS)
+    return PRICE_BAND_ITEMS
+
+def _load_price_band_items(version):
+    global PRICE_BAND_ITEMS, _PRICE_BAND_VERSION, _PRICE_BAND_LOADED_AT
+    _, band = price_bands(get_item_index())
+    items = tuple(np.flatnonzero(band == b) for b in range(len(PRICE_BANDS) + 1))
+    for positions in items:
+        positions.setflags(write=False)
+    PRICE_BAND_ITEMS = items
+    _PRICE_BAND_VERSION = version
+    _PRICE_BAND_LOADED_AT = time.monotonic()
+
+def spend_tiers():
+    """Spend thresholds: learned ones from the snapshot, else ``SPEND_TIERS``."""
+    snap = get_snapshot()
+    return tuple(snap.spend_tiers) if snap is not None else SPEND_TIERS
 
 def cluster_scores(user):
-    avg = Order.objects.filter(customer=user).aggregate(a=Avg("total_price"))["a"] or 0
-    if avg < 500:
-        qs = MenuItem.objects.filter(price__lt=400)
-    elif avg < 1000:
-        qs = MenuItem.objects.filter(price__gte=400, price__lt=800)
-    else:
-        qs = MenuItem.objects.filter(price__gte=800)
-    return {m.id: 1 for m in qs}
+    """Items in the price band matching the user's average order value."""
+    avg = average_spend([user.id]).get(user.id, 0)
+    return _band_vector(avg, price_band_items(), spend_tiers())
+
+def _band_vector(avg, band_items, tiers):
+    return _tier_vector(spend_tier(avg, tiers), band_items)
+
+def _tier_vector(tier, band_items):
+    scores = np.zeros(len(get_item_index()))
+    scores[band_items[tier]] = 1
+    return scores
 
-PAIR_FREQ = defaultdict(int)
+BASKET_FREQ = None
+_BASKET_LOADED_AT = 0.0
 
 def init_basket_freq():
-    global PAIR_FREQ
-    PAIR_FREQ.clear()
-    for order in Order.objects.prefetch_related("items"):
-        ids = [i.menu_item_id for i in order.items.all()]
-        for a, b in itertools.combinations(sorted(set(ids)), 2):
-            PAIR_FREQ[(a, b)] += 1
+    """
+    Reload the co-occurrence matrix: the snapshot's with the ``ItemPair``
+    rows changed since it was built applied on top, or the whole table
+    without a snapshot.
+    """
+    global BASKET_FREQ, _BASKET_LOADED_AT
+    snapshot, index = SNAPSHOT, get_item_index()
+    if snapshot is None:
+        BASKET_FREQ = build_from_table(index)
+    else:
+        BASKET_FREQ = apply_pair_changes(snapshot.cooccurrence(), index, snapshot.pairs_at)
+    _BASKET_LOADED_AT = time.monotonic()
+    return BASKET_FREQ
+
+def record_basket_pairs(pairs):
+    """Fold newly committed ``(a, b)`` id pairs into this process's matrix."""
+    if BASKET_FREQ is None or not pairs:
+        return
+    index = get_item_index()
+    for a, b in pairs:
+        pa, pb = index.positions([a, b])
+        BASKET_FREQ.add(int(pa), int(pb))
+
+def get_basket_freq():
+    """Current co-occurrence matrix, reloaded every ``RECOMMENDER_BASKET_REFRESH_SECONDS``."""
+    get_snapshot()
+    if _basket_stale():
+        _coalesce("basket", _basket_stale, init_basket_freq, BASKET_FREQ)
+    return BASKET_FREQ
+
+def _basket_stale():
+    refresh = getattr(settings, "RECOMMENDER_BASKET_REFRESH_SECONDS", 300)
+    return BASKET_FREQ is None or time.monotonic() - _BASKET_LOADED_AT > refresh
 
 def basket_scores():
-    if not PAIR_FREQ:
-        init_basket_freq()
-    c = Counter()
-    for (a, b), n in PAIR_FREQ.items():
-        c[a] += n
-        c[b] += n
-    return c
-
-def hybrid_recommendation(user, top_n=5):
-    total = Counter()
-    funcs = [
-        (history_scores, WEIGHTS["history"]),
-        (popular_scores, WEIGHTS["popular"]),
-        (time_scores,    WEIGHTS["time"]),
-        (content_scores, WEIGHTS["content"]),
-        (cluster_scores, WEIGHTS["cluster"]),
-        (basket_scores,  WEIGHTS["basket"]),
+    """Per-item pair totals as a vector aligned with the item index."""
+    return get_basket_freq().marginals
+
+MF_MODEL = None
+_MF_CHECKED_AT = 0.0
+
+def get_mf_model():
+    """
+    Current ALS factor model from ``train_recommender_mf`` (``None`` until
+    one is trained), re-checking the on-disk pointer like the snapshot.
+    """
+    global MF_MODEL, _MF_CHECKED_AT
+    interval = getattr(settings, "RECOMMENDER_SNAPSHOT_CHECK_SECONDS", 30)
+    if time.monotonic() - _MF_CHECKED_AT < interval:
+        return MF_MODEL
+    with _SNAPSHOT_LOCK:
+        version = current_version(factors_root())
+        if version is not None and (MF_MODEL is None or MF_MODEL.version != version):
+            model = load_factors(version)
+            if model is not None:
+                MF_MODEL = model.align(get_item_index())
+        _MF_CHECKED_AT = time.monotonic()
+    return MF_MODEL
+
+def mf_scores(user):
+    return _mf_vector(user.id, get_mf_model())
+
+def _mf_vector(user_id, model):
+    # ALS predicts a 0-1 preference; clipped to keep the range of the other
+    # signals. Users the model hasn't seen get nothing.
+    scores = model.scores(user_id) if model is not None else None
+    if scores is None:
+        return {}
+    return np.clip(scores, 0, 1).astype(np.float64)
+
+ITEM_ATTRIBUTES = None
+_ATTRIBUTES_VERSION = None
+_ATTRIBUTES_LOADED_AT = 0.0
+
+def item_attributes():
+    """
+    ``ItemAttributes`` for filtering, rebuilt when the catalog version
+    changes (see ``_catalog_stale``).
+    """
+    version = catalog_version()
+
+    def stale():
+        return _catalog_stale(ITEM_ATTRIBUTES, _ATTRIBUTES_VERSION, _ATTRIBUTES_LOADED_AT, version)
+
+    if stale():
+        _coalesce("attributes", stale, lambda: _load_item_attributes(version), ITEM_ATTRIBUTES)
+    return ITEM_ATTRIBUTES
+
+def _load_item_attributes(version):
+    global ITEM_ATTRIBUTES, _ATTRIBUTES_VERSION, _ATTRIBUTES_LOADED_AT
+    ITEM_ATTRIBUTES = build_item_attributes(get_item_index())
+    _ATTRIBUTES_VERSION = version
+    _ATTRIBUTES_LOADED_AT = time.monotonic()
+
+def available_items():
+    """Boolean mask of orderable items by position."""
+    return item_attributes().available
+
+def filter_mask(item_filter, index):
+    """``item_filter``'s mask over ``index`` positions, or ``None`` for no filter."""
+    if item_filter is None:
+        return None
+    return item_filter.mask(item_attributes(), len(index))
+
+def cart_recommendation(item_ids, top_n=5, timings=None):
+    """
+    Add-ons for a cart: the summed co-occurrence rows of its items, limited
+    to available items not already in the cart, best first.
+
+    Everything but the final item fetch is in memory. Ids the index has
+    never seen are ignored rather than added.
+    """
+    with timed(timings, "score"):
+        index = get_item_index()
+        cart = [index.pos[i] for i in set(item_ids) if i in index.pos]
+        cooc = get_basket_freq()
+        scores = np.zeros(len(index))
+        for pos in cart:
+            cols, data = cooc.row(pos)
+            scores[cols] += data
+        allowed = np.zeros(len(index), dtype=bool)
+        available = available_items()
+        allowed[:len(available)] = available[:len(index)]
+        allowed[cart] = False
+        best = index.ids[top_positions(np.where(allowed & (scores > 0), scores, -np.inf), top_n)].tolist()
+
+    with timed(timings, "fetch"):
+        return fetch_items(best)
+
+def warm_up():
+    """
+    Build every lazily loaded structure now rather than on the first
+    requests. Run from ``RecommenderConfig.ready`` when
+    ``RECOMMENDER_WARM_UP`` is set; requests arriving meanwhile join the
+    builds in flight instead of starting their own.
+    """
+    try:
+        get_snapshot()
+        get_item_index()
+        get_basket_freq()
+        popularity_vector()
+        daypart_items()
+        price_band_items()
+        item_attributes()
+        get_content_model()
+        get_mf_model()
+        cohort_lists()
+    finally:
+        # The warm-up thread ends here, so its connection has no further use.
+        connections.close_all()
+
+def reset_state():
+    """
+    Drop every lazily loaded structure so each is rebuilt from the database
+    and disk on next use. For offline evaluation, which swaps the data
+    underneath the process; the item index is kept since it only grows.
+    """
+    global SNAPSHOT, _SNAPSHOT_CHECKED_AT, CONTENT_MODEL, _CONTENT_LOADED_AT
+    global BASKET_FREQ, _BASKET_LOADED_AT, MF_MODEL, _MF_CHECKED_AT
+    SNAPSHOT, _SNAPSHOT_CHECKED_AT = None, 0.0
+    CONTENT_MODEL, _CONTENT_LOADED_AT = None, 0.0
+    BASKET_FREQ, _BASKET_LOADED_AT = None, 0.0
+    MF_MODEL, _MF_CHECKED_AT = None, 0.0
+    _drop_aligned()
+
+# Users scored per matrix in hybrid_recommendation_many
+BATCH_SIZE = 100
+
+COMPONENTS = ("history", "popular", "time", "content", "cluster", "basket", "mf")
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def _executor():
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "RECOMMENDER_MAX_WORKERS", 16),
+                    thread_name_prefix="recommender",
+                )
+    return _EXECUTOR
+
+def _run_component(name, call, timings):
+    # Pool threads keep their own DB connection from one component to the
+    # next (CONN_MAX_AGE). As at the start of a request, it is only closed
+    # once it has errored or outlived its age.
+    close_old_connections()
+    with timed(timings, name):
+        return call()
+
+class BudgetExceeded(Exception):
+    """The request's time budget ran out before a usable ranking was ready."""
+
+def component_scores(user, timings=None, concurrent=None, deadline=None):
+    """
+    Raw per-component results, in ``COMPONENTS`` order.
+
+    With ``concurrent`` (default: ``RECOMMENDER_CONCURRENT_COMPONENTS``) the
+    components run on a shared bounded thread pool so their queries overlap.
+    Worker threads use their own connections and so don't see writes that
+    the calling thread hasn't committed yet.
+
+    With a ``deadline`` (a ``time.monotonic()`` value) components that miss
+    it are dropped and their slot is ``None``: run in turn, components not
+    started by then are skipped; run concurrently, the pool is waited on
+    until the deadline, components still queued are cancelled and running
+    ones finish in the background unused.
+
+    A component that is already running is never interrupted. In the
+    default sequential mode the deadline is only checked between
+    components, so one slow component overruns the budget by however long
+    it takes.
+    """
+    calls = {
+        "history": lambda: history_scores(user),
+        "popular": popular_scores,
+        "time":    time_scores,
+        "content": lambda: content_scores(user),
+        "cluster": lambda: cluster_scores(user),
+        "basket":  basket_scores,
+        "mf":      lambda: mf_scores(user),
+    }
+    if concurrent is None:
+        concurrent = getattr(settings, "RECOMMENDER_CONCURRENT_COMPONENTS", False)
+    if concurrent:
+        # Each component times into its own dict so a straggler can't write
+        # into ``timings`` after the caller has moved on.
+        local = {name: None if timings is None else {} for name in COMPONENTS}
+        futures = [_executor().submit(_run_component, name, calls[name], local[name])
+                   for name in COMPONENTS]
+        wait(futures, timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+        parts = []
+        for name, future in zip(COMPONENTS, futures):
+            if not future.done():
+                # Queued components would otherwise still run later and hold
+                # up the next requests' components behind them.
+                future.cancel()
+                parts.append(None)
+                continue
+            parts.append(future.result())
+            if timings is not None:
+                timings.update(local[name])
+        return parts
+
+    parts = []
+    for name in COMPONENTS:
+        if deadline is not None and time.monotonic() >= deadline:
+            parts.append(None)
+            continue
+        with timed(timings, name):
+            parts.append(calls[name]())
+    return parts
+
+def history_neighbors(item_ids):
+    """``{item_id: [neighbour ids, best first]}`` from ``ItemNeighbor`` in one query."""
+    neighbors = defaultdict(list)
+    for item_id, neighbor_id in (ItemNeighbor.objects.filter(item_id__in=list(item_ids))
+                                 .order_by("item_id", "rank").values_list("item_id", "neighbor_id")):
+        neighbors[item_id].append(neighbor_id)
+    return neighbors
+
+def _demand(popular, index):
+    # Ordering for daypart candidates: raw demand where it is maintained,
+    # else the popular component itself.
+    pop = popularity_vector()
+    if pop is None:
+        snap = get_snapshot()
+        pop = snap.popularity if snap is not None else popular
+    return index.vector(pop)
+
+def candidate_positions(history, popular, time, neighbors, index, limit=None, allowed=None):
+    """
+    Stage one of ranking: at most ``limit`` (``RECOMMENDER_CANDIDATES``)
+    positions worth re-ranking, in priority order: neighbours of items the
+    user ordered (best ranks first, favourite items first), the popular
+    items, then the current daypart's items by demand. Items the user has
+    ordered are never candidates, nor are items outside the ``allowed``
+    mask. ``None`` limit returns ``None`` (no candidate stage: every item
+    is ranked).
+    """
+    if limit is None:
+        limit = getattr(settings, "RECOMMENDER_CANDIDATES", 300)
+    if limit is None:
+        return None
+    ranked = sorted((rank, -history[item_id], neighbor_id)
+                    for item_id in history for rank, neighbor_id in enumerate(neighbors.get(item_id, ())))
+    pop = index.vector(popular)
+    daypart_pos = np.flatnonzero(index.vector(time))
+    demand = _demand(popular, index)
+
+    pools = [
+        index.positions([neighbor_id for _, _, neighbor_id in ranked]),
+        top_positions(np.where(pop > 0, pop, -np.inf)),
+        daypart_pos[np.lexsort((daypart_pos, -demand[daypart_pos]))],
     ]
-    
-    for fn, w in funcs:
-        part = fn(user) if fn is not basket_scores else fn()
-        for k, v in part.items():
-            total[k] += w * v
-
-    seen = set(OrderItem.objects.filter(order__customer=user).values_list("menu_item_id", flat=True))
-    best = [i for i, _ in total.most_common() if i not in seen][:top_n]
-    when = " ".join(f"WHEN id={i} THEN {p}" for p, i in enumerate(best))
-
-    return list(MenuItem.objects.filter(id__in=best)
-                .extra(select={'_o': f'CASE {when} END'}).order_by('_o'))
+    seen = set(index.positions(list(history)).tolist()) if history else set()
+    if allowed is not None:
+        # Items the index gained after the mask was built never pass it.
+        allowed = np.concatenate([allowed, np.zeros(max(len(index) - len(allowed), 0), dtype=bool)])
+        pools = [pool[allowed[pool]] for pool in pools]
+    picked = {}
+    for pool in pools:
+        for pos in pool.tolist():
+            if pos not in seen:
+                picked.setdefault(pos, None)
+                if len(picked) >= limit:
+                    return np.fromiter(picked, dtype=np.int64, count=len(picked))
+    return np.fromiter(picked, dtype=np.int64, count=len(picked))
+
+def score_items(user, index=None, timings=None, deadline=None, status=None, item_filter=None):
+    """
+    Weighted hybrid score for every item in the index.
+
+    Ranking is two-stage: ``candidate_positions`` picks a bounded set of
+    items, and only those are re-ranked with the full weighted model, one
+    row per component combined with a single product against ``WEIGHTS``.
+    Non-candidates, items no component touched, items the user already
+    ordered and items rejected by ``item_filter`` (an ``ItemFilter``)
+    score ``-inf``.
+
+    Components that miss ``deadline`` are left out and their weight is
+    spread over the rest (listed in ``status["dropped"]``). Raises
+    ``BudgetExceeded`` if the order history is missing, since ordered items
+    could not be excluded from the ranking, or if no scoring component made
+    it; ``fallback_ids`` then excludes them itself.
+    """
+    if index is None:
+        index = get_item_index()
+    parts = component_scores(user, timings, deadline=deadline)
+    dropped = [name for name, part in zip(COMPONENTS, parts) if part is None]
+    if status is not None:
+        status["dropped"] = dropped
+    if parts[0] is None or all(part is None for part in parts[1:]):
+        raise BudgetExceeded(", ".join(dropped))
+    parts = [{} if part is None else part for part in parts]
+
+    with timed(timings, "candidates"):
+        history = parts[0]
+        neighbors = history_neighbors(history) if history else {}
+        allowed = filter_mask(item_filter, index)
+        candidates = candidate_positions(history, parts[1], parts[2], neighbors, index, allowed=allowed)
+    with timed(timings, "merge"):
+        return _merge(parts, index, candidates, _weights(dropped), allowed)
+
+def _weights(dropped=()):
+    """``WEIGHTS`` in ``COMPONENTS`` order, with dropped components' share spread proportionally."""
+    weights = np.array([0.0 if name in dropped else WEIGHTS[name] for name in COMPONENTS])
+    kept = weights.sum()
+    return weights * (sum(WEIGHTS.values()) / kept) if kept else weights
+
+def _merge(parts, index, candidates=None, weights=None, allowed=None):
+    for part in parts:
+        if not isinstance(part, np.ndarray):
+            index.extend(part.keys())
+    if candidates is None:
+        candidates = np.arange(len(index))
+    if weights is None:
+        weights = _weights()
+
+    matrix = np.vstack([_take(part, candidates, index) for part in parts])
+    # Rounded so float noise from the summation order can't break ties.
+    scores = np.round(weights @ matrix, 9)
+    scores[~matrix.any(axis=0)] = -np.inf
+
+    total = np.full(len(index), -np.inf)
+    total[candidates] = scores
+    seen = parts[0]
+    if seen:
+        total[index.positions(list(seen))] = -np.inf
+    if allowed is not None:
+        # Components may have added items to the index since the mask was made.
+        total[len(allowed):] = -np.inf
+        total[:len(allowed)][~allowed[:len(total)]] = -np.inf
+    return total
+
+def _take(part, positions, index):
+    """A component's values at ``positions`` (zero where it has none)."""
+    out = np.zeros(len(positions))
+    if isinstance(part, np.ndarray):
+        inside = positions < len(part)
+        out[inside] = part[positions[inside]]
+    elif part:
+        where = {int(p): i for i, p in enumerate(positions)}
+        for item_id, value in part.items():
+            i = where.get(index.pos[item_id])
+            if i is not None:
+                out[i] = value
+    return out
+
+def hybrid_recommendation(user, top_n=5, timings=None, status=None, item_filter=None):
+    """
+    Top ``top_n`` items for ``user`` (all when ``None``), best first.
+
+    Pass a dict as ``timings`` to get wall time and query count per stage
+    (``cache``, each component, ``candidates``, ``merge``, ``fetch``);
+    components are only listed when the result was not served from cache.
+    See ``recommended_ids`` for caching, ``status`` and ``item_filter``.
+    """
+    ids = recommended_ids(user, top_n, timings, status, item_filter)
+    with timed(timings, "fetch"):
+        return fetch_items(ids)
+
+def recommended_ids(user, top_n=5, timings=None, status=None, item_filter=None):
+    """
+    Ids of the top ``top_n`` items for ``user``, best first, restricted to
+    items passing ``item_filter`` (an ``ItemFilter``) if given.
+
+    Results are cached per user, ``top_n``, daypart and filter; order,
+    review and catalog writes invalidate them (see ``recommender.signals``).
+
+    With ``RECOMMENDER_BUDGET_MS`` set, late components are dropped and,
+    if the budget runs out altogether, the ``fallback_ids`` list is served
+    instead (see ``component_scores`` for what the budget can't stop). A
+    ``status`` dict receives ``degraded``, ``dropped``, ``fallback`` and
+    ``cold_start``; degraded results are not cached.
+
+    Cold users (see ``cold_start_ids``) are served from the precomputed
+    cohort lists without running any component.
+    """
+    if status is None:
+        status = {}
+    status.update(degraded=False, dropped=[], fallback=False, cold_start=False)
+    budget = getattr(settings, "RECOMMENDER_BUDGET_MS", None)
+    deadline = time.monotonic() + budget / 1000 if budget else None
+
+    with timed(timings, "cache"):
+        key = result_key(user.id, top_n, daypart(), _filter_key(item_filter))
+        ids = get_result(key)
+    if ids is None:
+        with timed(timings, "cold_start"):
+            ids = cold_start_ids(user, top_n, item_filter)
+        if ids is not None:
+            status["cold_start"] = True
+            set_result(key, ids)
+    if ids is None:
+        try:
+            index = get_item_index()
+            total = score_items(user, index, timings, deadline, status, item_filter)
+            ids = index.ids[top_positions(total, top_n)].tolist()
+        except BudgetExceeded:
+            status["fallback"] = True
+            ids = fallback_ids(top_n, timings, item_filter, user)
+        status["degraded"] = status["fallback"] or bool(status["dropped"])
+        if not status["degraded"]:
+            set_result(key, ids)
+    return ids
+
+def fallback_ids(top_n=5, timings=None, item_filter=None, user=None):
+    """
+    Non-personalised list for when the budget runs out: available items of
+    the current daypart, then other items in demand, by demand, limited to
+    ``item_filter`` if given. Items ``user`` has ordered are left out,
+    read from ``UserItemStats`` in one query. Cached per list length,
+    daypart, filter and catalog version.
+    """
+    with timed(timings, "fallback"):
+        ordered = set()
+        if user is not None:
+            ordered = set(UserItemStats.objects.filter(user_id=user.id).values_list("menu_item_id", flat=True))
+        # Long enough to still hold top_n once the ordered items are dropped.
+        size = None if top_n is None else top_n + len(ordered)
+        key = fallback_key(size, daypart(), _filter_key(item_filter))
+        ids = get_result(key)
+        if ids is None:
+            index = get_item_index()
+            popular = popular_scores()
+            demand = _demand(popular, index)
+            in_daypart = index.vector(time_scores()) > 0
+            allowed = np.zeros(len(index), dtype=bool)
+            mask = available_items() if item_filter is None else filter_mask(item_filter, index)
+            allowed[:len(mask)] = mask[:len(index)]
+            pos = np.flatnonzero(allowed & (in_daypart | (demand > 0)))
+            ids = index.ids[pos[np.lexsort((pos, -demand[pos], ~in_daypart[pos]))][:size]].tolist()
+            set_result(key, ids)
+    return [i for i in ids if i not in ordered][:top_n]
+
+COHORTS = None
+_COHORTS_LOADED_AT = 0.0
+_COHORTS_VERSION = None
+
+def cohort_lists():
+    """
+    ``{(daypart, spend tier): item ids, best first}``: what a user with no
+    orders or liked reviews is recommended in each daypart and price tier,
+    ``RECOMMENDER_COHORT_SIZE`` items each. Rebuilt every
+    ``RECOMMENDER_COHORT_REFRESH_SECONDS`` and on catalog changes.
+    """
+    version = catalog_version()
+
+    def stale():
+        refresh = getattr(settings, "RECOMMENDER_COHORT_REFRESH_SECONDS", 300)
+        return (COHORTS is None or version != _COHORTS_VERSION
+                or time.monotonic() - _COHORTS_LOADED_AT > refresh)
+
+    if stale():
+        _coalesce("cohorts", stale, lambda: _load_cohorts(version), COHORTS)
+    return COHORTS
+
+def _load_cohorts(version):
+    global COHORTS, _COHORTS_LOADED_AT, _COHORTS_VERSION
+    index = get_item_index()
+    size = getattr(settings, "RECOMMENDER_COHORT_SIZE", 100)
+    popular = popular_scores()
+    basket = basket_scores()
+    band_items = price_band_items()
+    lists = {}
+    for part, _ in MenuItem.DAYPART_CHOICES:
+        time_part = time_scores(part)
+        candidates = candidate_positions({}, popular, time_part, {}, index)
+        for tier in range(len(spend_tiers()) + 1):
+            # The components a user without history gets; the rest are empty.
+            parts = [{}, popular, time_part, {}, _tier_vector(tier, band_items), basket, {}]
+            ids = index.ids[top_positions(_merge(parts, index, candidates), size)]
+            ids.setflags(write=False)
+            lists[part, tier] = ids
+    COHORTS = lists
+    _COHORTS_LOADED_AT = time.monotonic()
+    _COHORTS_VERSION = version
+
+def cold_start_ids(user, top_n=5, item_filter=None):
+    """
+    ``top_n`` ids from the user's cohort list if ``user`` is cold, else
+    ``None``.
+
+    A user is cold with fewer than ``RECOMMENDER_COLD_START_ORDERS`` orders
+    (``UserStats``) and no liked reviews, checked in one query; their
+    cohort is the current daypart and their spend tier. Lists too short
+    for ``top_n`` once ordered and filtered-out items are dropped also
+    return ``None``, as does ``top_n=None``.
+    """
+    size = getattr(settings, "RECOMMENDER_COHORT_SIZE", 100)
+    if top_n is None or not size or top_n > size:
+        return None
+    row = (get_user_model().objects.filter(pk=user.id)
+           .values_list("recommender_stats__order_count", "recommender_stats__total_spent",
+                        "taste_profile__liked_items")
+           .first())
+    if row is None:
+        return None
+    order_count, total_spent, liked = row
+    if (order_count or 0) >= getattr(settings, "RECOMMENDER_COLD_START_ORDERS", 1) or liked:
+        return None
+
+    avg = float(total_spent) / order_count if order_count else 0
+    ids = cohort_lists()[daypart(), spend_tier(avg, spend_tiers())]
+    ordered = history_scores(user) if order_count else {}
+    mask = None
+    if item_filter is not None:
+        index = get_item_index()
+        mask = filter_mask(item_filter, index)
+    picked = [i for i in ids.tolist()
+              if i not in ordered and (mask is None or mask[index.pos[i]])][:top_n]
+    # A full-length list was cut off, so more items may exist beyond it.
+    if len(picked) < top_n and len(ids) >= size:
+        return None
+    return picked
+
+def _filter_key(item_filter):
+    return "" if item_filter is None else item_filter.key()
+
+def fetch_items(ids):
+    """
+    ``MenuItem``s for ``ids`` in the same order, from one ``in_bulk`` query
+    (Django batches it on backends with a parameter limit). Ids no longer
+    in the catalog are skipped.
+    """
+    found = MenuItem.objects.in_bulk(ids)
+    return [found[i] for i in ids if i in found]
+
+def iter_items(ids, chunk_size=200):
+    """``fetch_items`` a chunk at a time, so a long list is never all in memory."""
+    for start in range(0, len(ids), chunk_size):
+        yield fetch_items(ids[start:start + chunk_size])
+
+def score_items_many(users, index=None, item_filter=None):
+    """
+    (users x items) hybrid scores, rows in ``users`` order.
+
+    Order counts, liked reviews and average spend for every user come from
+    one feature-store query each, as do the neighbours feeding each user's candidate
+    set; the user-independent components are computed once and broadcast
+    over the rows. Same semantics as ``score_items``.
+    """
+    if index is None:
+        index = get_item_index()
+    user_ids = [u.id for u in users]
+    row_of = {uid: r for r, uid in enumerate(user_ids)}
+
+    counts = order_counts(user_ids)
+    history = [(uid, item_id) for uid, items in counts.items() for item_id in items]
+    profiles = {uid: (liked_items, ingredients) for uid, liked_items, ingredients in
+                TasteProfile.objects.filter(user_id__in=user_ids)
+                .values_list("user_id", "liked_items", "ingredients")}
+    spend = average_spend(user_ids)
+
+    shared = {"popular": popular_scores(), "time": time_scores(), "basket": basket_scores()}
+    for part in shared.values():
+        if not isinstance(part, np.ndarray):
+            index.extend(part.keys())
+    content_model = get_content_model()
+    mf_model = get_mf_model()
+    band_items = price_band_items()
+    tiers = spend_tiers()
+    hist_pos = index.positions([item_id for _, item_id in history])
+    hist_rows = np.fromiter((row_of[uid] for uid, _ in history), dtype=np.int64, count=len(history))
+
+    n = len(index)
+    shared_total = np.zeros(n)
+    touched = np.zeros((len(users), n), dtype=bool)
+    for name, part in shared.items():
+        vec = index.vector(part)
+        shared_total += WEIGHTS[name] * vec
+        touched |= vec != 0
+    total = np.tile(shared_total, (len(users), 1))
+
+    for r, uid in enumerate(user_ids):
+        for name, vec in (
+            ("content", _content_vector(*profiles.get(uid, ([], {})), content_model)),
+            ("cluster", _band_vector(spend.get(uid), band_items, tiers)),
+            ("mf", index.vector(_mf_vector(uid, mf_model))),
+        ):
+            total[r, :len(vec)] += WEIGHTS[name] * vec
+            touched[r, :len(vec)] |= vec != 0
+
+    neighbors = history_neighbors({item_id for _, item_id in history}) if history else {}
+    allowed = filter_mask(item_filter, index)
+    if allowed is not None:
+        touched[:, :len(allowed)] &= allowed[:n]
+        touched[:, len(allowed):] = False
+    for r, uid in enumerate(user_ids):
+        candidates = candidate_positions(counts.get(uid, {}), shared["popular"], shared["time"], neighbors,
+                                         index, allowed=allowed)
+        if candidates is not None:
+            outside = np.ones(len(index), dtype=bool)
+            outside[candidates] = False
+            touched[r, outside[:n]] = False
+
+    # History rows are the user's already-ordered items, which are excluded.
+    total = np.round(total, 9)
+    total[~touched] = -np.inf
+    total[hist_rows, hist_pos] = -np.inf
+    return total
+
+def hybrid_recommendation_many(users, top_n=5, item_filter=None):
+    """
+    ``{user_id: [MenuItem, ...]}`` for many users in a handful of queries,
+    optionally restricted by ``item_filter``.
+
+    Users are scored ``BATCH_SIZE`` at a time to bound the size of the
+    (users x components x items) matrix.
+    """
+    users = list(users)
+    index = get_item_index()
+    best = {}
+    for start in range(0, len(users), BATCH_SIZE):
+        chunk = users[start:start + BATCH_SIZE]
+        total = score_items_many(chunk, index, item_filter)
+        for user, row in zip(chunk, total):
+            best[user.id] = index.ids[top_positions(row, top_n)].tolist()
+
+    items = MenuItem.objects.in_bulk({i for ids in best.values() for i in ids})
+    return {uid: [items[i] for i in ids if i in items] for uid, ids in best.items()}
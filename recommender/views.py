@@ -1,14 +1,34 @@
+import json
+import time
 from rest_framework import generics
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.exceptions import NotFound, ParseError
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.contrib.auth import get_user_model
-from .utils import hybrid_recommendation
+from .utils import (
+    cart_recommendation, hybrid_recommendation, hybrid_recommendation_many, iter_items,
+    recommended_ids,
+)
+from .filters import ItemFilter
 from .serializers import MenuItemMiniSerializer
+from .metrics import counters, record_recommendation
+from .models import ItemNeighbor
+from .timing import server_timing
 from menu.models import MenuItem
 
 class RecommendationAPIView(APIView):
+    """
+    Recommendations for the current user (or any user, for staff).
+
+    GET ?n=5&category=1,2&max_price=800&exclude_ingredients=4,9&available=true
+
+    Filters are optional and applied while ranking; unavailable items are
+    left out unless ``available=false``.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, user_id=None):
@@ -18,23 +38,63 @@ class RecommendationAPIView(APIView):
                 return Response({"detail": "Only staff can access others."}, status=403)
             target = self._get_user(user_id)
 
-        raw_n = request.query_params.get("n")
-        if raw_n in (None, "", "all"):
-            n = None
-        else:
-            try:
-                n = int(raw_n)
-            except ValueError:
-                raise ParseError("Please enter a number or 'all' for n.")
+        n = _parse_n(request.query_params.get("n"))
+        item_filter = _parse_filter(request.query_params)
+        debug = request.query_params.get("debug") == "timing" and request.user.is_staff
+        chunk = getattr(settings, "RECOMMENDER_STREAM_CHUNK", 200)
+        if (n is None or n > chunk) and not debug:
+            return self._stream(request, target, n, chunk, item_filter)
 
-        items = hybrid_recommendation(target, top_n=n)
+        timings = {}
+        status = {}
+        start = time.perf_counter()
+        items = hybrid_recommendation(target, top_n=n, timings=timings, status=status,
+                                      item_filter=item_filter)
+        record_recommendation(status)
         data = MenuItemMiniSerializer(items, many=True, context={"request": request}).data
+        timings["total"] = {"ms": round((time.perf_counter() - start) * 1000, 3),
+                            "queries": sum(t["queries"] for t in timings.values())}
 
-        return Response({
+        payload = {
             "user": target.id,
             "count": len(data),
+            "degraded": status["degraded"],
             "recommendations": data
-        })
+        }
+        if debug:
+            payload["timing"] = timings
+            payload["dropped"] = status["dropped"]
+            payload["fallback"] = status["fallback"]
+            payload["cold_start"] = status["cold_start"]
+        response = Response(payload)
+        response["Server-Timing"] = server_timing(timings)
+        return response
+
+    def _stream(self, request, target, n, chunk, item_filter=None):
+        """
+        Large lists (``n=all`` or above ``RECOMMENDER_STREAM_CHUNK``): items
+        are fetched and serialized ``chunk`` at a time while the JSON body
+        is written out, so memory stays bounded by the chunk size.
+        """
+        timings = {}
+        status = {}
+        ids = recommended_ids(target, top_n=n, timings=timings, status=status,
+                              item_filter=item_filter)
+        record_recommendation(status)
+
+        def body():
+            head = json.dumps({"user": target.id, "count": len(ids), "degraded": status["degraded"]})
+            yield head[:-1] + ', "recommendations": ['
+            sep = ""
+            for items in iter_items(ids, chunk):
+                for row in MenuItemMiniSerializer(items, many=True, context={"request": request}).data:
+                    yield sep + json.dumps(row, cls=JSONEncoder)
+                    sep = ", "
+            yield "]}"
+
+        response = StreamingHttpResponse(body(), content_type="application/json")
+        response["Server-Timing"] = server_timing(timings)
+        return response
 
     def _get_user(self, uid):
         User = get_user_model()
@@ -43,6 +103,131 @@ class RecommendationAPIView(APIView):
         except User.DoesNotExist:
             raise NotFound("User not found.")
 
+class RecommendationBatchAPIView(APIView):
+    """
+    Staff-only: recommendations for many users in one call.
+
+    POST {"user_ids": [1, 2, ...], "n": 5, "category": [1, 2], "max_price": 800,
+          "exclude_ingredients": [4, 9], "available": true}
+
+    Filters are optional and the same as for ``RecommendationAPIView``;
+    id lists may also be comma-separated strings.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        user_ids = request.data.get("user_ids")
+        if not isinstance(user_ids, list) or not user_ids:
+            raise ParseError("user_ids must be a non-empty list.")
+        try:
+            user_ids = list(dict.fromkeys(int(uid) for uid in user_ids))
+        except (TypeError, ValueError):
+            raise ParseError("user_ids must contain only numbers.")
+        limit = getattr(settings, "RECOMMENDER_BATCH_MAX_USERS", 1000)
+        if len(user_ids) > limit:
+            raise ParseError(f"At most {limit} users per request.")
+        n = _parse_n(request.data.get("n", 5))
+        item_filter = _parse_filter(request.data)
+
+        users = get_user_model().objects.in_bulk(user_ids)
+        found = [users[uid] for uid in user_ids if uid in users]
+        recommendations = hybrid_recommendation_many(found, top_n=n, item_filter=item_filter)
+
+        results = []
+        for user in found:
+            data = MenuItemMiniSerializer(recommendations[user.id], many=True,
+                                          context={"request": request}).data
+            results.append({"user": user.id, "count": len(data), "recommendations": data})
+        return Response({
+            "count": len(results),
+            "missing": [uid for uid in user_ids if uid not in users],
+            "results": results,
+        })
+
+class RecommenderMetricsAPIView(APIView):
+    """Staff-only: recommendation response counters, including degraded ones."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(counters())
+
+class CartRecommendationAPIView(APIView):
+    """
+    "Complete your basket": add-ons for the items currently in the cart.
+
+    GET ?items=3,7,12&n=5
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        raw = request.query_params.get("items", "")
+        try:
+            item_ids = [int(i) for i in raw.split(",") if i.strip()]
+        except ValueError:
+            raise ParseError("items must be a comma-separated list of menu item ids.")
+        n = _parse_n(request.query_params.get("n", 5))
+
+        timings = {}
+        items = cart_recommendation(item_ids, top_n=n, timings=timings)
+        data = MenuItemMiniSerializer(items, many=True, context={"request": request}).data
+        response = Response({"cart": item_ids, "count": len(data), "recommendations": data})
+        response["Server-Timing"] = server_timing(timings)
+        return response
+
+class SimilarItemsAPIView(APIView):
+    """
+    Items that go with or resemble a dish, best first, read from the
+    precomputed ``ItemNeighbor`` table (see ``recommender.neighbors``).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        n = _parse_n(request.query_params.get("n"))
+        rows = (ItemNeighbor.objects.filter(item_id=pk, neighbor__is_available=True)
+                .select_related("neighbor").order_by("rank"))
+        items = [row.neighbor for row in (rows[:max(n, 0)] if n is not None else rows)]
+        if not items and not MenuItem.objects.filter(pk=pk).exists():
+            raise NotFound("Menu item not found.")
+        data = MenuItemMiniSerializer(items, many=True, context={"request": request}).data
+        return Response({"item": pk, "count": len(data), "similar": data})
+
+def _parse_n(raw_n):
+    if raw_n in (None, "", "all"):
+        return None
+    try:
+        return int(raw_n)
+    except (TypeError, ValueError):
+        raise ParseError("Please enter a number or 'all' for n.")
+
+def _parse_ids(raw, name):
+    """Ids from a comma-separated string, or from a list in a JSON body."""
+    if not isinstance(raw, (list, tuple)):
+        raw = str(raw or "").split(",")
+    try:
+        return [int(i) for i in raw if str(i).strip()]
+    except (TypeError, ValueError):
+        raise ParseError(f"{name} must be a comma-separated list of ids.")
+
+def _parse_filter(params):
+    """``ItemFilter`` from query parameters or a JSON body; every parameter is optional."""
+    max_price = params.get("max_price")
+    if max_price not in (None, ""):
+        try:
+            max_price = float(max_price)
+        except (TypeError, ValueError):
+            raise ParseError("max_price must be a number.")
+    else:
+        max_price = None
+    available = str(params.get("available", "true")).lower()
+    if available not in ("true", "false", "1", "0"):
+        raise ParseError("available must be true or false.")
+    return ItemFilter(
+        categories=_parse_ids(params.get("category"), "category"),
+        max_price=max_price,
+        exclude_ingredients=_parse_ids(params.get("exclude_ingredients"), "exclude_ingredients"),
+        available_only=available in ("true", "1"),
+    )
+
 class MenuItemListAPIView(generics.ListAPIView):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemMiniSerializer
@@ -67,7 +67,7 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 
 REST_FRAMEWORK = {
-    'EXCEPTION_HANDLER': 'restaurant_recommendation_system.utils.custom_exception_handler',
+    'EXCEPTION_HANDLER': 'utils.custom_exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
@@ -121,6 +121,10 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Persistent connections, so recommender pool threads don't reconnect
+        # for every scoring component; checked before reuse.
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -166,6 +170,18 @@ import os
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Recommendation results, and the version counters that invalidate them,
+# must be shared by every worker process on every host: a Redis server at
+# REDIS_URL is required (pip install redis). Version counters are stored
+# without expiry; should one be evicted anyway it restarts from the clock
+# (see recommender.caching), so stale results never become reachable again.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/1"),
+    }
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -192,4 +208,31 @@ CORS_ALLOWED_ORIGINS = [
    "http://localhost:3000",
 ]
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+# Recommender
+RECOMMENDER_BASKET_REFRESH_SECONDS = 300  # Reload basket pair counts written by other workers (on top of a loaded snapshot)
+RECOMMENDER_SNAPSHOT_DIR = os.path.join(BASE_DIR, "recommender_snapshots")  # build_recommender_snapshot output
+RECOMMENDER_SNAPSHOT_CHECK_SECONDS = 30  # How often workers look for a newer snapshot
+RECOMMENDER_BATCH_MAX_USERS = 1000  # Cap on user_ids per /api/recommend/batch/ call
+RECOMMENDER_CACHE_TIMEOUT = 300  # Seconds a user's cached recommendations live
+RECOMMENDER_CONCURRENT_COMPONENTS = False  # Run scoring components in parallel threads
+RECOMMENDER_MAX_WORKERS = 16  # Component threads shared by all in-flight requests
+RECOMMENDER_CONTENT_REFRESH_SECONDS = 300  # Rebuild the ingredient model once it (or the loaded snapshot) is this old
+RECOMMENDER_POPULARITY_HALF_LIFE_HOURS = 72  # Decay half-life of item popularity
+RECOMMENDER_POPULARITY_SIGNAL = "decayed"  # "decayed", or a rolling window: "hour", "day", "week"
+RECOMMENDER_POPULARITY_REFRESH_SECONDS = 60  # Reload popularity counters written by other workers
+RECOMMENDER_MF_DIR = os.path.join(BASE_DIR, "recommender_mf")  # train_recommender_mf output
+RECOMMENDER_NEIGHBORS = 10  # Similar items kept per menu item
+RECOMMENDER_CANDIDATES = 300  # Items re-ranked per request (None ranks every item)
+RECOMMENDER_WARM_UP = False  # Build recommender structures on a background thread at startup
+RECOMMENDER_BUDGET_MS = None  # Per-request scoring budget; late components are dropped, running ones are not stopped (None: no limit)
+RECOMMENDER_METRICS_FLUSH_SECONDS = 10  # How often a worker adds its response counts to the shared counters
+RECOMMENDER_STREAM_CHUNK = 200  # Items per chunk when streaming n=all or larger lists
+RECOMMENDER_COLD_START_ORDERS = 1  # Users with fewer orders (and no liked reviews) get cohort lists
+RECOMMENDER_COHORT_SIZE = 100  # Items kept per daypart x spend tier cohort list (0 disables)
+RECOMMENDER_COHORT_REFRESH_SECONDS = 300  # How often cohort lists are rebuilt
+RECOMMENDER_TABLE_ORDERS = 5  # Recent orders per table feeding QR-scan recommendations
+RECOMMENDER_TABLE_ITEMS = 10  # Recommendations cached per table
+RECOMMENDER_OUTLET_POPULARITY_SECONDS = 300  # How long an outlet's item counts serve its tables
+RECOMMENDER_CATALOG_REFRESH_SECONDS = 60  # Rebuild catalog lookups at least this often, bump or not